@@ -0,0 +1,8 @@
+"""
+缓存模块初始化文件
+提供进程内及 Redis 共享的去重索引、来源 id 缓存等缓存结构
+"""
+
+from .dedup_index import DedupIndex, claiming, current_claim_token, dedup_index_enabled, get_dedup_index
+from .redis_dedup_index import RedisDedupIndex
+from .source_id_cache import SourceIdCache, get_source_id_cache
@@ -0,0 +1,63 @@
+"""
+布隆过滤器
+用固定大小的位数组判断元素“一定不存在”或“可能存在”
+"""
+
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    基于 bytearray 的布隆过滤器，内存占用在创建时即确定，不会随元素数量增长。
+
+    Attributes
+    ----------
+    capacity : int
+        预期容纳的元素数量，超过后误判率会逐渐升高。
+    error_rate : float
+        在 capacity 范围内的目标误判率。
+    num_bits : int
+        位数组长度。
+    num_hashes : int
+        每个元素使用的哈希函数个数。
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        if capacity <= 0:
+            raise ValueError("capacity 必须大于 0")
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate 必须在 (0, 1) 之间")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    @property
+    def size_in_bytes(self) -> int:
+        """位数组占用的字节数"""
+        return len(self._bits)
+
+    def _positions(self, item: str):
+        """
+        双重哈希：用一次 blake2b 的两个 64 位分量生成 num_hashes 个位置
+        """
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item: str):
+        """添加元素"""
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        for pos in self._positions(item):
+            if not self._bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
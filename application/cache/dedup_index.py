@@ -0,0 +1,331 @@
+"""
+资讯去重索引
+在进程内维护已入库 information_id 的索引，替代每批次的全表扫描
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional, Set
+
+from application.cache.bloom_filter import BloomFilter
+from application.db.mysql_db.info.ResourceInformationList import ResourceInformationList
+from application.settings import DEDUP_CONFIG, WRITE_CONFIG
+from application.utils import get_logger
+from application.utils.metrics import registry
+
+logger = get_logger(__name__)
+
+_local = threading.local()
+
+
+def iter_stored_ids(chunk_size: int) -> Iterator[List[str]]:
+    """
+    分段读取已入库的全部 information_id。
+    使用 list_id 做键集分页，避免一次性把整张表拉进内存。
+
+    Args:
+        chunk_size: 每次查询的行数
+
+    Yields:
+        List[str]: 一段 information_id
+    """
+    last_id = 0
+    while True:
+        rows = list(
+            ResourceInformationList
+            .select(ResourceInformationList.list_id, ResourceInformationList.information_id)
+            .where(ResourceInformationList.list_id > last_id)
+            .order_by(ResourceInformationList.list_id)
+            .limit(chunk_size)
+            .tuples()
+        )
+        if not rows:
+            return
+        yield [information_id for _, information_id in rows]
+        last_id = rows[-1][0]
+
+
+def probe_stored_ids(uids: List[str], chunk_size: int) -> Set[str]:
+    """
+    定向查询数据库中实际存在的 id
+
+    Args:
+        uids: 待确认的 information_id
+        chunk_size: 每次 IN 查询携带的 id 数量
+
+    Returns:
+        Set[str]: 已入库的 id
+    """
+    existing = set()
+    for start in range(0, len(uids), chunk_size):
+        chunk = uids[start:start + chunk_size]
+        query = (ResourceInformationList
+                 .select(ResourceInformationList.information_id)
+                 .where(ResourceInformationList.information_id.in_(chunk))
+                 .tuples())
+        existing.update(row[0] for row in query)
+    return existing
+
+
+class DedupIndex:
+    """
+    已入库 information_id 的有界索引。
+
+    查找顺序：
+    1. LRU 命中：确认已存在（hits）
+    2. 布隆过滤器未命中：一定不存在，无需查库（misses）
+    3. 布隆过滤器命中：用 ``WHERE information_id IN (...)`` 定向查库确认，
+       查不到的计为误判（false_positives）
+
+    尚未入库的 id 由当前批次（claiming() 绑定的认领标识）认领后才返回，同一进程中并发的其他批次
+    视为重复（contended），避免两个批次在提交前同时写入同一个 id；批次重试时沿用之前的认领。
+    认领在 add_many（已提交）或 release_many（写入失败、记录被丢弃）时删除，未删除的在 claim_ttl 秒后失效。
+
+    注意：布隆过滤器只包含本进程预热和写入过的 id，
+    多个 worker 同时写同一张表时需要使用共享的去重后端（DEDUP_CONFIG['backend'] = 'redis'）。
+
+    Attributes
+    ----------
+    bloom : BloomFilter
+        所有已知 id 的布隆过滤器，内存占用固定。
+    lru_size : int
+        已确认 id 的 LRU 容量。
+    """
+
+    def __init__(self, bloom_capacity: int, bloom_error_rate: float, lru_size: int,
+                 probe_chunk_size: int = 1000, warm_chunk_size: int = 10000, claim_ttl: float = 600):
+        self.bloom = BloomFilter(bloom_capacity, bloom_error_rate)
+        self.lru_size = lru_size
+        self.probe_chunk_size = probe_chunk_size
+        self.warm_chunk_size = warm_chunk_size
+        self.claim_ttl = claim_ttl
+        self._confirmed = OrderedDict()
+        # 尚未提交的 id -> (认领标识, 失效时间)
+        self._claims = {}
+        self._next_prune = 0.0
+        self._lock = threading.Lock()
+        self._warmed = False
+        self.hits = 0
+        self.misses = 0
+        self.contended = 0
+        self.false_positives = 0
+        self.probes = 0
+
+    def _remember(self, uid: str):
+        """将 id 记入 LRU（调用方需持有锁）"""
+        self._confirmed[uid] = None
+        self._confirmed.move_to_end(uid)
+        if len(self._confirmed) > self.lru_size:
+            self._confirmed.popitem(last=False)
+
+    def _claim(self, uid: str, token: Optional[str], now: float) -> bool:
+        """由 token 认领 id，已被其他未失效的认领持有时返回 False（调用方需持有锁）"""
+        claim = self._claims.get(uid)
+        if claim is not None and claim[0] != token and claim[1] > now:
+            return False
+        self._claims[uid] = (token, now + self.claim_ttl)
+        return True
+
+    def _prune_claims(self, now: float):
+        """每隔 claim_ttl 秒删除已失效的认领（如被隔离为毒消息、未释放的记录），调用方需持有锁"""
+        if now < self._next_prune:
+            return
+        self._claims = {uid: claim for uid, claim in self._claims.items() if claim[1] > now}
+        self._next_prune = now + self.claim_ttl
+
+    def warm(self):
+        """
+        从数据库分段加载全部 information_id，只执行一次。
+        """
+        with self._lock:
+            if self._warmed:
+                return
+            total = 0
+            for chunk in iter_stored_ids(self.warm_chunk_size):
+                for information_id in chunk:
+                    self.bloom.add(information_id)
+                    self._remember(information_id)
+                total += len(chunk)
+            self._warmed = True
+        logger.info(f"去重索引预热完成，共加载 {total} 个 id，布隆过滤器占用 {self.bloom.size_in_bytes} 字节")
+
+    def filter_new(self, uids: Iterable[str]) -> Set[str]:
+        """
+        返回给定 id 中尚未入库的部分
+
+        Args:
+            uids: 待检查的 information_id
+
+        Returns:
+            Set[str]: 不存在于数据库中、且由当前批次认领的 id
+        """
+        self.warm()
+        token = current_claim_token()
+        candidates = []
+        suspects = []
+        with self._lock:
+            for uid in set(uids):
+                if uid in self._confirmed:
+                    self._confirmed.move_to_end(uid)
+                    self.hits += 1
+                elif uid not in self.bloom:
+                    candidates.append(uid)
+                else:
+                    suspects.append(uid)
+
+        if suspects:
+            existing = probe_stored_ids(suspects, self.probe_chunk_size)
+            with self._lock:
+                self.probes += len(suspects)
+                for uid in suspects:
+                    if uid in existing:
+                        self.hits += 1
+                        self._remember(uid)
+                    else:
+                        self.false_positives += 1
+                        candidates.append(uid)
+
+        new_ids = set()
+        now = time.monotonic()
+        with self._lock:
+            self._prune_claims(now)
+            for uid in candidates:
+                if self._claim(uid, token, now):
+                    new_ids.add(uid)
+                else:
+                    self.contended += 1
+            self.misses += len(new_ids)
+        return new_ids
+
+    def add_many(self, uids: Iterable[str]):
+        """
+        记录已成功提交到数据库的 id，并删除对应的认领
+
+        Args:
+            uids: 已入库的 information_id
+        """
+        with self._lock:
+            for uid in uids:
+                self.bloom.add(uid)
+                self._remember(uid)
+                self._claims.pop(uid, None)
+
+    def release_many(self, uids: Iterable[str]):
+        """
+        批次写入失败或记录被丢弃时删除当前批次持有的认领
+
+        Args:
+            uids: 写入失败或被丢弃的 information_id
+        """
+        token = current_claim_token()
+        with self._lock:
+            for uid in uids:
+                claim = self._claims.get(uid)
+                if claim is not None and claim[0] == token:
+                    del self._claims[uid]
+
+    def stats(self) -> dict:
+        """返回命中、未命中及误判计数"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'contended': self.contended,
+                'false_positives': self.false_positives,
+                'probes': self.probes,
+                'claims': len(self._claims),
+                'lru_entries': len(self._confirmed),
+                'bloom_entries': self.bloom.count,
+                'bloom_bytes': self.bloom.size_in_bytes,
+            }
+
+
+def current_claim_token() -> Optional[str]:
+    """
+    返回当前线程正在执行的消费批次的认领标识，不在批次中执行时返回 None
+    """
+    return getattr(_local, 'claim_token', None)
+
+
+@contextmanager
+def claiming(token: Optional[str]):
+    """
+    在当前线程中绑定消费批次的认领标识，期间共享去重后端以该标识认领和释放 id。
+    同一批次的重试、二分隔离及暂停后重新执行应使用同一个标识，才能沿用之前认领的 id
+    """
+    previous = getattr(_local, 'claim_token', None)
+    _local.claim_token = token
+    try:
+        yield token
+    finally:
+        _local.claim_token = previous
+
+
+_dedup_index = None
+_dedup_index_lock = threading.Lock()
+
+
+def _collect_dedup_metrics():
+    """导出去重索引的命中、未命中、误判计数及占用，只导出当前后端提供的指标"""
+    if _dedup_index is None:
+        return []
+    stats = _dedup_index.stats()
+    lookups = [({'result': result}, stats[key]) for key, result in (
+        ('hits', 'hit'), ('misses', 'miss'), ('false_positives', 'false_positive'), ('contended', 'contended'),
+    ) if key in stats]
+    entries = [({'structure': structure}, stats[key]) for key, structure in (
+        ('lru_entries', 'lru'), ('bloom_entries', 'bloom'), ('claims', 'claim'),
+    ) if key in stats]
+    metrics = [
+        ('dedup_index_lookups_total', 'counter',
+         '去重索引查找次数，result 为 hit/miss/false_positive/contended', lookups),
+        ('dedup_index_probes_total', 'counter', '去重索引定向查库的 id 数', [({}, stats['probes'])]),
+    ]
+    if entries:
+        metrics.append(('dedup_index_entries', 'gauge', '去重索引中的条目数', entries))
+    if 'bloom_bytes' in stats:
+        metrics.append(('dedup_index_bloom_bytes', 'gauge', '布隆过滤器占用字节数', [({}, stats['bloom_bytes'])]))
+    return metrics
+
+
+registry.register_collector(_collect_dedup_metrics)
+
+
+def dedup_index_enabled() -> bool:
+    """
+    是否使用去重索引：开启去重且写入模式不是 upsert。
+    upsert 模式下已入库的资讯需要交给入库阶段按内容比对更新，去重阶段不查询索引，也不构建和预热索引
+    """
+    return DEDUP_CONFIG['enabled'] and WRITE_CONFIG['mode'] != 'upsert'
+
+
+def get_dedup_index():
+    """
+    获取全局去重索引实例（按 DEDUP_CONFIG 懒加载创建）。
+    backend 为 local 时使用进程内索引，为 redis 时使用多个 worker 共享的 Redis 索引。
+
+    Returns:
+        Union[DedupIndex, RedisDedupIndex]: 去重索引实例
+    """
+    global _dedup_index
+    if _dedup_index is None:
+        with _dedup_index_lock:
+            if _dedup_index is None:
+                backend = DEDUP_CONFIG.get('backend', 'local')
+                if backend == 'redis':
+                    from application.cache.redis_dedup_index import RedisDedupIndex
+                    _dedup_index = RedisDedupIndex.from_config(DEDUP_CONFIG)
+                elif backend == 'local':
+                    _dedup_index = DedupIndex(
+                        bloom_capacity=DEDUP_CONFIG['bloom_capacity'],
+                        bloom_error_rate=DEDUP_CONFIG['bloom_error_rate'],
+                        lru_size=DEDUP_CONFIG['lru_size'],
+                        probe_chunk_size=DEDUP_CONFIG['probe_chunk_size'],
+                        warm_chunk_size=DEDUP_CONFIG['warm_chunk_size'],
+                        claim_ttl=DEDUP_CONFIG['claim_ttl'],
+                    )
+                else:
+                    raise ValueError(f"未知的去重后端: {backend}")
+    return _dedup_index
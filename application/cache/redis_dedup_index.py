@@ -0,0 +1,262 @@
+"""
+Redis 去重索引
+多个 worker 共享已入库 information_id 的集合，并通过认领键避免并发批次重复写入同一个 id
+"""
+
+import os
+import socket
+import threading
+import time
+import uuid
+from typing import Iterable, List, Set
+
+from application.cache.dedup_index import current_claim_token, iter_stored_ids, probe_stored_ids
+from application.utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class RedisDedupIndex:
+    """
+    基于 Redis 的共享去重索引，接口与 DedupIndex 相同。
+
+    每个批次的查找分两步，均为一次往返：
+    1. ``SMISMEMBER``（bloom 结构为 ``BF.MEXISTS``）过滤已入库的 id（hits）；
+       bloom 结构命中的 id 再定向查库确认，查不到的计为误判（false_positives）
+    2. 剩余 id 用流水线 ``SET <key>:claim:<id> <token> NX EX`` 认领，认领成功（或已由当前批次认领，
+       如批次重试）的才视为新记录（misses）；已被其他批次认领的视为重复（contended）
+
+    认领标识为实例标识加上 claiming() 绑定的批次标识，同一进程中并发的批次互不视为已认领；
+    不在批次中调用时使用实例标识。
+
+    写入提交后 add_many 用流水线 ``SADD``（``BF.MADD``）记入共享集合并删除认领键；
+    写入失败或记录被丢弃时 release_many 删除当前批次的认领键，以便重新投递的消息可以立即处理。
+    worker 异常退出时认领键在 claim_ttl 后过期。
+
+    已入库集合在首次启动时从 MySQL 预热，由 ``<key>:warmed`` 标记保证只有一个 worker 执行，
+    其他 worker 等待预热完成。
+
+    Attributes
+    ----------
+    client : redis.Redis
+        Redis 客户端，可注入（如测试时使用 fakeredis）。
+    key : str
+        已入库 id 集合的键名。
+    structure : str
+        set（精确集合）或 bloom（RedisBloom 布隆过滤器，内存固定）。
+    token : str
+        本实例的认领标识，批次的认领标识以此为前缀。
+    """
+
+    def __init__(self, client, key: str = 'dedup:resource_information_list', structure: str = 'set',
+                 claim_ttl: int = 600, probe_chunk_size: int = 1000, warm_chunk_size: int = 10000,
+                 warm_timeout: float = 600, warm_poll_interval: float = 1.0,
+                 bloom_capacity: int = 5_000_000, bloom_error_rate: float = 0.001):
+        if structure not in ('set', 'bloom'):
+            raise ValueError(f"未知的 Redis 去重结构: {structure}")
+        self.client = client
+        self.key = key
+        self.structure = structure
+        self.claim_ttl = claim_ttl
+        self.probe_chunk_size = probe_chunk_size
+        self.warm_chunk_size = warm_chunk_size
+        self.warm_timeout = warm_timeout
+        self.warm_poll_interval = warm_poll_interval
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+        self.token = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self._lock = threading.Lock()
+        self._warmed = False
+        self.hits = 0
+        self.misses = 0
+        self.contended = 0
+        self.false_positives = 0
+        self.probes = 0
+
+    @classmethod
+    def from_config(cls, config: dict, client=None) -> 'RedisDedupIndex':
+        """
+        根据 DEDUP_CONFIG 格式的配置创建实例，未传入 client 时使用 redis_database 对应的连接
+        """
+        if client is None:
+            from application.db import get_redis_connection
+            client = get_redis_connection(config.get('redis_database', 'default'))
+        return cls(
+            client,
+            key=config.get('redis_key', 'dedup:resource_information_list'),
+            structure=config.get('redis_structure', 'set'),
+            claim_ttl=config.get('claim_ttl', 600),
+            probe_chunk_size=config.get('probe_chunk_size', 1000),
+            warm_chunk_size=config.get('warm_chunk_size', 10000),
+            warm_timeout=config.get('warm_timeout', 600),
+            bloom_capacity=config.get('bloom_capacity', 5_000_000),
+            bloom_error_rate=config.get('bloom_error_rate', 0.001),
+        )
+
+    @staticmethod
+    def _text(value) -> str:
+        """客户端未开启 decode_responses 时返回 bytes，统一为 str"""
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+
+    @property
+    def claim_token(self) -> str:
+        """当前批次的认领标识"""
+        batch_token = current_claim_token()
+        return f'{self.token}:{batch_token}' if batch_token else self.token
+
+    def _claim_key(self, uid: str) -> str:
+        return f'{self.key}:claim:{uid}'
+
+    @property
+    def _warm_marker(self) -> str:
+        return f'{self.key}:warmed'
+
+    def warm(self):
+        """
+        首次启动时从数据库加载全部 information_id 到共享集合，每个进程只检查一次。
+        已有 worker 完成预热时直接返回，正在预热时等待其完成；预热失败时删除标记，由下一个 worker 重试。
+        """
+        with self._lock:
+            if self._warmed:
+                return
+            deadline = time.monotonic() + self.warm_timeout
+            while True:
+                if self.client.set(self._warm_marker, f'loading:{self.token}', nx=True, ex=int(self.warm_timeout)):
+                    try:
+                        total = self._load_stored_ids()
+                    except Exception:
+                        self.client.delete(self._warm_marker)
+                        raise
+                    self.client.set(self._warm_marker, 'done')
+                    logger.info(f"Redis 去重索引预热完成，共加载 {total} 个 id 到 {self.key}")
+                    break
+                if self._text(self.client.get(self._warm_marker)) == 'done':
+                    break
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"等待其他 worker 预热 Redis 去重索引 {self.key} 超时")
+                time.sleep(self.warm_poll_interval)
+            self._warmed = True
+
+    def _load_stored_ids(self) -> int:
+        """分段读取数据库中的 id 并流水线写入共享集合"""
+        if self.structure == 'bloom':
+            try:
+                self.client.execute_command('BF.RESERVE', self.key, self.bloom_error_rate, self.bloom_capacity)
+            except Exception as e:
+                # 布隆过滤器已存在（上次预热中途失败）时沿用
+                if 'exists' not in str(e).lower():
+                    raise
+        total = 0
+        for chunk in iter_stored_ids(self.warm_chunk_size):
+            self._add_stored(chunk)
+            total += len(chunk)
+        return total
+
+    def _add_stored(self, uids: List[str], pipe=None):
+        """将 id 写入共享集合，传入 pipe 时只追加命令"""
+        target = pipe if pipe is not None else self.client
+        if self.structure == 'bloom':
+            target.execute_command('BF.MADD', self.key, *uids)
+        else:
+            target.sadd(self.key, *uids)
+
+    def _stored_flags(self, uids: List[str]) -> List[bool]:
+        """逐个返回 id 是否在共享集合中"""
+        flags = []
+        for start in range(0, len(uids), self.probe_chunk_size):
+            chunk = uids[start:start + self.probe_chunk_size]
+            if self.structure == 'bloom':
+                flags.extend(bool(flag) for flag in self.client.execute_command('BF.MEXISTS', self.key, *chunk))
+            else:
+                flags.extend(bool(flag) for flag in self.client.smismember(self.key, chunk))
+        return flags
+
+    def _claim(self, uids: List[str]) -> Set[str]:
+        """
+        认领 id，返回由当前批次持有认领键的部分（包括当前批次之前认领、尚未提交的 id）
+        """
+        token = self.claim_token
+        pipe = self.client.pipeline(transaction=False)
+        for uid in uids:
+            pipe.set(self._claim_key(uid), token, nx=True, ex=self.claim_ttl)
+            pipe.get(self._claim_key(uid))
+        replies = pipe.execute()
+        owners = replies[1::2]
+        return {uid for uid, owner in zip(uids, owners) if self._text(owner) == token}
+
+    def filter_new(self, uids: Iterable[str]) -> Set[str]:
+        """
+        返回给定 id 中尚未入库、且由当前批次认领的部分
+
+        Args:
+            uids: 待检查的 information_id
+
+        Returns:
+            Set[str]: 由本批次负责写入的 id
+        """
+        self.warm()
+        uids = list(dict.fromkeys(uids))
+        if not uids:
+            return set()
+        candidates = [uid for uid, stored in zip(uids, self._stored_flags(uids)) if not stored]
+        hits = len(uids) - len(candidates)
+        false_positives = 0
+        if self.structure == 'bloom' and hits:
+            suspects = list(set(uids).difference(candidates))
+            existing = probe_stored_ids(suspects, self.probe_chunk_size)
+            false_positives = len(suspects) - len(existing)
+            hits = len(existing)
+            candidates.extend(uid for uid in suspects if uid not in existing)
+            with self._lock:
+                self.probes += len(suspects)
+        new_ids = self._claim(candidates) if candidates else set()
+        with self._lock:
+            self.hits += hits
+            self.false_positives += false_positives
+            self.misses += len(new_ids)
+            self.contended += len(candidates) - len(new_ids)
+        return new_ids
+
+    def add_many(self, uids: Iterable[str]):
+        """
+        记录已成功提交到数据库的 id，并删除对应的认领键
+
+        Args:
+            uids: 已入库的 information_id
+        """
+        uids = list(uids)
+        if not uids:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        self._add_stored(uids, pipe)
+        pipe.delete(*(self._claim_key(uid) for uid in uids))
+        pipe.execute()
+
+    def release_many(self, uids: Iterable[str]):
+        """
+        批次写入失败或记录被丢弃时删除当前批次持有的认领键
+
+        先读取认领者再删除，两步之间认领键恰好过期并被其他 worker 认领的情况忽略不计
+
+        Args:
+            uids: 写入失败或被丢弃的 information_id
+        """
+        uids = list(uids)
+        if not uids:
+            return
+        token = self.claim_token
+        owners = self.client.mget([self._claim_key(uid) for uid in uids])
+        owned = [self._claim_key(uid) for uid, owner in zip(uids, owners) if self._text(owner) == token]
+        if owned:
+            self.client.delete(*owned)
+
+    def stats(self) -> dict:
+        """返回命中、新增、被其他 worker 认领及误判计数"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'contended': self.contended,
+                'false_positives': self.false_positives,
+                'probes': self.probes,
+            }
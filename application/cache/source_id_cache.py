@@ -0,0 +1,116 @@
+"""
+来源 id 缓存
+缓存 resource_source_dict 中域名到 source_id 的映射，避免逐条查库
+"""
+
+import threading
+import time
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+from application.db.mysql_db.info.ResourceSourceDict import ResourceSourceDict
+from application.settings import SOURCE_CONFIG
+from application.utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class SourceIdCache:
+    """
+    域名 -> source_id 缓存。
+
+    - 首次使用及每隔 ttl 秒用一条查询整表加载
+    - 未知域名写入负缓存，negative_ttl 内不再查库，过期后批量定向查询
+
+    Attributes
+    ----------
+    ttl : float
+        整表刷新间隔（秒）。
+    negative_ttl : float
+        未知域名负缓存的有效期（秒）。
+    """
+
+    def __init__(self, ttl: float, negative_ttl: float):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._mapping: Dict[str, str] = {}
+        self._unknown: Dict[str, float] = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def parse_domain(url: str) -> str:
+        """
+        从链接中提取域名，例如 "www.nsfc.gov.cn"
+        """
+        return urlparse(url or '').netloc
+
+    def _refresh(self):
+        """一次查询加载整张来源表（调用方需持有锁）"""
+        query = ResourceSourceDict.select(ResourceSourceDict.source_main_link, ResourceSourceDict.source_id).tuples()
+        self._mapping = {domain: source_id for domain, source_id in query}
+        self._unknown.clear()
+        self._loaded_at = time.monotonic()
+        logger.info(f"来源缓存已刷新，共 {len(self._mapping)} 个域名")
+
+    def resolve_many(self, domains: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        批量解析域名对应的 source_id
+
+        Args:
+            domains: 域名集合
+
+        Returns:
+            Dict[str, Optional[str]]: 域名到 source_id 的映射，未知域名为 None
+        """
+        domains = set(domains)
+        now = time.monotonic()
+        with self._lock:
+            if self._loaded_at is None or now - self._loaded_at > self.ttl:
+                self._refresh()
+
+            # 负缓存过期的未知域名，合并为一次定向查询
+            expired = [
+                domain for domain in domains
+                if domain not in self._mapping
+                and now - self._unknown.get(domain, float('-inf')) > self.negative_ttl
+            ]
+            if expired:
+                query = (ResourceSourceDict
+                         .select(ResourceSourceDict.source_main_link, ResourceSourceDict.source_id)
+                         .where(ResourceSourceDict.source_main_link.in_(expired))
+                         .tuples())
+                self._mapping.update({domain: source_id for domain, source_id in query})
+                for domain in expired:
+                    if domain not in self._mapping:
+                        self._unknown[domain] = now
+
+            return {domain: self._mapping.get(domain) for domain in domains}
+
+    def resolve(self, domain: str) -> Optional[str]:
+        """
+        解析单个域名对应的 source_id，未知时返回 None
+        """
+        return self.resolve_many([domain])[domain]
+
+
+_source_id_cache = None
+_source_id_cache_lock = threading.Lock()
+
+
+def get_source_id_cache() -> SourceIdCache:
+    """
+    获取全局来源 id 缓存实例（按 SOURCE_CONFIG 懒加载创建）
+
+    Returns:
+        SourceIdCache: 来源 id 缓存实例
+    """
+    global _source_id_cache
+    if _source_id_cache is None:
+        with _source_id_cache_lock:
+            if _source_id_cache is None:
+                _source_id_cache = SourceIdCache(
+                    ttl=SOURCE_CONFIG['ttl'],
+                    negative_ttl=SOURCE_CONFIG['negative_ttl'],
+                )
+    return _source_id_cache
@@ -0,0 +1,123 @@
+"""
+自适应批次模块
+根据消费延迟和入库耗时动态调整每批的条数和等待时间
+"""
+
+from collections import Counter
+
+from application.utils import get_logger
+from application.utils.metrics import registry
+
+logger = get_logger(__name__)
+
+BATCH_SIZE_LIMIT = registry.gauge('batch_size_limit', '当前批次条数上限', ['consumer'])
+BATCH_TIMEOUT = registry.gauge('batch_timeout_seconds', '当前每批最长等待时间（秒）', ['consumer'])
+BATCH_ADJUSTMENTS = registry.counter('batch_adjustments', '批次参数调整次数', ['consumer', 'reason'])
+
+
+class AdaptiveBatcher:
+    """
+    批次大小调节器（加性增长、乘性收缩）。
+
+    - 入库耗时超过 target_latency：批次减半，reason=db_latency
+    - 消费延迟超过 lag_threshold 且批次已满、耗时达标：批次按 growth_factor 增长，reason=lag
+    - 批次未满且没有积压：缩短等待时间，空闲分区尽快落库，reason=idle
+
+    Attributes
+    ----------
+    size : int
+        当前批次条数上限。
+    timeout : float
+        当前每批最长等待时间（秒）。
+    max_bytes : int
+        每批消息体的字节上限。
+    last_reason : str
+        最近一次调整的原因。
+    adjustments : Counter
+        各调整原因的累计次数。
+    """
+
+    def __init__(self, size: int, timeout: float, name: str = 'default', adaptive: bool = False,
+                 min_size: int = 1, max_size: int = None, max_bytes: int = None,
+                 min_timeout: float = None, target_latency: float = 2.0,
+                 lag_threshold: float = 5.0, growth_factor: float = 1.5, shrink_factor: float = 0.5):
+        self.name = name
+        self.adaptive = adaptive
+        self.size = size
+        self.timeout = timeout
+        self.min_size = min_size
+        self.max_size = max_size or size
+        self.max_bytes = max_bytes
+        self.max_timeout = timeout
+        self.min_timeout = timeout if min_timeout is None else min_timeout
+        self.target_latency = target_latency
+        self.lag_threshold = lag_threshold
+        self.growth_factor = growth_factor
+        self.shrink_factor = shrink_factor
+        self.last_reason = 'initial'
+        self.adjustments = Counter()
+        BATCH_SIZE_LIMIT.labels(consumer=name).set(size)
+        BATCH_TIMEOUT.labels(consumer=name).set(timeout)
+
+    @classmethod
+    def from_config(cls, config: dict, name: str = 'default') -> 'AdaptiveBatcher':
+        """
+        根据 BATCH_CONFIG 格式的配置创建实例
+        """
+        return cls(
+            size=config['size'],
+            timeout=config['timeout'],
+            name=name,
+            adaptive=config.get('adaptive', False),
+            min_size=config.get('min_size', 1),
+            max_size=config.get('max_size'),
+            max_bytes=config.get('max_bytes'),
+            min_timeout=config.get('min_timeout'),
+            target_latency=config.get('target_latency', 2.0),
+            lag_threshold=config.get('lag_threshold', 5.0),
+        )
+
+    def _adjust(self, size: int, timeout: float, reason: str):
+        """应用一次调整并记录原因"""
+        if size == self.size and timeout == self.timeout:
+            return
+        logger.info(
+            f"批次参数调整 ({reason})：条数 {self.size} -> {size}，等待时间 {self.timeout:.2f} -> {timeout:.2f} 秒"
+        )
+        self.size = size
+        self.timeout = timeout
+        self.last_reason = reason
+        self.adjustments[reason] += 1
+        BATCH_SIZE_LIMIT.labels(consumer=self.name).set(size)
+        BATCH_TIMEOUT.labels(consumer=self.name).set(timeout)
+        BATCH_ADJUSTMENTS.labels(consumer=self.name, reason=reason).inc()
+
+    def observe(self, records: int, latency: float, lag: float):
+        """
+        根据一个批次的处理结果调整参数
+
+        Args:
+            records: 本批次条数
+            latency: 本批次 Pipeline 耗时（秒）
+            lag: 本批次最早一条消息距今的延迟（秒）
+        """
+        if not self.adaptive:
+            return
+        if latency > self.target_latency:
+            size = max(self.min_size, int(self.size * self.shrink_factor))
+            self._adjust(size, self.timeout, 'db_latency')
+        elif lag > self.lag_threshold and records >= self.size:
+            size = min(self.max_size, max(self.size + 1, int(self.size * self.growth_factor)))
+            self._adjust(size, self.max_timeout, 'lag')
+        elif records < self.size and lag <= self.lag_threshold:
+            timeout = max(self.min_timeout, self.timeout * self.shrink_factor)
+            self._adjust(self.size, timeout, 'idle')
+
+    def stats(self) -> dict:
+        """返回当前批次参数及各原因的调整次数"""
+        return {
+            'size': self.size,
+            'timeout': self.timeout,
+            'last_reason': self.last_reason,
+            'adjustments': dict(self.adjustments),
+        }
@@ -1,56 +1,497 @@
+import asyncio
+import time
+import uuid
 from abc import ABC
+from concurrent.futures import ThreadPoolExecutor
+
 from fasttransform import Pipeline
 
-from application.settings import BATCH_CONFIG
+from application.cache import claiming
+from application.consumers.adaptive_batcher import AdaptiveBatcher
+from application.consumers.batch_reader import BatchReader
+from application.consumers.retry import TRANSIENT_ERRORS, BatchRetrier, RejectedRecord
+from application.db import release_database_connections, write_behind
+from application.db.write_behind import WriteBehindBuffer
+from application.models.kafka_models.lazy_record import LazyRecord
+from application.settings import BATCH_CONFIG, EXECUTOR_CONFIG, RETRY_CONFIG, WRITE_BEHIND_CONFIG
 from application.utils import get_logger
+from application.utils.dead_letter import dead_letter_queue
+from application.utils.metrics import registry
 
 logger = get_logger(__name__)
 
+BATCH_RECORDS = registry.histogram('batch_records', '每个批次的记录数', ['consumer'],
+                                   buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000))
+BATCH_SECONDS = registry.histogram('batch_seconds', '一个批次在线程池中执行 Pipeline 的耗时（秒）', ['consumer'])
+RECORDS_CONSUMED = registry.counter('records_consumed', '消费的记录数', ['consumer'])
+RECORDS_FAILED = registry.counter('records_failed', '处理失败并写入死信队列的记录数', ['consumer'])
+END_TO_END_LAG = registry.histogram('end_to_end_lag_seconds', '消息时间戳到批次提交完成的延迟（秒）', ['consumer'],
+                                    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900, 3600))
+
 class BaseConsumer(ABC):
     """
     抽象基类，用于批量消费数据流并通过预定义的 Pipeline 处理数据。
 
+    Pipeline 中的数据库操作是阻塞的，因此每个批次都提交到有界线程池中执行，
+    事件循环只负责读取数据和确认偏移量，不会因 MySQL 读写而阻塞 Kafka 心跳。
+
     Attributes
     ----------
     batch_size : int
-        每次批量处理的数据条数，从配置 BATCH_CONFIG 获取。
+        每次批量处理的初始数据条数，从配置 BATCH_CONFIG 获取。
     timeout_seconds : int
-        批量获取数据时的超时时间（秒），从配置 BATCH_CONFIG 获取。
+        批量获取数据时的初始超时时间（秒），从配置 BATCH_CONFIG 获取。
+    max_workers : int
+        执行 Pipeline 的线程数，从配置 EXECUTOR_CONFIG 获取。
+    max_in_flight : int
+        同时处理中的最大批次数，达到上限时暂停读取，从配置 EXECUTOR_CONFIG 获取。
+    lazy : bool
+        是否延迟解码。开启时主题以 raw 方式接收消息体，每条消息包装为 LazyRecord，
+        只有访问 uid 以外的字段时才按 value_type 解码。
+    per_partition : bool
+        是否按分区拆分批次，从配置 BATCH_CONFIG 获取。开启时不同分区的批次并行处理，
+        同一分区的批次按读取顺序依次处理和确认，偏移量严格按顺序提交。
     pipe_list : list
         包含 Pipeline 步骤的列表，可在子类中定义具体处理流程。
     pipeline : Pipeline
         FastTransform Pipeline 实例，用于处理每批数据。
+    executor : ThreadPoolExecutor
+        执行 Pipeline 的线程池。
+    batcher : AdaptiveBatcher
+        批次参数调节器，开启 BATCH_CONFIG['adaptive'] 时根据延迟和耗时调整批次大小。
+    retrier : BatchRetrier
+        批次重试器，瞬时错误退避重试，非瞬时错误二分定位出错记录并写入死信队列。
+        瞬时错误重试耗尽时批次暂停后重新执行，不写入死信队列也不确认；
+        开启 per_partition 时同一分区后续的批次随之等待，并行名额占满后停止读取。
+    write_behind : Optional[WriteBehindBuffer]
+        写后缓冲，开启 WRITE_BEHIND_CONFIG['enabled'] 时创建。写入阶段的数据在多个批次间合并写入，
+        批次的事件在包含其数据的写入完成后才确认。
     """
 
     batch_size = BATCH_CONFIG['size']
     timeout_seconds = BATCH_CONFIG['timeout']
+    max_workers = EXECUTOR_CONFIG['max_workers']
+    max_in_flight = EXECUTOR_CONFIG['max_in_flight']
+    per_partition = BATCH_CONFIG.get('per_partition', False)
+    lazy = False
+    value_type = None
+    uid_header = 'uid'
+    write_behind_config = WRITE_BEHIND_CONFIG
     pipe_list = []
 
-    def __init__(self):
+    def __init__(self, name: str = None, batch_config: dict = None,
+                 max_workers: int = None, max_in_flight: int = None,
+                 value_type=None, lazy: bool = None, uid_header: str = None, write_behind: dict = None):
         """
-        初始化 BaseConsumer 实例，创建 Pipeline 对象。
+        初始化 BaseConsumer 实例，创建 Pipeline 对象和线程池。
+
+        Parameters
+        ----------
+        name : Optional[str]
+            消费者名称，作为日志和指标中的 consumer 标签，默认为类名；同一个类消费多个主题时用于区分。
+        batch_config : Optional[dict]
+            覆盖 BATCH_CONFIG 及类属性的批次配置，如 size、timeout、adaptive、per_partition。
+        max_workers : Optional[int]
+            覆盖类属性 max_workers。
+        max_in_flight : Optional[int]
+            覆盖类属性 max_in_flight。
+        value_type : Optional[Type[faust.Record]]
+            消息的数据结构，延迟解码时用于构建 Record。
+        lazy : Optional[bool]
+            覆盖类属性 lazy。
+        uid_header : Optional[str]
+            延迟解码时携带 uid 的消息头名称。
+        write_behind : Optional[dict]
+            覆盖 WRITE_BEHIND_CONFIG 及类属性的写后缓冲配置，如 enabled、max_rows、max_age。
         """
+        batch_config = batch_config or {}
+        if max_workers is not None:
+            self.max_workers = max_workers
+        if max_in_flight is not None:
+            self.max_in_flight = max_in_flight
+        if value_type is not None:
+            self.value_type = value_type
+        if lazy is not None:
+            self.lazy = lazy
+        if uid_header is not None:
+            self.uid_header = uid_header
+        if self.lazy and self.value_type is None:
+            raise ValueError(f"{self.__class__.__name__} 开启延迟解码时必须指定 value_type")
+        if 'per_partition' in batch_config:
+            self.per_partition = batch_config['per_partition']
+        self.name = name or self.__class__.__name__
         self.pipeline = Pipeline(self.pipe_list)
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix=self.name,
+        )
+        self.batcher = AdaptiveBatcher.from_config(
+            {**BATCH_CONFIG, 'size': self.batch_size, 'timeout': self.timeout_seconds, **batch_config}, name=self.name
+        )
+        self.retrier = BatchRetrier(
+            max_retries=RETRY_CONFIG['max_retries'],
+            base_delay=RETRY_CONFIG['base_delay'],
+            max_delay=RETRY_CONFIG['max_delay'],
+            on_retry=release_database_connections,  # 重试前归还可能已失效的连接，下次检出时重新探活
+            name=self.name,
+        )
+        write_behind_config = {**self.write_behind_config, **(write_behind or {})}
+        self.write_behind = None
+        if write_behind_config.get('enabled'):
+            self.write_behind = WriteBehindBuffer.from_config(write_behind_config, retrier=self.retrier, name=self.name)
+        # 等待写后缓冲写入后再确认事件的任务及其批次凭证
+        self._deferred_acks = {}
+        # 因瞬时错误暂停中的批次任务，停止消费时取消，不再等待数据库恢复
+        self._holding = set()
+        self._stopping = False
+
+    def verify(self):
+        """
+        启动时依次检查 Pipeline 各阶段依赖的外部条件（如 upsert 所需的唯一索引），不满足时抛出异常。
+        会访问数据库，需在线程池中调用。
+        """
+        try:
+            for stage in self.pipe_list:
+                if hasattr(stage, 'verify'):
+                    stage.verify()
+        finally:
+            release_database_connections()
 
     async def __call__(self, stream):
         """
         异步调用方法，从给定的数据流中按批次读取数据并处理。
 
+        每个批次在线程池中执行，处理中的批次达到 max_in_flight 时暂停读取；
+        批次的偏移量只在其 Pipeline 执行完成后才确认。
+        开启 per_partition 时读取的批次按分区拆分，同一分区的子批次等待前一个子批次完成后再执行；
+        一次读取的全部子批次完成后，按其中最长的执行耗时调整一次批次参数。
+        开启写后缓冲时，定时检查缓冲的等待时间，数据流结束（或 worker 停止）时写入缓冲中剩余的数据再确认。
+
         Parameters
         ----------
-        stream : AsyncIterable
-            异步数据流对象，必须实现 `take(batch_size, timeout_seconds)` 方法，
-            返回数据记录列表。
+        stream : faust.Stream
+            Faust 数据流对象。
 
         Returns
         -------
         None
         """
-        logger.info(f"开始消费数据流，批次大小={self.batch_size}，超时时间={self.timeout_seconds}秒")
-        async for records in stream.take(self.batch_size, self.timeout_seconds):
-            logger.info(f"接收到数据，共 {len(records)} 条记录")
+        logger.info(
+            f"{self.name} 开始消费数据流，批次大小={self.batcher.size}，超时时间={self.batcher.timeout}秒，"
+            f"线程数={self.max_workers}，最大并行批次={self.max_in_flight}，按分区处理={self.per_partition}"
+        )
+        source = stream.noack()
+        reader = BatchReader(source, buffer_size=self.batcher.max_size * self.max_in_flight)
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        pending = set()
+        # 每个分区最后提交的子批次，新的子批次需等待其完成
+        tails = {}
+        flusher = asyncio.ensure_future(self._flush_periodically()) if self.write_behind is not None else None
+        self._stopping = False
+        try:
+            async for events in reader.batches(self.batcher):
+                lag = self._batch_lag(events)
+                tasks = []
+                for partition, partition_events in self._split_by_partition(events):
+                    # 背压：线程池饱和时在此等待，读取队列写满后自动停止拉取
+                    await in_flight.acquire()
+                    task = asyncio.ensure_future(self._process_batch(
+                        source, partition_events, in_flight, previous=tails.get(partition),
+                    ))
+                    tasks.append(task)
+                    pending.add(task)
+                    task.add_done_callback(pending.discard)
+                    if partition is not None:
+                        tails[partition] = task
+                        task.add_done_callback(
+                            lambda done, key=partition: tails.pop(key) if tails.get(key) is done else None
+                        )
+                observer = asyncio.ensure_future(self._observe_read(tasks, len(events), lag))
+                pending.add(observer)
+                observer.add_done_callback(pending.discard)
+        except asyncio.CancelledError:
+            # worker 停止：暂停中的批次不再等待，不确认，重启后重新消费
+            self._stopping = True
+            for task in list(self._holding):
+                task.cancel()
+            raise
+        finally:
+            reader.close()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            if flusher is not None:
+                flusher.cancel()
+                await asyncio.get_running_loop().run_in_executor(self.executor, self._flush_write_behind, 'shutdown')
+                # 仍因瞬时错误留在缓冲中的批次不确认，重启后重新消费
+                for task, batch in list(self._deferred_acks.items()):
+                    if not batch.done:
+                        task.cancel()
+                if self._deferred_acks:
+                    await asyncio.gather(*self._deferred_acks, return_exceptions=True)
+
+    def _split_by_partition(self, events):
+        """
+        按 (主题, 分区) 拆分批次，保持分区内的原有顺序；未开启 per_partition 时整批返回，分区键为 None
+
+        Returns
+        -------
+        List[Tuple[Optional[tuple], list]]
+            分区键及该分区的事件列表。
+        """
+        if not self.per_partition:
+            return [(None, events)]
+        partitions = {}
+        for event in events:
+            partitions.setdefault((event.message.topic, event.message.partition), []).append(event)
+        return list(partitions.items())
+
+    async def _observe_read(self, tasks, read_size: int, lag: float):
+        """
+        一次读取拆分出的子批次全部完成后调整一次批次参数，耗时取各子批次中最长的一个；
+        子批次全部失败或被取消时不调整
+        """
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        elapsed = [result for result in results if isinstance(result, float)]
+        if elapsed:
+            self.batcher.observe(read_size, max(elapsed), lag)
+
+    @staticmethod
+    def _batch_lag(events) -> float:
+        """
+        计算批次中最早一条消息的时间戳距今的秒数，作为消费延迟
+        """
+        timestamps = [event.message.timestamp for event in events if getattr(event.message, 'timestamp', None)]
+        return time.time() - min(timestamps) if timestamps else 0.0
+
+    def _observe_end_to_end_lag(self, events):
+        """
+        记录每条消息从产生（消息时间戳）到批次提交完成的延迟
+        """
+        histogram = END_TO_END_LAG.labels(consumer=self.name)
+        now = time.time()
+        for event in events:
+            timestamp = getattr(event.message, 'timestamp', None)
+            if timestamp:
+                histogram.observe(now - timestamp)
+
+    def _run_pipeline(self, records, batch=None, claim_token=None):
+        """
+        在工作线程中执行 Pipeline（带重试和失败隔离），结束后将该线程的数据库连接归还连接池。
+        传入写后缓冲凭证时，写入阶段的数据加入缓冲，执行结束后缓冲达到阈值则在本线程中写入。
+        传入认领标识时，共享去重后端以该标识认领本批次的 id。
+
+        Returns
+        -------
+        Tuple[list, list]
+            成功部分的处理结果，以及失败记录和对应异常。
+        """
+        try:
+            if batch is None:
+                with claiming(claim_token):
+                    return self.retrier.run(self.pipeline, records)
+            with write_behind.collecting(batch), claiming(claim_token):
+                result = self.retrier.run(self.pipeline, records)
+            self.write_behind.seal(batch)
+            reason = self.write_behind.due()
+            if reason is not None:
+                self.write_behind.flush(reason)
+            return result
+        finally:
+            release_database_connections()
+
+    def _flush_write_behind(self, reason: str):
+        """在工作线程中写入写后缓冲的全部数据；停止时（shutdown）仍未能写入的数据丢弃并释放去重认领，对应批次不确认"""
+        try:
+            self.write_behind.flush(reason)
+            if reason == 'shutdown':
+                self.write_behind.abandon()
+        finally:
+            release_database_connections()
+
+    async def _flush_periodically(self):
+        """定时检查写后缓冲，最早一条数据等待超过 max_age 时写入"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.write_behind.poll_interval)
+            reason = self.write_behind.due()
+            if reason is not None:
+                await loop.run_in_executor(self.executor, self._flush_write_behind, reason)
+
+    def _decode(self, event):
+        """
+        获取事件对应的记录，开启延迟解码时将原始消息体包装为 LazyRecord
+        """
+        if self.lazy and isinstance(event.value, (bytes, bytearray)):
+            return LazyRecord.from_message(event.message, self.value_type, self.uid_header)
+        return event.value
+
+    async def _dead_letter(self, events, records, failures):
+        """
+        将失败记录连同来源主题、分区、偏移量写入死信队列，等待全部发送完成，发送失败时抛出异常。
+        管道阶段通过 reject 丢弃的记录以其丢弃原因写入
+        """
+        RECORDS_FAILED.labels(consumer=self.name).inc(len(failures))
+        events_by_record = {id(record): event for record, event in zip(records, events)}
+        futures = []
+        for record, error in failures:
+            event = events_by_record.get(id(record))
+            metadata = {} if event is None else {
+                'topic': event.message.topic,
+                'partition': event.message.partition,
+                'offset': event.message.offset,
+            }
+            if isinstance(error, RejectedRecord):
+                futures.append(dead_letter_queue.send(record, reason=str(error), metadata=metadata, awaited=True))
+            else:
+                futures.append(dead_letter_queue.send(record, reason='批次处理失败', error=error, metadata=metadata,
+                                                      awaited=True))
+        await dead_letter_queue.wait(futures)
+
+    async def _dead_letter_rows(self, events, failures):
+        """
+        将写后缓冲中写入失败的数据写入死信队列，数据已与原始记录分离，元数据记录批次的偏移量范围；
+        等待全部发送完成，发送失败时抛出异常
+        """
+        RECORDS_FAILED.labels(consumer=self.name).inc(len(failures))
+        first, last = events[0].message, events[-1].message
+        futures = []
+        for row, error in failures:
+            futures.append(dead_letter_queue.send(row, reason='批次写入失败', error=error, metadata={
+                'topic': first.topic,
+                'partition': first.partition,
+                'offsets': [first.offset, last.offset],
+            }, awaited=True))
+        await dead_letter_queue.wait(futures)
+
+    async def _ack_after_flush(self, stream, events, records, batch):
+        """
+        等待包含本批次数据的写后缓冲写入完成，写入失败的数据写入死信队列后确认本批次的全部事件。
+        瞬时错误时数据留在缓冲中重新写入，批次一直等待；被取消（停止时仍未写入）或死信发送失败时不确认
+        """
+        await batch.wait()
+        try:
+            if batch.error is not None:
+                await self._dead_letter(events, records, [(record, batch.error) for record in records])
+            elif batch.failures:
+                await self._dead_letter_rows(events, batch.failures)
+            await dead_letter_queue.drain()
+        except Exception as e:
+            logger.error(f"{self.name} 死信发送失败，批次不确认，重启后重新消费: {e}", exc_info=True)
+            return
+        self._observe_end_to_end_lag(events)
+        for event in events:
+            await stream.ack(event)
+
+    async def _run_until_settled(self, records):
+        """
+        在线程池中执行批次的 Pipeline。重试耗尽后仍为瞬时错误（如数据库持续不可用）时按 retrier.backoff 暂停后重新执行，
+        直至成功或出现非瞬时错误，期间批次不确认。开启写后缓冲时每次执行使用新的凭证，执行失败时丢弃其加入的数据；
+        缓冲因瞬时错误等待重新写入时暂停执行新的批次。每次执行使用同一个去重认领标识，沿用之前认领的 id。
+
+        Returns
+        -------
+        Tuple[list, list, float, Optional[WriteBehindBatch]]
+            成功部分的处理结果、失败记录和对应异常、最后一次执行的耗时及写后缓冲凭证。
+        """
+        loop = asyncio.get_running_loop()
+        claim_token = uuid.uuid4().hex
+        attempt = 0
+        while True:
+            while self.write_behind is not None and self.write_behind.backing_off:
+                await self._hold(self.write_behind.poll_interval)
+            batch = self.write_behind.open_batch(claim_token) if self.write_behind is not None else None
+            start = time.perf_counter()
+            try:
+                result, failures = await loop.run_in_executor(self.executor, self._run_pipeline, records, batch,
+                                                               claim_token)
+                return result, failures, time.perf_counter() - start, batch
+            except TRANSIENT_ERRORS as e:
+                if batch is not None:
+                    self.write_behind.discard(batch)
+                delay = self.retrier.hold(attempt)
+                attempt += 1
+                logger.error(f"{self.name} 批次重试耗尽仍出现瞬时错误，暂停 {delay:.1f} 秒后第 {attempt} 次重新执行: {e}")
+                await self._hold(delay)
+            except BaseException:
+                if batch is not None:
+                    self.write_behind.discard(batch)
+                raise
+
+    async def _hold(self, delay: float):
+        """暂停当前批次 delay 秒，停止消费后不再暂停，直接取消"""
+        if self._stopping:
+            raise asyncio.CancelledError()
+        task = asyncio.current_task()
+        self._holding.add(task)
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self._holding.discard(task)
+
+    async def _process_batch(self, stream, events, in_flight, previous=None):
+        """
+        在线程池中执行一个批次的 Pipeline，失败记录写入死信队列并等待发送完成后确认该批次的全部事件，
+        死信发送失败时不确认。
+        传入 previous 时先等待同一分区的上一个批次完成，保证分区内按顺序写入和确认。
+        开启写后缓冲时批次执行完即释放并行名额，事件在包含其数据的写入完成后才确认。
+
+        Parameters
+        ----------
+        stream : faust.Stream
+            用于确认事件的数据流。
+        events : list
+            本批次的事件列表。
+        in_flight : asyncio.Semaphore
+            并行批次信号量，处理结束后释放。
+        previous : Optional[asyncio.Task]
+            同一分区的上一个批次。
+
+        Returns
+        -------
+        Optional[float]
+            批次在线程池中的执行耗时，批次整体失败时为 None。
+        """
+        if previous is not None:
+            try:
+                await asyncio.wait([previous])
+            except asyncio.CancelledError:
+                # 尚未处理的批次不确认，重启后重新消费
+                in_flight.release()
+                raise
+        records = [self._decode(event) for event in events]
+        logger.info(f"{self.name} 接收到数据，共 {len(records)} 条记录")
+        RECORDS_CONSUMED.labels(consumer=self.name).inc(len(records))
+        BATCH_RECORDS.labels(consumer=self.name).observe(len(records))
+        batch = None
+        elapsed = None
+        try:
             try:
-                result = self.pipeline(records)
-                logger.info(f"批次处理成功，处理结果条数: {len(result)}")
+                result, failures, elapsed, batch = await self._run_until_settled(records)
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                logger.error(f"批次处理出错: {e}", exc_info=True)
\ No newline at end of file
+                logger.error(f"{self.name} 批次处理出错: {e}", exc_info=True)
+                result, failures = [], [(record, e) for record in records]
+            else:
+                BATCH_SECONDS.labels(consumer=self.name).observe(elapsed)
+                logger.info(f"{self.name} 批次处理完成，处理结果条数: {len(result)}，失败条数: {len(failures)}")
+            if failures:
+                await self._dead_letter(events, records, failures)
+            if batch is None:
+                # 管道阶段中直接写入的死信同样在确认前等待发送完成
+                await dead_letter_queue.drain()
+                self._observe_end_to_end_lag(events)
+                for event in events:
+                    await stream.ack(event)
+            else:
+                task = asyncio.ensure_future(self._ack_after_flush(stream, events, records, batch))
+                self._deferred_acks[task] = batch
+                task.add_done_callback(lambda done: self._deferred_acks.pop(done, None))
+        except asyncio.CancelledError:
+            # 线程池中的批次可能尚未执行完，写入结果未知，不确认，重启后重新消费
+            raise
+        except Exception as e:
+            logger.error(f"{self.name} 死信发送失败，批次不确认，重启后重新消费: {e}", exc_info=True)
+        finally:
+            in_flight.release()
+        return elapsed
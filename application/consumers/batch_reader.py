@@ -0,0 +1,117 @@
+"""
+批次读取模块
+从 Faust 流中读取事件并按数量或超时组成批次
+"""
+
+import asyncio
+from typing import AsyncIterator, List, Optional
+
+from application.utils import get_logger
+
+logger = get_logger(__name__)
+
+# 流结束标记
+_END = object()
+
+
+def event_size(event) -> int:
+    """
+    获取事件消息体的序列化字节数，无法获取时返回 0
+    """
+    message = getattr(event, 'message', None)
+    size = getattr(message, 'serialized_value_size', None)
+    if size is None:
+        value = getattr(message, 'value', None)
+        size = len(value) if isinstance(value, (bytes, bytearray)) else 0
+    return size
+
+
+class BatchReader:
+    """
+    按 ``take(size, timeout)`` 语义组批的事件读取器，与 ``stream.take`` 的区别在于：
+
+    - 返回的是事件而不是值，调用方可在处理完成后再确认（ack）
+    - 后台读取任务写入有界队列，消费端不取数据时队列写满，读取自动暂停，形成背压
+
+    Attributes
+    ----------
+    stream : faust.Stream
+        已关闭自动确认（``stream.noack()``）的数据流。
+    buffer_size : int
+        预读队列容量。
+    """
+
+    def __init__(self, stream, buffer_size: int):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self._queue = asyncio.Queue(maxsize=buffer_size)
+        self._task = None
+        self._finished = False
+        self._error = None
+
+    async def _fill(self):
+        """后台任务：持续从流中读取事件放入队列，读取出错时记录异常，由 batches 在产出已读取的事件后抛出"""
+        try:
+            async for event in self.stream.events():
+                await self._queue.put(event)
+        except Exception as e:
+            logger.error(f"读取数据流出错: {e}", exc_info=True)
+            self._error = e
+        await self._queue.put(_END)
+
+    async def take(self, size: int, timeout: float, max_bytes: Optional[int] = None) -> List:
+        """
+        读取下一批事件，凑满 size 条、达到 max_bytes 字节或等待 timeout 秒后返回
+
+        Args:
+            size: 批次最大条数
+            timeout: 最长等待时间（秒）
+            max_bytes: 批次消息体字节上限，None 表示不限制
+
+        Returns:
+            List: 事件列表，超时且无数据或流已结束时为空
+        """
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._fill())
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        batch = []
+        batch_bytes = 0
+        while len(batch) < size and (max_bytes is None or batch_bytes < max_bytes):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                event = await asyncio.wait_for(self._queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if event is _END:
+                self._finished = True
+                break
+            batch.append(event)
+            if max_bytes is not None:
+                batch_bytes += event_size(event)
+        return batch
+
+    async def batches(self, batcher) -> AsyncIterator[List]:
+        """
+        持续产出非空批次，直到流结束。每批开始前重新读取批次参数，
+        因此 batcher 的调整会在下一批立即生效。
+
+        读取数据流出错时，产出出错前已读取的事件后重新抛出该异常，由 Faust 的 Agent 监督器处理，
+        不会像正常结束一样静默停止消费。
+
+        Args:
+            batcher: 提供 size、timeout、max_bytes 属性的批次参数对象（AdaptiveBatcher）
+        """
+        while not self._finished:
+            batch = await self.take(batcher.size, batcher.timeout, batcher.max_bytes)
+            if batch:
+                yield batch
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        """停止后台读取任务"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
@@ -1,6 +1,9 @@
 from application.consumers.base_consumer import BaseConsumer
 from application.pipelines.information_deduplication_pipeline import InformationDeduplicationPipeline
 from application.pipelines.information_into_pipeline import InformationIntoPipeline
+from application.pipelines.information_source_pipeline import InformationSourcePipeline
+from application.pipelines.information_tag_pipeline import InformationTagPipeline
+from application.pipelines.pipeline_graph import PipelineGraph
 
 
 class InformationConsumer(BaseConsumer):
@@ -8,9 +11,10 @@ class InformationConsumer(BaseConsumer):
     具体的数据消费者类，继承自 BaseConsumer。
     负责按批次处理信息数据流，并执行以下处理流程：
 
-    1. 格式化日期 (TranlateDatePipeline)
-    2. 数据入库 (InformationIntoPipeline)
-    3. 可扩展其他后续处理步骤
+    1. 去重 (InformationDeduplicationPipeline)
+    2. 并行补充字段 (PipelineGraph)：来源解析 (InformationSourcePipeline)、标签映射 (InformationTagPipeline)
+    3. 数据入库 (InformationIntoPipeline)
+    4. 可扩展其他后续处理步骤
 
     Attributes
     ----------
@@ -18,4 +22,8 @@ class InformationConsumer(BaseConsumer):
         包含本消费者的处理 Pipeline 列表，按顺序执行。
     """
     # 定义具体处理流程的 Pipeline 顺序
-    pipe_list = [InformationDeduplicationPipeline(), InformationIntoPipeline()]
+    pipe_list = [
+        InformationDeduplicationPipeline(),
+        PipelineGraph(InformationSourcePipeline(), InformationTagPipeline(), name='information_enrich'),
+        InformationIntoPipeline(),
+    ]
@@ -0,0 +1,195 @@
+"""
+批次重试模块
+对瞬时数据库错误做指数退避重试，持续失败时二分批次定位出错记录
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, List, Tuple
+
+from peewee import InterfaceError, OperationalError
+
+from application.utils import get_logger
+from application.utils.dead_letter import dead_letter_queue
+from application.utils.metrics import registry
+
+logger = get_logger(__name__)
+
+_local = threading.local()
+
+RETRY_EVENTS = registry.counter('batch_retry_events', '批次重试相关事件数，event 为 retries/bisections/poison_records/holds',
+                                ['consumer', 'event'])
+
+# 视为瞬时错误、值得重试的异常（连接断开、锁等待超时、死锁等）
+TRANSIENT_ERRORS = (OperationalError, InterfaceError)
+
+try:
+    from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+except ImportError:  # pragma: no cover
+    pass
+else:
+    # 共享去重后端的连接断开、超时同样重试
+    TRANSIENT_ERRORS += (RedisConnectionError, RedisTimeoutError)
+
+
+class RejectedRecord(Exception):
+    """管道阶段主动丢弃、需要写入死信队列的记录的原因"""
+
+
+def reject(record, reason: str):
+    """
+    由管道阶段调用，将记录标记为需写入死信队列。
+
+    在 BatchRetrier.run 中执行时只登记，run 结束后作为失败记录返回，由调用方统一写入死信队列；
+    重试和二分隔离重复执行管道时同一条记录只登记一次。不在 run 中执行时直接写入死信队列。
+
+    Args:
+        record: 被丢弃的记录
+        reason: 丢弃原因
+    """
+    rejected = getattr(_local, 'rejected', None)
+    if rejected is None:
+        dead_letter_queue.send(record, reason=reason)
+    else:
+        rejected.setdefault(id(record), (record, RejectedRecord(reason)))
+
+
+@contextmanager
+def _collecting_rejections():
+    """在当前线程中登记管道阶段丢弃的记录"""
+    previous = getattr(_local, 'rejected', None)
+    _local.rejected = {}
+    try:
+        yield _local.rejected
+    finally:
+        _local.rejected = previous
+
+
+class BatchRetrier:
+    """
+    批次重试器。
+
+    1. 瞬时错误按 base_delay * 2^n（不超过 max_delay）退避重试，最多 max_retries 次，
+       重试耗尽后直接抛出（数据库持续不可用时拆分批次没有意义）
+    2. 遇到非瞬时错误时，将批次一分为二分别处理，
+       递归直至单条记录，定位出无法处理的“毒消息”，其余记录正常提交
+    3. 重试耗尽的瞬时错误由调用方暂停批次（hold），按 backoff 的间隔持续重新执行，
+       不写入死信队列也不确认，死信队列只接收确实无法处理的记录
+    4. 管道阶段通过 reject 丢弃的记录在 run 结束后与失败记录一起返回，
+       重试和二分重复执行管道时不会重复写入死信队列
+
+    Attributes
+    ----------
+    retries : int
+        累计重试次数。
+    bisections : int
+        累计拆分批次的次数。
+    poison_records : int
+        累计定位出的失败记录数。
+    holds : int
+        累计因瞬时错误重试耗尽而暂停批次的次数。
+    """
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 10.0,
+                 on_retry: Callable[[], None] = None, name: str = 'default'):
+        self.name = name
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.on_retry = on_retry
+        self.retries = 0
+        self.bisections = 0
+        self.poison_records = 0
+        self.holds = 0
+        self._lock = threading.Lock()
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+        RETRY_EVENTS.labels(consumer=self.name, event=name).inc(n)
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次（从 0 开始）重试前的等待时间：base_delay * 2^attempt，不超过 max_delay"""
+        return min(self.max_delay, self.base_delay * (2 ** min(attempt, 32)))
+
+    def hold(self, attempt: int) -> float:
+        """
+        记录一次批次暂停并返回暂停时间，批次在重试耗尽后仍遇到瞬时错误时由调用方调用
+
+        Args:
+            attempt: 该批次已暂停的次数（从 0 开始）
+        """
+        self._count('holds')
+        return self.backoff(attempt)
+
+    def call(self, fn: Callable[[List], List], records: List) -> List:
+        """
+        执行 fn，瞬时错误时退避重试
+
+        Args:
+            fn: 批次处理函数
+            records: 批次记录，每次调用都传入新的列表，避免处理函数原地修改影响重试
+
+        Returns:
+            List: fn 的返回结果
+        """
+        attempt = 0
+        while True:
+            try:
+                return fn(list(records))
+            except TRANSIENT_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                attempt += 1
+                self._count('retries')
+                logger.warning(f"批次出现瞬时错误，{delay:.1f} 秒后第 {attempt} 次重试: {e}")
+                if self.on_retry is not None:
+                    self.on_retry()
+                time.sleep(delay)
+
+    def run(self, fn: Callable[[List], List], records: List) -> Tuple[List, List[Tuple[object, Exception]]]:
+        """
+        执行批次，失败时二分隔离出错记录
+
+        Args:
+            fn: 批次处理函数
+            records: 批次记录
+
+        Returns:
+            Tuple[List, List[Tuple[object, Exception]]]: 成功部分的处理结果，以及失败记录（含 reject 丢弃的记录）和对应异常
+        """
+        with _collecting_rejections() as rejected:
+            result, failures = self._run(fn, records)
+        failed = {id(record) for record, _ in failures}
+        failures.extend(failure for key, failure in rejected.items() if key not in failed)
+        return result, failures
+
+    def _run(self, fn: Callable[[List], List], records: List) -> Tuple[List, List[Tuple[object, Exception]]]:
+        """run 的二分隔离逻辑"""
+        try:
+            return self.call(fn, records), []
+        except TRANSIENT_ERRORS:
+            raise
+        except Exception as e:
+            if len(records) <= 1:
+                self._count('poison_records', len(records))
+                logger.error(f"记录处理失败，将写入死信队列: {e}")
+                return [], [(record, e) for record in records]
+
+        self._count('bisections')
+        middle = len(records) // 2
+        left_result, left_failures = self._run(fn, records[:middle])
+        right_result, right_failures = self._run(fn, records[middle:])
+        return left_result + right_result, left_failures + right_failures
+
+    def stats(self) -> dict:
+        """返回重试、拆分及失败记录计数"""
+        with self._lock:
+            return {
+                'retries': self.retries,
+                'bisections': self.bisections,
+                'poison_records': self.poison_records,
+                'holds': self.holds,
+            }
@@ -3,24 +3,33 @@
 支持多个数据源配置，每个表可以使用不同的数据库
 """
 
-from peewee import MySQLDatabase
-from application.settings import MYSQL_DATABASES
+from application.db.pool import InstrumentedPooledMySQLDatabase
+from application.settings import MYSQL_DATABASES, REDIS_DATABASES
+from application.utils.metrics import registry
 
 # 存储数据库连接实例的字典
 database_connections = {}
+# 存储 Redis 客户端的字典，首次使用时创建
+redis_connections = {}
 
 
 def init_database_connections():
     """
-    初始化所有数据库连接
+    初始化所有数据库连接池
     """
     for db_key, db_config in MYSQL_DATABASES.items():
-        database_connections[db_key] = MySQLDatabase(
+        database_connections[db_key] = InstrumentedPooledMySQLDatabase(
             db_config['database'],
             user=db_config['user'],
             password=db_config['password'],
             host=db_config['host'],
-            port=db_config['port']
+            port=db_config['port'],
+            charset=db_config.get('charset', 'utf8mb4'),
+            max_connections=db_config.get('max_connections', 20),
+            stale_timeout=db_config.get('stale_timeout', 300),
+            timeout=db_config.get('pool_timeout', 10),
+            ping_on_checkout=db_config.get('ping_on_checkout', True),
+            local_infile=db_config.get('local_infile', False),
         )
 
 
@@ -32,15 +41,100 @@ def get_database_connection(db_key='default'):
         db_key (str): 数据库配置键名
         
     Returns:
-        MySQLDatabase: 数据库连接实例
+        InstrumentedPooledMySQLDatabase: 数据库连接池实例
     """
     if db_key not in database_connections:
         raise ValueError(f"Database connection '{db_key}' not found. Make sure to initialize connections first.")
     return database_connections[db_key]
 
 
+def get_redis_connection(db_key='default'):
+    """
+    获取指定的 Redis 客户端，首次调用时按 REDIS_DATABASES 创建。
+    配置中有 url 时优先使用 url（如 ``redis://localhost:6379/0``）。
+
+    Args:
+        db_key (str): Redis 配置键名
+
+    Returns:
+        redis.Redis: Redis 客户端（自带连接池，可在多个线程间共享）
+    """
+    if db_key not in redis_connections:
+        if db_key not in REDIS_DATABASES:
+            raise ValueError(f"Redis connection '{db_key}' not found in REDIS_DATABASES.")
+        import redis
+
+        db_config = REDIS_DATABASES[db_key]
+        if db_config.get('url'):
+            client = redis.Redis.from_url(db_config['url'])
+        else:
+            client = redis.Redis(
+                host=db_config['host'],
+                port=db_config['port'],
+                db=db_config.get('database', 0),
+                password=db_config.get('password'),
+                socket_timeout=db_config.get('socket_timeout', 5),
+            )
+        redis_connections[db_key] = client
+    return redis_connections[db_key]
+
+
+def release_database_connections():
+    """
+    将当前线程持有的连接归还连接池，在每个批次处理结束后调用
+    """
+    for database in database_connections.values():
+        if not database.is_closed():
+            database.close()
+
+
+def discard_inherited_connections():
+    """
+    在 fork 出的子进程中丢弃从父进程继承的连接（MySQL 连接池及 Redis 客户端），子进程需要访问时重新建立连接
+    """
+    for database in database_connections.values():
+        if hasattr(database, 'discard_after_fork'):
+            database.discard_after_fork()
+        else:
+            database._state.reset()
+    for client in redis_connections.values():
+        # 只丢弃连接对象而不关闭套接字，父进程仍在使用同一连接
+        client.connection_pool.reset()
+
+
+def get_pool_stats():
+    """
+    获取所有连接池的指标
+
+    Returns:
+        dict: 数据库配置键名到连接池指标的映射
+    """
+    return {
+        db_key: database.pool_stats()
+        for db_key, database in database_connections.items()
+        if hasattr(database, 'pool_stats')
+    }
+
+
+def _collect_pool_metrics():
+    """导出各连接池的检出次数、等待时间和连接数"""
+    stats = get_pool_stats()
+    return [
+        ('db_pool_checkouts_total', 'counter', '连接池累计检出次数',
+         [({'db': key}, value['checkouts']) for key, value in stats.items()]),
+        ('db_pool_wait_seconds_total', 'counter', '累计等待可用连接的时间（秒）',
+         [({'db': key}, value['wait_time_total']) for key, value in stats.items()]),
+        ('db_pool_wait_seconds_max', 'gauge', '单次等待可用连接的最长时间（秒）',
+         [({'db': key}, value['wait_time_max']) for key, value in stats.items()]),
+        ('db_pool_connections', 'gauge', '连接池中的连接数，state 为 idle 或 in_use',
+         [({'db': key, 'state': 'idle'}, value['idle_connections']) for key, value in stats.items()]
+         + [({'db': key, 'state': 'in_use'}, value['in_use_connections']) for key, value in stats.items()]),
+    ]
+
+
 # 初始化所有数据库连接
 init_database_connections()
+registry.register_collector(_collect_pool_metrics)
 
 # 确保在导入模型前初始化数据库连接
 from application.db.mysql_db.base_mysql_model import BaseMysqlModel
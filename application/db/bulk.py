@@ -0,0 +1,301 @@
+"""
+批量写入模块
+按估算的编码字节数和行数拆分 insert_many，避免单条语句超过 max_allowed_packet；
+大批量写入时可改用 LOAD DATA LOCAL INFILE 从临时 TSV 文件导入。
+
+数据行可以是以字段名为键的 dict，也可以是按 fields 给出的列顺序排列的元组，
+后者直接交给 peewee 的 insert_many(rows, fields=...)，不需要逐行构建 dict
+"""
+
+import os
+import tempfile
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import IO, Iterator, List, Optional, Sequence, Tuple
+
+from peewee import MySQLDatabase
+from playhouse.mysql_ext import JSONField
+
+from application.settings import BULK_WRITE_CONFIG, LOAD_DATA_CONFIG
+from application.utils import json_codec
+from application.utils.metrics import registry
+
+# 各表写入耗时及每条语句的行数、字节数
+TABLE_WRITE_SECONDS = registry.histogram('table_write_seconds', '单表在一个批次中的写入耗时（秒）', ['table'])
+STATEMENT_ROWS = registry.histogram('bulk_statement_rows', '每条批量写入语句的行数', ['table'],
+                                    buckets=(1, 10, 50, 100, 250, 500, 1000, 5000))
+STATEMENT_BYTES = registry.histogram('bulk_statement_bytes', '每条批量写入语句的估算字节数', ['table'],
+                                     buckets=(1024, 16384, 131072, 1048576, 4194304, 16777216, 67108864))
+
+
+def estimate_size(value) -> int:
+    """
+    估算单个值编码后写入 SQL 语句的字节数
+
+    Args:
+        value: 字段值，支持 str/bytes/dict/list 及标量
+
+    Returns:
+        int: 估算的字节数
+    """
+    if value is None:
+        return 4
+    if isinstance(value, str):
+        return len(value.encode('utf-8')) + 2
+    if isinstance(value, (bytes, bytearray)):
+        return len(value) * 2 + 3
+    if isinstance(value, dict):
+        return sum(estimate_size(k) + estimate_size(v) + 2 for k, v in value.items()) + 2
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(v) + 1 for v in value) + 2
+    return len(str(value))
+
+
+def estimate_row_size(row) -> int:
+    """估算一行数据（dict 或按列顺序排列的元组）编码后的字节数"""
+    values = row.values() if isinstance(row, dict) else row
+    return sum(estimate_size(v) for v in values) + len(row) + 2
+
+
+def chunked_rows(rows: List, max_rows: int, max_bytes: int) -> Iterator[Tuple[List, int]]:
+    """
+    按行数和估算字节数拆分数据，单行超过 max_bytes 时单独成块
+
+    Args:
+        rows: 待写入的数据，dict 或元组
+        max_rows: 每块最大行数
+        max_bytes: 每块最大估算字节数
+
+    Yields:
+        Tuple[List, int]: 数据块及其估算字节数
+    """
+    chunk = []
+    chunk_bytes = 0
+    for row in rows:
+        row_bytes = estimate_row_size(row)
+        if chunk and (len(chunk) >= max_rows or chunk_bytes + row_bytes > max_bytes):
+            yield chunk, chunk_bytes
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(row)
+        chunk_bytes += row_bytes
+    if chunk:
+        yield chunk, chunk_bytes
+
+
+class BulkWriteStats:
+    """
+    按表统计批量写入的语句数、行数和字节数
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables = defaultdict(lambda: {'statements': 0, 'rows': 0, 'bytes': 0, 'max_rows': 0, 'max_bytes': 0})
+
+    def record(self, table: str, rows: int, size: int):
+        """记录一条语句的行数和估算字节数"""
+        STATEMENT_ROWS.labels(table=table).observe(rows)
+        STATEMENT_BYTES.labels(table=table).observe(size)
+        with self._lock:
+            stats = self._tables[table]
+            stats['statements'] += 1
+            stats['rows'] += rows
+            stats['bytes'] += size
+            stats['max_rows'] = max(stats['max_rows'], rows)
+            stats['max_bytes'] = max(stats['max_bytes'], size)
+
+    def stats(self) -> dict:
+        """
+        返回各表的写入统计，包含每条语句的平均行数和字节数
+        """
+        with self._lock:
+            result = {}
+            for table, stats in self._tables.items():
+                statements = stats['statements'] or 1
+                result[table] = {
+                    **stats,
+                    'rows_per_statement': stats['rows'] / statements,
+                    'bytes_per_statement': stats['bytes'] / statements,
+                }
+            return result
+
+
+# 全局批量写入统计
+bulk_write_stats = BulkWriteStats()
+
+
+def get_chunk_config(model) -> dict:
+    """
+    获取模型对应表的分块配置，未单独配置时使用 default
+    """
+    return {**BULK_WRITE_CONFIG['default'], **BULK_WRITE_CONFIG.get(model._meta.table_name, {})}
+
+
+def timed_write(model):
+    """
+    记录一张表写入耗时的上下文管理器
+
+    Args:
+        model: peewee 模型类
+    """
+    return TABLE_WRITE_SECONDS.labels(table=model._meta.table_name).time()
+
+
+# TSV 字段转义，与 LOAD DATA 默认的 ESCAPED BY '\\' 对应
+_TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+
+
+def tsv_value(field, value) -> str:
+    """
+    将字段值编码为 LOAD DATA 可导入的 TSV 字段：NULL 写为 \\N，JSON 字段先编码为 JSON 文本，
+    反斜杠、制表符、换行符、回车符和 NUL 转义
+
+    Args:
+        field: peewee 字段
+        value: 字段值
+    """
+    if value is None:
+        return '\\N'
+    if isinstance(field, JSONField):
+        value = json_codec.dumps(value).decode('utf-8')
+    else:
+        value = field.db_value(value)
+        if value is None:
+            return '\\N'
+        if isinstance(value, bool):
+            value = int(value)
+    return str(value).translate(_TSV_ESCAPES)
+
+
+def write_tsv(model, rows: List, file: IO[str], fields: Optional[Sequence[str]] = None) -> List[str]:
+    """
+    将数据逐行写入 TSV 文件，列顺序取 fields，未指定时取第一行的键
+
+    Args:
+        model: peewee 模型类
+        rows: 待写入的数据，指定 fields 时为按其顺序排列的元组
+        file: 以文本模式打开的文件
+        fields: 元组数据的列名
+
+    Returns:
+        List[str]: 列名，用于 LOAD DATA 的列清单
+    """
+    names = list(fields or rows[0])
+    model_fields = [model._meta.fields[name] for name in names]
+    for row in rows:
+        values = row if fields else [row.get(name) for name in names]
+        file.write('\t'.join([tsv_value(field, value) for field, value in zip(model_fields, values)]))
+        file.write('\n')
+    return [field.column_name for field in model_fields]
+
+
+def _load_data_directory():
+    """临时 TSV 文件目录，未配置时优先使用 tmpfs"""
+    if LOAD_DATA_CONFIG.get('directory'):
+        return LOAD_DATA_CONFIG['directory']
+    return '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+def use_load_data(model, rows: List) -> bool:
+    """
+    是否使用 LOAD DATA 写入：已开启、数据库为 MySQL，且行数达到该表的阈值
+    """
+    if not LOAD_DATA_CONFIG.get('enabled') or not rows:
+        return False
+    min_rows = LOAD_DATA_CONFIG.get('min_rows', {}).get(model._meta.table_name)
+    return min_rows is not None and len(rows) >= min_rows and isinstance(model._meta.database, MySQLDatabase)
+
+
+def load_data_many(model, rows: List, fields: Optional[Sequence[str]] = None):
+    """
+    将数据写入临时 TSV 文件后用 LOAD DATA LOCAL INFILE 导入，需在调用方的事务中使用以保证原子性。
+    相比 insert_many 省去构建和解析 SQL 语句的开销；导入失败（包括行数不符）时抛出异常。
+
+    Args:
+        model: peewee 模型类
+        rows: 待插入的数据
+        fields: 元组数据的列名，rows 为 dict 时不指定
+    """
+    table = model._meta.table_name
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', newline='', suffix='.tsv',
+                                     prefix=f'{table}_', dir=_load_data_directory()) as file:
+        columns = write_tsv(model, rows, file, fields)
+        file.flush()
+        sql = (
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE `{table}` CHARACTER SET utf8mb4 "
+            f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+            f"({', '.join(f'`{column}`' for column in columns)})"
+        )
+        cursor = model._meta.database.execute_sql(sql, (file.name,))
+        size = os.path.getsize(file.name)
+    if cursor.rowcount != len(rows):
+        raise RuntimeError(f"LOAD DATA 导入 {table} 的行数不符：期望 {len(rows)}，实际 {cursor.rowcount}")
+    bulk_write_stats.record(table, len(rows), size)
+
+
+def insert_many_chunked(model, rows: List, fields: Optional[Sequence[str]] = None):
+    """
+    分块执行 insert_many，需在调用方的事务中使用以保证原子性。
+    行数达到 LOAD_DATA_CONFIG 中该表的阈值时改用 LOAD DATA LOCAL INFILE 一次导入。
+
+    Args:
+        model: peewee 模型类
+        rows: 待插入的数据
+        fields: 元组数据的列名，rows 为 dict 时不指定
+    """
+    if use_load_data(model, rows):
+        load_data_many(model, rows, fields)
+        return
+    config = get_chunk_config(model)
+    table = model._meta.table_name
+    for chunk, chunk_bytes in chunked_rows(rows, config['max_rows'], config['max_bytes']):
+        model.insert_many(chunk, fields=fields).execute()
+        bulk_write_stats.record(table, len(chunk), chunk_bytes)
+
+
+def verify_natural_key(model):
+    """
+    检查数据库中存在与模型自然键（natural_key）列完全相同的唯一索引，upsert 依赖它判断冲突；
+    不存在时 ON DUPLICATE KEY 不会触发，重复投递会产生重复数据，因此抛出 RuntimeError
+
+    Args:
+        model: 定义了 natural_key 的 peewee 模型类
+    """
+    table = model._meta.table_name
+    columns = {model._meta.fields[name].column_name for name in model.natural_key}
+    for index in model._meta.database.get_indexes(table):
+        if index.unique and set(index.columns) == columns:
+            return
+    raise RuntimeError(
+        f"{table} 缺少 ({', '.join(model.natural_key)}) 上的唯一索引，upsert 写入会产生重复数据；"
+        f"请先执行 application/db/mysql_db/migrations 中的迁移脚本"
+    )
+
+
+def upsert_many(model, rows: List, fields: Optional[Sequence[str]] = None):
+    """
+    按模型的自然键（natural_key）执行 upsert，冲突时以新数据覆盖其余字段并刷新 update_time。
+    MySQL 下为 INSERT ... ON DUPLICATE KEY UPDATE，其他数据库使用 ON CONFLICT (natural_key)。
+    与 insert_many_chunked 一样按 BULK_WRITE_CONFIG 拆分语句，需在调用方的事务中使用以保证原子性。
+
+    Args:
+        model: 定义了 natural_key 的 peewee 模型类
+        rows: 待写入的数据
+        fields: 元组数据的列名，rows 为 dict 时不指定
+    """
+    if not rows:
+        return
+    preserve = [model._meta.fields[name] for name in (fields or rows[0]) if name not in model.natural_key]
+    conflict_target = None
+    if not isinstance(model._meta.database, MySQLDatabase):
+        conflict_target = [model._meta.fields[name] for name in model.natural_key]
+    update = {model.update_time: datetime.now()}
+    config = get_chunk_config(model)
+    table = model._meta.table_name
+    for chunk, chunk_bytes in chunked_rows(rows, config['max_rows'], config['max_bytes']):
+        (model
+         .insert_many(chunk, fields=fields)
+         .on_conflict(conflict_target=conflict_target, preserve=preserve, update=update)
+         .execute())
+        bulk_write_stats.record(table, len(chunk), chunk_bytes)
@@ -1,7 +1,7 @@
 from peewee import (
-    MySQLDatabase, Model, IntegerField, DateTimeField, AutoField, SQL,
+    Model, IntegerField, DateTimeField, AutoField, SQL,
 )
-from application.settings import MYSQL_DATABASES
+from application.db import get_database_connection
 
 
 class BaseMysqlModel(Model):
@@ -16,22 +16,12 @@ class BaseMysqlModel(Model):
     @classmethod
     def set_database(cls, db_config_key='default'):
         """
-        设置模型使用的数据库
+        设置模型使用的数据库，与其他模型共享同一个连接池
         
         Args:
             db_config_key (str): 数据库配置键名，默认为'default'
         """
-        if db_config_key in MYSQL_DATABASES:
-            data_base = MYSQL_DATABASES[db_config_key]
-            cls._meta.database = MySQLDatabase(
-                data_base['database'],  # 数据库名称
-                user=data_base['user'],  # 用户名
-                password=data_base['password'],  # 密码
-                host=data_base['host'],  # 主机地址
-                port=data_base['port']  # 端口
-            )
-        else:
-            raise ValueError(f"Database configuration '{db_config_key}' not found in MYSQL_DATABASES")
+        cls._meta.database = get_database_connection(db_config_key)
 
 # class ResourceMetadataDescriptionList(BaseModel):
 #     """字段描述表"""
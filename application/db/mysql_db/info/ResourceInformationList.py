@@ -8,7 +8,8 @@ from application.db.mysql_db.base_mysql_model import BaseMysqlModel
 
 class ResourceInformationList(BaseMysqlModel):
     """资讯主表，存储资讯基本信息"""
-    information_id = CharField(index=True)  # 资讯ID，主键
+    natural_key = ('information_id',)  # 自然键，upsert 时据此判断冲突
+    information_id = CharField(unique=True)  # 资讯ID，主键（唯一索引，upsert 的自然键）
     source_id = CharField(index=True)  # 来源ID，外键
     information_name = JSONField()  # 资讯名称，存储原名称和翻译等
     information_description = JSONField(null=True)  # 资讯描述，存储原描述和翻译等
@@ -6,10 +6,14 @@ from application.db.mysql_db.base_mysql_model import BaseMysqlModel
 
 class ResourceInformationTagsRelation(BaseMysqlModel):
     """资讯与标签多对多关系表"""
+    natural_key = ('information_id', 'tag_code')  # 自然键，upsert 时据此判断冲突
     information_id = CharField(index=True)  # 主表ID（资讯ID）
-    tag_code = CharField(index=True)  # 标签ID
+    tag_code = CharField(index=True, default='')  # 标签ID，未映射标签时为空字符串（非空，参与唯一索引）
     tag_value = CharField(null=True)  # 标签值
 
     class Meta:
         table_name = 'resource_information_tags_relation'
+        indexes = (
+            (('information_id', 'tag_code'), True),  # 唯一索引，upsert 的自然键
+        )
         database = get_database_connection('default')  # 使用默认数据库
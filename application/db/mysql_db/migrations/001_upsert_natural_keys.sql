@@ -0,0 +1,22 @@
+-- upsert 写入模式（WRITE_CONFIG['mode'] = 'upsert'）依赖的唯一索引
+--
+-- 适用于按旧版模型建表的库（information_id、tag_code 上只有普通索引）。
+-- 执行前先删除重复数据，每组保留 list_id 最大（最后写入）的一条；建议在停止消费者后执行。
+-- 执行完成后消费者启动时的表结构检查（BaseConsumer.verify）才会通过。
+
+-- 1. 资讯列表：information_id 唯一
+DELETE a FROM resource_information_list a
+    JOIN resource_information_list b ON a.information_id = b.information_id AND a.list_id < b.list_id;
+ALTER TABLE resource_information_list
+    DROP INDEX resourceinformationlist_information_id,
+    ADD UNIQUE INDEX resourceinformationlist_information_id (information_id);
+
+-- 2. 资讯标签关系：tag_code 非空，(information_id, tag_code) 唯一
+--    NULL 不参与唯一索引的冲突判断，未映射标签的记录统一写入空字符串
+UPDATE resource_information_tags_relation SET tag_code = '' WHERE tag_code IS NULL;
+DELETE a FROM resource_information_tags_relation a
+    JOIN resource_information_tags_relation b
+      ON a.information_id = b.information_id AND a.tag_code = b.tag_code AND a.list_id < b.list_id;
+ALTER TABLE resource_information_tags_relation
+    MODIFY tag_code VARCHAR(255) NOT NULL DEFAULT '',
+    ADD UNIQUE INDEX resourceinformationtagsrelation_information_id_tag_code (information_id, tag_code);
@@ -0,0 +1,88 @@
+"""
+MySQL 连接池
+在 playhouse 连接池的基础上增加检出前探活开关和连接池指标
+"""
+
+import threading
+import time
+
+from playhouse.pool import PooledMySQLDatabase
+
+
+class InstrumentedPooledMySQLDatabase(PooledMySQLDatabase):
+    """
+    带指标的 MySQL 连接池。
+
+    peewee 的连接状态按线程隔离，每个线程从池中检出自己的连接，
+    调用 ``close()`` 后连接归还连接池而不是真正断开。
+
+    Attributes
+    ----------
+    ping_on_checkout : bool
+        检出连接前是否先 ping，失效连接会被丢弃并重新建立。
+    checkouts : int
+        累计检出次数。
+    wait_time_total : float
+        累计等待可用连接的时间（秒）。
+    wait_time_max : float
+        单次等待可用连接的最长时间（秒）。
+    """
+
+    def __init__(self, database, ping_on_checkout=True, **kwargs):
+        self.ping_on_checkout = ping_on_checkout
+        self.checkouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self._stats_lock = threading.Lock()
+        super().__init__(database, **kwargs)
+
+    def connect(self, reuse_if_open=False):
+        """
+        从连接池检出连接，并记录检出次数和等待时间
+        """
+        start = time.perf_counter()
+        opened = super().connect(reuse_if_open)
+        waited = time.perf_counter() - start
+        if opened:
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_time_total += waited
+                self.wait_time_max = max(self.wait_time_max, waited)
+        return opened
+
+    def _is_closed(self, conn):
+        """
+        检出前的连接可用性检查，关闭 ping_on_checkout 时跳过 ping
+        """
+        if not self.ping_on_checkout:
+            return False
+        return super()._is_closed(conn)
+
+    def discard_after_fork(self):
+        """
+        在 fork 出的子进程中丢弃从父进程继承的连接。
+        只清空引用而不关闭，关闭会向服务端发送断开请求，使父进程仍在使用的连接失效。
+        """
+        self._state.reset()
+        self._pool_lock = threading.RLock()
+        self._pool_available = threading.Condition(self._pool_lock)
+        self._connections = []
+        self._in_use = {}
+        self._stats_lock = threading.Lock()
+
+    def pool_stats(self) -> dict:
+        """
+        返回连接池指标
+
+        Returns:
+            dict: 检出次数、等待时间及空闲/使用中的连接数
+        """
+        with self._stats_lock:
+            return {
+                'checkouts': self.checkouts,
+                'wait_time_total': self.wait_time_total,
+                'wait_time_max': self.wait_time_max,
+                'idle_connections': len(self._connections),
+                'in_use_connections': len(self._in_use),
+                'max_connections': self._max_connections,
+            }
@@ -0,0 +1,358 @@
+"""
+写后缓冲模块
+将连续多个消费批次的待写入数据合并，在行数、字节数或等待时间达到阈值时用一个事务写入，
+每个消费批次在包含其数据的写入完成后才确认偏移量；
+瞬时错误重试耗尽时数据放回缓冲，按退避间隔重新写入，期间批次既不确认也不写入死信队列
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Tuple
+
+from application.consumers.retry import TRANSIENT_ERRORS
+from application.utils import get_logger
+from application.utils.metrics import registry
+
+logger = get_logger(__name__)
+
+WRITE_BEHIND_FLUSHES = registry.counter('write_behind_flushes', '写后缓冲的写入次数，reason 为 rows/bytes/age/retry/shutdown',
+                                        ['consumer', 'reason'])
+WRITE_BEHIND_FLUSH_BATCHES = registry.histogram('write_behind_flush_batches', '每次写入合并的消费批次数', ['consumer'],
+                                                buckets=(1, 2, 5, 10, 25, 50, 100, 250))
+WRITE_BEHIND_FLUSH_ROWS = registry.histogram('write_behind_flush_rows', '每次写入的估算行数', ['consumer'],
+                                             buckets=(10, 50, 100, 500, 1000, 5000, 10000, 50000))
+WRITE_BEHIND_FLUSH_SECONDS = registry.histogram('write_behind_flush_seconds', '每次写入的耗时（秒）', ['consumer'])
+
+_local = threading.local()
+
+
+class WriteBehindBatch:
+    """
+    一个消费批次在写后缓冲中的凭证。
+
+    批次执行结束（seal）且其全部数据都已写入后完成，消费者等待完成后再确认该批次的事件。
+
+    Attributes
+    ----------
+    error : Optional[BaseException]
+        整次写入因非瞬时错误失败（未配置重试器、无法二分隔离）时的异常，此时批次的全部记录视为失败。
+    failures : List[Tuple[object, Exception]]
+        被二分隔离出的写入失败数据及对应异常。
+    claim_token : Optional[str]
+        批次的去重认领标识，数据未能写入而被丢弃时以该标识释放认领。
+    """
+
+    def __init__(self, buffer: 'WriteBehindBuffer', claim_token: Optional[str] = None):
+        self.buffer = buffer
+        self.claim_token = claim_token
+        self.error = None
+        self.failures = []
+        self._pending = 0
+        self._sealed = False
+        self._future = Future()
+
+    def add(self, writer: Callable[[List], object], items: List, rows: int, size: int,
+            release: Optional[Callable[[List, Optional[str]], object]] = None):
+        """
+        将本批次的待写入数据加入缓冲
+
+        Args:
+            writer: 写入函数，接收合并后的数据列表并在一个事务中写入
+            items: 待写入的数据
+            rows: 估算行数
+            size: 估算字节数
+            release: 数据未能写入（写入失败或停止时仍在缓冲中）时调用，参数为这些数据及批次的认领标识，
+                用于释放去重认领，使重新投递的消息可以立即处理
+        """
+        self.buffer._append(self, writer, items, rows, size, release)
+
+    def _entry_done(self):
+        """一条缓冲数据已写入或已丢弃（调用方需持有缓冲的锁）"""
+        self._pending -= 1
+        self._resolve_if_done()
+
+    def _resolve_if_done(self):
+        if self._sealed and self._pending == 0 and not self._future.done():
+            self._future.set_result(None)
+
+    async def wait(self):
+        """等待包含本批次数据的写入完成"""
+        await asyncio.wrap_future(self._future)
+
+    @property
+    def done(self) -> bool:
+        return self._future.done()
+
+
+class WriteBehindBuffer:
+    """
+    写后缓冲，在多个工作线程间共享。
+
+    管道阶段通过 current_batch() 取得当前消费批次的凭证并将数据加入缓冲；
+    消费者在批次执行结束后检查阈值，达到 max_rows、max_bytes 或最早一条数据等待超过 max_age 时写入。
+    同一时间只有一次写入，数据按加入顺序合并，同一写入函数的数据在一次调用（一个事务）中写入。
+    瞬时错误重试耗尽时该写入函数的数据放回缓冲头部，等待 retrier.backoff 给出的间隔后由 due() 返回 retry 再次写入，
+    等待期间 backing_off 为真，消费者暂停执行新的批次。
+    数据写入失败（写入死信队列）或停止时仍未写入（abandon）时调用其 release 回调释放去重认领。
+
+    Attributes
+    ----------
+    max_rows : int
+        缓冲的估算行数阈值。
+    max_bytes : int
+        缓冲的估算字节数阈值。
+    max_age : float
+        缓冲中最早一条数据的最长等待时间（秒）。
+    retrier : Optional[BatchRetrier]
+        写入使用的重试器，瞬时错误退避重试，其他错误二分隔离出错数据。
+    """
+
+    def __init__(self, max_rows: int = 5000, max_bytes: int = 16 * 1024 * 1024, max_age: float = 2.0,
+                 retrier=None, name: str = 'default'):
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.retrier = retrier
+        self.name = name
+        self._entries = []
+        self._rows = 0
+        self._bytes = 0
+        self._oldest = None
+        self._attempts = 0
+        self._retry_at = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict, retrier=None, name: str = 'default') -> 'WriteBehindBuffer':
+        """
+        根据 WRITE_BEHIND_CONFIG 格式的配置创建实例
+        """
+        return cls(
+            max_rows=config.get('max_rows', 5000),
+            max_bytes=config.get('max_bytes', 16 * 1024 * 1024),
+            max_age=config.get('max_age', 2.0),
+            retrier=retrier,
+            name=name,
+        )
+
+    @property
+    def poll_interval(self) -> float:
+        """定时检查等待时间阈值的间隔（秒）"""
+        return min(1.0, max(0.05, self.max_age / 4))
+
+    @property
+    def backing_off(self) -> bool:
+        """上一次写入遇到瞬时错误，数据已放回缓冲等待重新写入"""
+        return self._retry_at is not None
+
+    def open_batch(self, claim_token: Optional[str] = None) -> WriteBehindBatch:
+        """为一个消费批次创建凭证"""
+        return WriteBehindBatch(self, claim_token)
+
+    def _append(self, batch: WriteBehindBatch, writer, items: List, rows: int, size: int, release=None):
+        if not items:
+            return
+        with self._lock:
+            if batch._sealed:
+                raise RuntimeError("批次已结束，不能再加入写后缓冲")
+            self._entries.append((batch, writer, items, rows, size, release))
+            batch._pending += 1
+            self._rows += rows
+            self._bytes += size
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+
+    def seal(self, batch: WriteBehindBatch):
+        """批次执行结束，不会再加入数据；没有缓冲数据的批次立即完成"""
+        with self._lock:
+            batch._sealed = True
+            batch._resolve_if_done()
+
+    def discard(self, batch: WriteBehindBatch):
+        """丢弃批次尚未写入的数据（批次整体失败、记录已写入死信队列时调用），批次随即完成"""
+        with self._lock:
+            kept = []
+            for entry in self._entries:
+                if entry[0] is batch:
+                    batch._pending -= 1
+                    self._rows -= entry[3]
+                    self._bytes -= entry[4]
+                else:
+                    kept.append(entry)
+            self._entries = kept
+            batch._sealed = True
+            batch._resolve_if_done()
+
+    def abandon(self) -> int:
+        """
+        停止消费时调用：丢弃缓冲中仍未写入的数据（如数据库持续不可用）并释放其去重认领，
+        对应批次保持未完成，事件不确认，重启后重新消费
+
+        Returns:
+            int: 丢弃的数据条数
+        """
+        with self._lock:
+            entries, self._entries = self._entries, []
+            self._rows, self._bytes, self._oldest = 0, 0, None
+            self._attempts, self._retry_at = 0, None
+        for entry in entries:
+            self._release(entry, entry[2])
+        count = sum(len(entry[2]) for entry in entries)
+        if count:
+            logger.warning(f"{self.name} 停止时写后缓冲中仍有 {count} 条数据未写入，对应批次不确认")
+        return count
+
+    def _release(self, entry, items: List):
+        """调用数据的 release 回调，释放失败只记录日志（认领会在有效期后失效）"""
+        release = entry[5]
+        if release is None or not items:
+            return
+        try:
+            release(items, entry[0].claim_token)
+        except Exception as e:
+            logger.error(f"{self.name} 释放写后缓冲数据的去重认领失败: {e}", exc_info=True)
+
+    def due(self) -> Optional[str]:
+        """返回需要写入的原因（rows/bytes/age/retry），未达到阈值或仍在退避等待时返回 None"""
+        with self._lock:
+            if not self._entries:
+                return None
+            if self._retry_at is not None:
+                return 'retry' if time.monotonic() >= self._retry_at else None
+            if self._rows >= self.max_rows:
+                return 'rows'
+            if self._bytes >= self.max_bytes:
+                return 'bytes'
+            if time.monotonic() - self._oldest >= self.max_age:
+                return 'age'
+            return None
+
+    def _write(self, writer, items: List, written: set) -> List[Tuple[object, Exception]]:
+        """调用写入函数，返回被隔离出的失败数据；已提交的数据的 id 记入 written"""
+        if self.retrier is None:
+            writer(items)
+            return []
+
+        def write_chunk(chunk: List) -> List:
+            writer(chunk)
+            written.update(id(item) for item in chunk)
+            return chunk
+
+        return self.retrier.run(write_chunk, items)[1]
+
+    def flush(self, reason: str = 'rows') -> int:
+        """
+        写入缓冲中的全部数据，在工作线程中调用。
+        写入异常不会抛出：瞬时错误时数据放回缓冲等待重新写入，其他异常记录到对应批次的凭证上，
+        由消费者写入死信队列后确认。
+
+        Args:
+            reason: 写入原因，用于指标
+
+        Returns:
+            int: 本次写入合并的消费批次数
+        """
+        with self._flush_lock:
+            with self._lock:
+                entries, self._entries = self._entries, []
+                rows, self._rows, self._bytes, self._oldest = self._rows, 0, 0, None
+            if not entries:
+                return 0
+
+            start = time.perf_counter()
+            grouped = OrderedDict()
+            item_batches = {}
+            for entry in entries:
+                batch, writer, items = entry[:3]
+                group = grouped.setdefault(writer, ([], [], []))
+                group[0].extend(items)
+                group[1].append(batch)
+                group[2].append(entry)
+                for item in items:
+                    item_batches[id(item)] = batch
+            requeued = []
+            for writer, (items, writer_batches, writer_entries) in grouped.items():
+                written = set()
+                try:
+                    failures = self._write(writer, items, written)
+                except TRANSIENT_ERRORS as e:
+                    # 二分过程中已提交的数据不再重复写入
+                    logger.error(f"{self.name} 写后缓冲写入出现瞬时错误，{len(items) - len(written)} 条数据放回缓冲等待重新写入: {e}")
+                    for entry in writer_entries:
+                        remaining = [item for item in entry[2] if id(item) not in written]
+                        if remaining:
+                            requeued.append((entry, (entry[0], writer, remaining, entry[3], entry[4], entry[5])))
+                    continue
+                except Exception as e:
+                    logger.error(f"{self.name} 写后缓冲写入失败，共 {len(items)} 条数据: {e}", exc_info=True)
+                    for batch in writer_batches:
+                        batch.error = e
+                    for entry in writer_entries:
+                        self._release(entry, entry[2])
+                    continue
+                failed = set()
+                for item, error in failures:
+                    item_batches[id(item)].failures.append((item, error))
+                    failed.add(id(item))
+                if failed:
+                    for entry in writer_entries:
+                        self._release(entry, [item for item in entry[2] if id(item) in failed])
+
+            delay = None
+            if requeued:
+                delay = self.retrier.hold(self._attempts) if self.retrier is not None else self.max_age
+            requeued_ids = {id(entry) for entry, _ in requeued}
+            done = [entry for entry in entries if id(entry) not in requeued_ids]
+            batches = {id(entry[0]) for entry in done}
+            with self._lock:
+                for entry in done:
+                    entry[0]._entry_done()
+                self._requeue([remaining for _, remaining in requeued], delay)
+            elapsed = time.perf_counter() - start
+            WRITE_BEHIND_FLUSHES.labels(consumer=self.name, reason=reason).inc()
+            WRITE_BEHIND_FLUSH_BATCHES.labels(consumer=self.name).observe(len(batches))
+            WRITE_BEHIND_FLUSH_ROWS.labels(consumer=self.name).observe(rows - sum(entry[3] for entry, _ in requeued))
+            WRITE_BEHIND_FLUSH_SECONDS.labels(consumer=self.name).observe(elapsed)
+            logger.info(f"{self.name} 写后缓冲写入完成 ({reason})，合并 {len(batches)} 个批次，约 {rows} 行，耗时 {elapsed:.3f} 秒")
+            return len(batches)
+
+    def _requeue(self, entries: List, delay: Optional[float]):
+        """
+        将写入出现瞬时错误的数据放回缓冲头部，delay 秒后再次写入；全部写入成功时清除退避状态
+        （调用方需持有缓冲的锁）
+        """
+        if not entries:
+            self._attempts = 0
+            self._retry_at = None
+            return
+        self._entries[:0] = entries
+        self._rows += sum(entry[3] for entry in entries)
+        self._bytes += sum(entry[4] for entry in entries)
+        self._oldest = self._oldest or time.monotonic()
+        self._attempts += 1
+        self._retry_at = time.monotonic() + delay
+
+
+def current_batch() -> Optional[WriteBehindBatch]:
+    """
+    返回当前线程正在执行的消费批次的写后缓冲凭证，未开启写后缓冲时返回 None
+    """
+    return getattr(_local, 'batch', None)
+
+
+@contextmanager
+def collecting(batch: Optional[WriteBehindBatch]):
+    """
+    在当前线程中绑定消费批次的凭证，期间执行的管道阶段可通过 current_batch() 将数据加入缓冲
+    """
+    previous = getattr(_local, 'batch', None)
+    _local.batch = batch
+    try:
+        yield batch
+    finally:
+        _local.batch = previous
@@ -3,8 +3,10 @@ from typing import List, Dict, Any
 import faust
 import json
 
+from application.utils import json_codec
 
-class DataStructure(faust.Record):
+
+class DataStructure(faust.Record, serializer=json_codec.CODEC_NAME):
     """
     :param uid: 唯一标识
     :param topic: 主题
@@ -22,12 +24,15 @@ class DataStructure(faust.Record):
     tag_values: str
     link_data: List[Dict[str, Any]] = []
 
-    def to_json(self, **kwargs) -> str:
+    def to_json(self, **kwargs) -> bytes:
         """
-        将模型序列化为 JSON 字符串。
+        将模型序列化为 UTF-8 JSON 字节串（不转义非 ASCII 字符）。
 
-        修复：原实现返回 bytes，这里保证返回 str 并默认禁止 ASCII 转义以保留 Unicode 可读性。
+        默认使用 fastjson 编解码器一次完成编码，嵌套的 Record 在编码过程中按字段浅转换，
+        不先构建完整的 asdict() 副本；传入 json.dumps 参数（如 indent）时使用标准库编码。
 
         :return: JSON bytes
         """
-        return json.dumps(self.asdict(), ensure_ascii=False, **kwargs).encode("utf-8")
+        if kwargs:
+            return json.dumps(self, cls=json_codec.RecordJSONEncoder, ensure_ascii=False, **kwargs).encode("utf-8")
+        return json_codec.dumps(self, default=json_codec.record_fields)
@@ -0,0 +1,101 @@
+from collections.abc import Mapping
+from typing import Any, Optional, Type
+
+import faust
+
+from application.utils import json_codec
+from application.utils.metrics import registry
+
+LAZY_DECODES = registry.counter(
+    'lazy_record_decodes', '延迟解码记录的解码次数，stage 为 parse（解析 JSON）或 materialize（构建 Record）', ['stage']
+)
+
+
+class LazyRecord:
+    """
+    延迟解码的消息记录。
+
+    创建时不解析消息体：uid 优先取自消息头，没有时在首次访问 uid 时解析消息体；
+    首次访问其他字段时才构建对应的 faust.Record，之后的访问直接转发给该 Record。
+    去重阶段只读取 uid，被丢弃的重复消息省去构建 Record 的开销；消息没有 uid 消息头时
+    （生产端目前不设置）消息体仍会在去重阶段解析一次，lazy_record_decodes{stage="parse"} 反映实际的解析次数。
+
+    管道写入的附加字段（如 source_id）保存在本对象上，不影响原始消息。
+
+    解析在首次访问时发生（通常在 Pipeline 的工作线程中），消息体损坏导致的异常与其他处理异常一样
+    由重试器隔离并写入死信队列。
+    """
+
+    def __init__(self, raw: bytes, model: Type[faust.Record], uid: Optional[str] = None):
+        self._raw = raw
+        self._model = model
+        self._payload = None
+        self._record = None
+        self._uid = uid
+
+    @classmethod
+    def from_message(cls, message, model: Type[faust.Record], uid_header: str = 'uid') -> 'LazyRecord':
+        """
+        根据 Kafka 消息创建延迟解码记录，消息头中有 uid_header 时不解析消息体
+
+        Args:
+            message: faust Message，需包含 value（原始 bytes）和 headers
+            model: 完整解码时使用的数据结构
+            uid_header: 携带 uid 的消息头名称
+        """
+        headers = message.headers or ()
+        if isinstance(headers, Mapping):
+            headers = headers.items()
+        uid = next((value.decode('utf-8') for key, value in headers if key == uid_header and value), None)
+        return cls(message.value, model, uid)
+
+    @property
+    def uid(self) -> str:
+        """消息唯一标识，消息头中没有时从消息体解析"""
+        if self._uid is None:
+            self._uid = self.payload['uid']
+        return self._uid
+
+    @property
+    def decoded(self) -> bool:
+        """是否已构建完整的 Record"""
+        return self._record is not None
+
+    @property
+    def payload(self) -> dict:
+        """解析后的消息体（dict），首次访问时解析"""
+        if self._payload is None:
+            self._payload = json_codec.loads(self._raw)
+            LAZY_DECODES.labels(stage='parse').inc()
+        return self._payload
+
+    def materialize(self) -> faust.Record:
+        """构建并缓存完整的 Record"""
+        if self._record is None:
+            self._record = self._model.from_data(dict(self.payload), preferred_type=self._model)
+            LAZY_DECODES.labels(stage='materialize').inc()
+        return self._record
+
+    def __getattr__(self, name: str) -> Any:
+        # 只有实例和类上都找不到的属性才会进入这里
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.materialize(), name)
+
+    def asdict(self) -> dict:
+        """返回字段字典，尚未构建 Record 时直接使用解析后的消息体"""
+        if self._record is not None:
+            return self._record.asdict()
+        return {key: value for key, value in self.payload.items() if key != '__faust'}
+
+    def __json__(self) -> dict:
+        return self.asdict()
+
+    def to_json(self, **kwargs) -> bytes:
+        """尚未构建 Record 时原样返回消息体"""
+        if self._record is None and not kwargs:
+            return self._raw
+        return self.materialize().to_json(**kwargs)
+
+    def __repr__(self) -> str:
+        return f'<LazyRecord {self._model.__name__} uid={self._uid!r} decoded={self.decoded}>'
@@ -1,9 +1,18 @@
 import copy
+import time
 from abc import abstractmethod
 from typing import List, Any
 from fasttransform import Transform
 
 from application.models.kafka_models.base_data_structure import DataStructure
+from application.pipelines.process_pool import map_apply
+from application.settings import PROCESS_POOL_CONFIG
+from application.utils.metrics import registry
+
+# 各管道阶段的耗时及进出记录数
+STAGE_SECONDS = registry.histogram('pipeline_stage_seconds', '管道阶段处理一个批次的耗时（秒）', ['stage'])
+STAGE_RECORDS_IN = registry.counter('pipeline_stage_records_in', '进入管道阶段的记录数', ['stage'])
+STAGE_RECORDS_OUT = registry.counter('pipeline_stage_records_out', '离开管道阶段的记录数', ['stage'])
 
 
 class BasePipeline(Transform):
@@ -12,27 +21,78 @@ class BasePipeline(Transform):
     子类必须实现 apply 和 apply_batch 方法。
     """
     change_data_structure = True  # 是否在通过管道后变更数据（默认是，在入库或者一些操作是会变更数据结构但是后续还要用到原结构时使用）
+    snapshot_input = False  # 不变更数据时是否对输入做深拷贝快照（仅当 apply 会原地修改记录本身时需要开启）
+    use_process_pool = False  # 是否在进程池中按块执行 apply（仅适合 CPU 密集、不访问数据库的 apply）
+    process_workers = None  # 进程数，None 时使用 PROCESS_POOL_CONFIG['max_workers']
+    process_chunk_size = None  # 每块记录数，None 时使用 PROCESS_POOL_CONFIG['chunk_size']
 
-    def encodes(self, obj: List[DataStructure]):
+    def encodes(self, obj: list):
         """
         异步处理输入序列，将每个元素应用 apply 方法，
         然后批量应用 apply_batch 方法。
+
+        按 list 分派而不是 List[DataStructure]：后者会让 fasttransform 检查元素类型，
+        元素为 LazyRecord 时不匹配，整个管道会被静默跳过，并且检查本身会触发解码。
+
+        change_data_structure 为 False 时，apply 的结果写入独立列表交给 apply_batch，
+        原批次不被覆盖，直接原样传给下一个管道，无需拷贝。
+        """
+        stage = type(self).__name__
+        STAGE_RECORDS_IN.labels(stage=stage).inc(len(obj))
+        start = time.perf_counter()
+
+        result = self._encodes(obj)
+
+        STAGE_SECONDS.labels(stage=stage).observe(time.perf_counter() - start)
+        STAGE_RECORDS_OUT.labels(stage=stage).inc(len(result))
+        return result
+
+    def _encodes(self, obj: List[DataStructure]):
+        """
+        encodes 的处理逻辑，不含指标记录
+        """
+        # 批次预处理（如批量解析、过滤）
+        obj = self.prepare_batch(obj)
+
+        if self.change_data_structure:
+            # 对每个元素单独处理
+            obj[:] = self.apply_all(obj)
+            # 批量处理
+            return self.apply_batch(obj)
+
+        # 深拷贝快照，确保 apply 原地修改记录时源数据不受影响
+        result = copy.deepcopy(obj) if self.snapshot_input else obj
+        self.apply_batch(self.apply_all(obj))
+        return result
+
+    def apply_all(self, value: List) -> List:
         """
-        copy_obj = []
-        if not self.change_data_structure:
-            # 深拷贝，确保源数据不被修改
-            copy_obj = copy.deepcopy(obj)
+        对批次中每个元素执行 apply。
+        开启 use_process_pool 且批次不小于 PROCESS_POOL_CONFIG['min_batch_size'] 时在进程池中按块执行，
+        记录以紧凑格式传入子进程，apply 的结果需可被 pickle。
+        """
+        if self.use_process_pool and len(value) >= PROCESS_POOL_CONFIG['min_batch_size']:
+            return map_apply(self, value)
+        return [self.apply(item) for item in value]
 
-        # 对每个元素单独处理
-        for i in range(len(obj)):
-            obj[i] = self.apply(obj[i])
+    def __getstate__(self):
+        # 进程池不能随管道实例传入子进程
+        state = self.__dict__.copy()
+        state.pop('_process_pool', None)
+        return state
 
-        # 批量处理
-        obj = self.apply_batch(obj)
+    def verify(self):
+        """
+        消费者启动时检查管道依赖的外部条件（如表结构），不满足时抛出异常。
+        默认不检查。
+        """
 
-        if not self.change_data_structure:
-            return copy_obj
-        return obj
+    def prepare_batch(self, value: List) -> List:
+        """
+        在逐条 apply 之前对整个批次进行预处理，可用于批量预取数据或过滤记录。
+        默认原样返回。
+        """
+        return value
 
     def apply(self, value: DataStructure):
         """
@@ -0,0 +1,50 @@
+from typing import Any, Dict, List, Tuple
+
+from application.models.kafka_models.base_data_structure import DataStructure
+from application.pipelines.base_pipeline import BasePipeline
+
+
+class FieldPipeline(BasePipeline):
+    """
+    按字段声明输入输出的管道阶段。
+
+    阶段只读取 in_fields，返回每条记录 out_fields 的取值，由调用方写回记录，
+    因此多个互不依赖的阶段可以共享同一批记录并行执行，无需逐分支深拷贝。
+    单独放入 pipe_list 时按普通管道顺序执行。
+
+    Attributes
+    ----------
+    in_fields : tuple
+        读取的记录字段。
+    out_fields : tuple
+        产出的记录字段，写回时只更新这些字段。
+    """
+    change_data_structure = False
+    in_fields: Tuple[str, ...] = ()
+    out_fields: Tuple[str, ...] = ()
+
+    def compute(self, value: List[DataStructure]) -> List[Dict[str, Any]]:
+        """
+        计算整批记录的字段结果，返回与输入等长、顺序一致的列表。
+        默认逐条调用 compute_one，需要批量查询时重写本方法。
+        """
+        return [self.compute_one(item) for item in value]
+
+    def compute_one(self, value: DataStructure) -> Dict[str, Any]:
+        """
+        计算单条记录的字段结果。
+        子类必须实现（或重写 compute）。
+        """
+        return {}
+
+    def merge(self, value: List[DataStructure], results: List[Dict[str, Any]]):
+        """
+        将字段结果写回记录，只更新 out_fields
+        """
+        for item, fields in zip(value, results):
+            for name in self.out_fields:
+                setattr(item, name, fields[name])
+
+    def apply_batch(self, value: List) -> List:
+        self.merge(value, self.compute(value))
+        return value
@@ -1,14 +1,42 @@
 from typing import List
 
-from application.db.mysql_db.info.ResourceInformationList import ResourceInformationList
+from application.cache import get_dedup_index
 from application.pipelines.base_pipeline import BasePipeline
+from application.settings import DEDUP_CONFIG, WRITE_CONFIG
+from application.utils.metrics import registry
+
+DEDUP_RECORDS = registry.counter('dedup_records', '去重阶段处理的记录数，result 为 kept 或 dropped', ['result'])
+DEDUP_DROP_RATIO = registry.gauge('dedup_drop_ratio', '最近一个批次被去重丢弃的记录比例')
 
 
 class InformationDeduplicationPipeline(BasePipeline):
+    """
+    过滤已入库或在同一批次中重复出现的资讯。
+
+    WRITE_CONFIG['mode'] 为 upsert 时已入库的资讯可能是更新后重新投递的，需要交给入库阶段按内容比对写入，
+    因此只合并同一批次内的重复资讯（保留最后一条），不查询去重索引。
+    """
 
     def apply_batch(self, value: List) -> List:
-        # 查询所有 information_id
-        all_ids = ResourceInformationList.select(ResourceInformationList.information_id)
-        # 转成 set
-        id_set = {record.information_id for record in all_ids}
-        return [item for item in value if item.uid not in id_set]
+        if not DEDUP_CONFIG['enabled']:
+            return value
+        if WRITE_CONFIG['mode'] == 'upsert':
+            result = list({item.uid: item for item in value}.values())
+            self._observe(len(value), len(result))
+            return result
+        # 通过去重索引判断哪些 id 尚未入库，未命中索引的才会定向查库
+        new_ids = get_dedup_index().filter_new(item.uid for item in value)
+        result = []
+        for item in value:
+            if item.uid in new_ids:
+                new_ids.discard(item.uid)  # 同批次内重复的只保留第一条
+                result.append(item)
+        self._observe(len(value), len(result))
+        return result
+
+    @staticmethod
+    def _observe(total: int, kept: int):
+        """记录保留和丢弃的记录数"""
+        DEDUP_RECORDS.labels(result='kept').inc(kept)
+        DEDUP_RECORDS.labels(result='dropped').inc(total - kept)
+        DEDUP_DROP_RATIO.labels().set((total - kept) / total if total else 0.0)
@@ -1,103 +1,356 @@
-import random
-import time
-from typing import List
-from urllib.parse import urlparse
+import hashlib
+from collections import defaultdict
+from typing import List, Optional, Tuple
 
-from application.db import get_database_connection
+from peewee import Case
+
+from application.cache import claiming, dedup_index_enabled, get_dedup_index
+from application.consumers.retry import reject
+from application.db import get_database_connection, write_behind
+from application.db.bulk import (estimate_row_size, get_chunk_config, insert_many_chunked, timed_write, upsert_many,
+                                 verify_natural_key)
 from application.db.mysql_db.info.ResourceInformationAttachmentList import ResourceInformationAttachmentList
 from application.db.mysql_db.info.ResourceInformationList import ResourceInformationList
 from application.db.mysql_db.info.ResourceInformationSectionList import ResourceInformationSectionList
 from application.db.mysql_db.info.ResourceInformationTagsRelation import ResourceInformationTagsRelation
-from application.db.mysql_db.info.ResourceSourceDict import ResourceSourceDict
 
 from application.models.kafka_models.information_data_structure import InformationDataStructure
 from application.pipelines.base_pipeline import BasePipeline
+from application.settings import SOURCE_CONFIG, WRITE_CONFIG
+from application.utils import get_logger, json_codec
 from application.utils.decorators import log_execution
+from application.utils.metrics import registry
+
+logger = get_logger(__name__)
+
+SECTION_SYNC_ROWS = registry.counter('section_sync_rows', 'upsert 模式下段落同步的行数，result 为 inserted/moved/unchanged/deleted',
+                                     ['result'])
+# 查询已有段落及删除过期段落时每条语句携带的 id 数量
+SECTION_LOOKUP_CHUNK_SIZE = 1000
+
+# 各表数据行的列顺序，apply 按此顺序生成元组，写入时作为 insert_many 的 fields
+INFORMATION_FIELDS = ('information_id', 'information_name', 'information_description', 'original_link',
+                      'original_language', 'publish_date', 'metadata', 'source_id')
+TAGGING_FIELDS = ('information_id', 'tag_code', 'tag_value')
+ATTACHMENT_FIELDS = ('information_id', 'attachment_name', 'attachment_address', 'display_order')
+SECTION_FIELDS = ('section_id', 'information_id', 'section_order', 'title_level', 'marc_code', 'src_text', 'dst_text',
+                  'media_info', 'md5_encode')
+# 段落同步比对所用的列：section_id、md5_encode，位置变化时只更新 section_order
+_SECTION_KEY = (SECTION_FIELDS.index('section_id'), SECTION_FIELDS.index('md5_encode'))
+_SECTION_ORDER = SECTION_FIELDS.index('section_order')
+
+
+def _section_key(row: tuple) -> tuple:
+    return row[_SECTION_KEY[0]], row[_SECTION_KEY[1]]
+
+
+class InformationRows:
+    """
+    一条资讯在各表中的待写入数据，由 InformationIntoPipeline.apply 生成。
+    每行为按对应 *_FIELDS 列顺序排列的元组，写入时直接合并为各表的行列表，不再构建 dict。
+
+    Attributes
+    ----------
+    information_id : str
+        资讯唯一标识。
+    information : tuple
+        资讯列表行，列顺序见 INFORMATION_FIELDS。
+    tagging : tuple
+        资讯标签关系行，列顺序见 TAGGING_FIELDS。
+    attachments : List[tuple]
+        附件行，列顺序见 ATTACHMENT_FIELDS。
+    sections : List[tuple]
+        段落行，列顺序见 SECTION_FIELDS。
+    """
+    __slots__ = ('information_id', 'information', 'tagging', 'attachments', 'sections')
+
+    def __init__(self, information_id: str, information: tuple, tagging: tuple, attachments: List[tuple],
+                 sections: List[tuple]):
+        self.information_id = information_id
+        self.information = information
+        self.tagging = tagging
+        self.attachments = attachments
+        self.sections = sections
+
+    def rows(self):
+        """各表的数据行"""
+        yield self.information
+        yield self.tagging
+        yield from self.attachments
+        yield from self.sections
+
+    def asdict(self) -> dict:
+        """以字段名为键的结构，用于写入死信队列"""
+        return {
+            'information_list': dict(zip(INFORMATION_FIELDS, self.information)),
+            'information_tagging_relationships': dict(zip(TAGGING_FIELDS, self.tagging)),
+            'information_attachment': [dict(zip(ATTACHMENT_FIELDS, row)) for row in self.attachments],
+            'information_section': [dict(zip(SECTION_FIELDS, row)) for row in self.sections],
+        }
+
+    def __repr__(self):
+        return (f"<InformationRows {self.information_id}: "
+                f"{len(self.attachments)} attachments, {len(self.sections)} sections>")
 
 
 class InformationIntoPipeline(BasePipeline):
     """
     将信息对象转换为数据库可插入格式并批量写入 MySQL。
+    依赖 InformationSourcePipeline、InformationTagPipeline 写入的 source_id 和 tag_code 字段。
     """
     change_data_structure = False  # 不改变数据
-    # 临时
-    tag_code = {
-        "information_nsfc": "info_nsfc",  # 标签代码
-    }
 
-    def apply(self, value: InformationDataStructure):
+    def verify(self):
         """
-        将单个信息对象转换为数据库字段元组。
+        upsert 模式下检查资讯列表和标签关系表上存在自然键的唯一索引，缺少时抛出 RuntimeError
         """
-        return {
-            "information_list": {
-                "information_id": value.uid,  # 信息唯一标识
-                "information_name": {'zh': value.name},  # 信息名称
-                "information_description": {'zh': value.data.description},  # 信息描述
-                "original_link": value.metadata.details_page,  # 原始链接
-                "original_language": value.metadata.marc_code,  # 原始语言
-                "publish_date": value.data.info_date,  # 发布时间
-                "metadata": {"info_author": value.data.info_author},  # 元数据
-                "source_id": self.find_source_id(value.metadata.details_page),  # 来源id
-            },
-            'information_tagging_relationships': {
-                'information_id': value.uid,  # 信息唯一标识
-                'tag_code': self.tag_code.get(value.data_type),  # 标签code
-                'tag_value': value.tag_values,  # 标签值
-            },
-            "information_attachment": [
-                {
-                    "information_id": value.uid,  # 信息唯一标识
-                    "attachment_name": link.get("accessory_name", ''),  # 附件名称
-                    "attachment_address": link.get("accessory_url", ''),  # 附件存储地址（OSS地址）
-                    "display_order": index + 1  # 展示顺序（从1开始）
-                }
+        if WRITE_CONFIG['mode'] == 'upsert':
+            verify_natural_key(ResourceInformationList)
+            verify_natural_key(ResourceInformationTagsRelation)
+
+    def prepare_batch(self, value: List) -> List:
+        """
+        按 SOURCE_CONFIG['unresolved_policy'] 处理来源 id 未解析（source_id 为 None）的记录：
+
+        - skip：丢弃该记录
+        - default：使用 SOURCE_CONFIG['default_source_id']
+        - dead_letter：丢弃并交给重试器作为失败记录返回，由消费者统一写入死信队列
+
+        source_id 由 InformationSourcePipeline 在此之前写入记录。
+        被丢弃的记录释放去重阶段认领的 id（共享去重后端），重新投递时可立即处理。
+        """
+        policy = SOURCE_CONFIG['unresolved_policy']
+        if all(item.source_id for item in value):
+            return value
+
+        result = []
+        dropped = []
+        for item in value:
+            if item.source_id:
+                result.append(item)
+            elif policy == 'default':
+                item.source_id = SOURCE_CONFIG['default_source_id']
+                result.append(item)
+            elif policy == 'dead_letter':
+                reject(item, f"未找到来源域名: {item.metadata.details_page}")
+                dropped.append(item.uid)
+            else:
+                logger.warning(f"未找到来源 {item.metadata.details_page}，跳过记录 {item.uid}")
+                dropped.append(item.uid)
+        if dropped and dedup_index_enabled():
+            get_dedup_index().release_many(dropped)
+        return result
+
+    def apply(self, value: InformationDataStructure) -> InformationRows:
+        """
+        将单个信息对象转换为各表按列顺序排列的数据行。
+        """
+        return InformationRows(
+            value.uid,
+            (
+                value.uid,  # 信息唯一标识
+                {'zh': value.name},  # 信息名称
+                {'zh': value.data.description},  # 信息描述
+                value.metadata.details_page,  # 原始链接
+                value.metadata.marc_code,  # 原始语言
+                value.data.info_date,  # 发布时间
+                {"info_author": value.data.info_author},  # 元数据
+                value.source_id,  # 来源id
+            ),
+            (
+                value.uid,  # 信息唯一标识
+                value.tag_code,  # 标签code
+                value.tag_values,  # 标签值
+            ),
+            [
+                (
+                    value.uid,  # 信息唯一标识
+                    link.get("accessory_name", ''),  # 附件名称
+                    link.get("accessory_url", ''),  # 附件存储地址（OSS地址）
+                    index + 1,  # 展示顺序（从1开始）
+                )
                 for index, link in enumerate(value.link_data)
             ],
-            'information_section': [
-                {
-                    "section_id": f"{value.uid}_{int(time.time())}_{random.randint(1000, 9999)}",
-                    "information_id": value.uid,  # 信息唯一标识
-                    "section_order": index + 1,  # 展示顺序（从1开始）
-                    "title_level": item.get('title_level', 0) or 0,
-                    "marc_code": item.get("marc_code"),
-                    "src_text": item.get("text_info"),
-                    "dst_text": item.get("dst_text"),
-                    "media_info": item.get("media_info"),
-                    "md5_encode": f"{value.uid}_{int(time.time())}_{random.randint(1000, 9999)}",
-                }
-                for index, item in enumerate(value.data.info_section)
-            ],
-        }
+            self._sections(value),
+        )
 
-    @log_execution
-    @get_database_connection().atomic()  # 保证事务
+    @staticmethod
+    def _sections(value: InformationDataStructure) -> List[tuple]:
+        """
+        段落数据行，列顺序见 SECTION_FIELDS。md5_encode 为段落内容（原文、译文、媒体信息、语言、标题级别）的 MD5；
+        section_id 由资讯 id、内容哈希及相同内容在该资讯中的出现次序生成，内容不变时保持不变。
+        """
+        rows = []
+        occurrences = defaultdict(int)
+        for index, item in enumerate(value.data.info_section):
+            title_level = item.get('title_level', 0) or 0
+            content = [
+                item.get("text_info"), item.get("dst_text"), item.get("media_info"), item.get("marc_code"), title_level,
+            ]
+            md5_encode = hashlib.md5(json_codec.dumps(content, sort_keys=True)).hexdigest()
+            occurrence = occurrences[md5_encode]
+            occurrences[md5_encode] += 1
+            rows.append((
+                'si' + hashlib.md5(f"{value.uid}:{md5_encode}:{occurrence}".encode('utf-8')).hexdigest(),  # 段落id
+                value.uid,  # 信息唯一标识
+                index + 1,  # 展示顺序（从1开始）
+                title_level,
+                content[3],  # 语言
+                content[0],  # 原文
+                content[1],  # 译文
+                content[2],  # 媒体信息
+                md5_encode,  # 段落内容 MD5
+            ))
+        return rows
+
+    @log_execution(sample_rate=10)
     def apply_batch(self, value: List) -> List:
         """
-        批量插入数据库。
+        批量写入数据库，事务提交后将新 id 写入去重索引。
+
+        WRITE_CONFIG['mode'] 为 upsert 时按自然键幂等写入，重复投递的批次不会产生重复数据：
+
+        - 资讯列表按 information_id、标签关系按 (information_id, tag_code) 执行 ON DUPLICATE KEY UPDATE
+        - 附件按 information_id 先删除再插入，整体替换
+        - 段落按内容哈希与已有段落比对，只写入新增或变化的段落，只移动位置的段落更新 section_order，删除已不存在的段落
+
+        附件和段落按 BULK_WRITE_CONFIG 拆分为多条语句，在同一事务中执行。
+
+        消费者开启写后缓冲时，数据加入缓冲而不立即写入，与后续批次的数据合并后由 write 在一个事务中写入。
         """
-        into_information_list = []
-        into_information_tagging_relationships = []
-        into_information_attachment = []
-        into_information_section = []
-        for item in value:
-            into_information_list.append(item['information_list'])
-            into_information_tagging_relationships.append(item['information_tagging_relationships'])
-            into_information_attachment.extend(item['information_attachment'])
-            into_information_section.extend(item['information_section'])
-        ResourceInformationList.insert_many(into_information_list).execute()  # 资讯列表
-        ResourceInformationTagsRelation.insert_many(into_information_tagging_relationships).execute()  # 资讯标签关系
-        ResourceInformationAttachmentList.insert_many(into_information_attachment).execute()  # 资讯附件
-        ResourceInformationSectionList.insert_many(into_information_section).execute()  # 资讯段落
+        if not value:
+            return value
+        batch = write_behind.current_batch()
+        if batch is not None:
+            rows = 0
+            size = 0
+            for item in value:
+                for row in item.rows():
+                    rows += 1
+                    size += estimate_row_size(row)
+            batch.add(self.write, value, rows=rows, size=size, release=self.release_claims)
+            return value
+        self.write(value)
         return value
 
     @staticmethod
-    def find_source_id(url):
+    def release_claims(value: List, claim_token: Optional[str] = None):
         """
-        根据链接查找资源id
+        释放写后缓冲中未能写入的数据的去重认领，由写后缓冲在数据写入失败或停止时丢弃数据时调用
+
+        Args:
+            value: apply 生成的 InformationRows
+            claim_token: 数据所属消费批次的认领标识
+        """
+        if dedup_index_enabled():
+            with claiming(claim_token):
+                get_dedup_index().release_many(item.information_id for item in value)
+
+    def write(self, value: List) -> List:
         """
-        parsed_url = urlparse(url)
-        domain = parsed_url.netloc  # 结果: "www.nsfc.gov.cn"
-        record = ResourceSourceDict.get_or_none(ResourceSourceDict.source_main_link == domain)
+        在一个事务中写入 apply 转换后的数据，提交后将新 id 写入去重索引
+
+        Args:
+            value: apply 生成的 InformationRows，可以是多个批次合并后的数据
+        """
+        # 同一批次中重复的资讯只保留最后一条
+        items = list({item.information_id: item for item in value}.values())
+        # 各表的行列表只引用 apply 生成的元组，不复制数据
+        information_ids = [item.information_id for item in items]
+        into_information_list = [item.information for item in items]
+        into_information_tagging_relationships = [item.tagging for item in items]
+        into_information_attachment = [row for item in items for row in item.attachments]
+        into_information_section = [row for item in items for row in item.sections]
+
+        try:
+            with get_database_connection().atomic():  # 保证事务
+                if WRITE_CONFIG['mode'] == 'upsert':
+                    with timed_write(ResourceInformationList):
+                        upsert_many(ResourceInformationList, into_information_list, INFORMATION_FIELDS)  # 资讯列表
+                    with timed_write(ResourceInformationTagsRelation):
+                        upsert_many(ResourceInformationTagsRelation, into_information_tagging_relationships,
+                                    TAGGING_FIELDS)  # 资讯标签关系
+                    with timed_write(ResourceInformationAttachmentList):
+                        self._replace(ResourceInformationAttachmentList, information_ids, into_information_attachment,
+                                      ATTACHMENT_FIELDS)  # 资讯附件
+                    with timed_write(ResourceInformationSectionList):
+                        self._sync_sections(information_ids, into_information_section)  # 资讯段落
+                else:
+                    with timed_write(ResourceInformationList):
+                        ResourceInformationList.insert_many(into_information_list,
+                                                            fields=INFORMATION_FIELDS).execute()  # 资讯列表
+                    with timed_write(ResourceInformationTagsRelation):
+                        ResourceInformationTagsRelation.insert_many(into_information_tagging_relationships,
+                                                                    fields=TAGGING_FIELDS).execute()  # 资讯标签关系
+                    with timed_write(ResourceInformationAttachmentList):
+                        insert_many_chunked(ResourceInformationAttachmentList, into_information_attachment,
+                                            ATTACHMENT_FIELDS)  # 资讯附件
+                    with timed_write(ResourceInformationSectionList):
+                        insert_many_chunked(ResourceInformationSectionList, into_information_section,
+                                            SECTION_FIELDS)  # 资讯段落
+        except Exception:
+            # 释放本批次认领的 id，重新投递或重试时可立即处理
+            if dedup_index_enabled():
+                get_dedup_index().release_many(information_ids)
+            raise
+        if dedup_index_enabled():
+            get_dedup_index().add_many(information_ids)
+        return value
+
+    @staticmethod
+    def _replace(model, information_ids: List[str], rows: List[tuple], fields: Tuple[str, ...]):
+        """
+        按 information_id 替换子表数据：先按该表的分块行数分批删除旧记录，再分块插入新记录
+        """
+        chunk_size = get_chunk_config(model)['max_rows']
+        for start in range(0, len(information_ids), chunk_size):
+            model.delete().where(model.information_id.in_(information_ids[start:start + chunk_size])).execute()
+        insert_many_chunked(model, rows, fields)
+
+    @staticmethod
+    def _sync_sections(information_ids: List[str], rows: List[tuple]):
+        """
+        按内容哈希同步段落：按 information_id 索引一次查询已有段落的 section_id、md5_encode 和 section_order，
+        按 (section_id, md5_encode) 比对，删除已不存在的段落，只插入新增的段落；
+        内容未变只是位置变化的段落只更新 section_order，不重写内容
+        """
+        model = ResourceInformationSectionList
+        existing = {}
+        stale_ids = []
+        for start in range(0, len(information_ids), SECTION_LOOKUP_CHUNK_SIZE):
+            query = (model
+                     .select(model.list_id, model.section_id, model.md5_encode, model.section_order)
+                     .where(model.information_id.in_(information_ids[start:start + SECTION_LOOKUP_CHUNK_SIZE]))
+                     .tuples())
+            for list_id, section_id, md5_encode, section_order in query:
+                key = (section_id, md5_encode)
+                if key in existing:
+                    stale_ids.append(list_id)  # 重复的段落只保留一条
+                else:
+                    existing[key] = (list_id, section_order)
+
+        inserts = []
+        moves = []
+        for row in rows:
+            key = _section_key(row)
+            if key not in existing:
+                inserts.append(row)
+                continue
+            list_id, section_order = existing.pop(key)
+            if section_order != row[_SECTION_ORDER]:
+                moves.append((list_id, row[_SECTION_ORDER]))
+        stale_ids.extend(list_id for list_id, _ in existing.values())
 
-        return record.source_id
+        for start in range(0, len(stale_ids), SECTION_LOOKUP_CHUNK_SIZE):
+            model.delete().where(model.list_id.in_(stale_ids[start:start + SECTION_LOOKUP_CHUNK_SIZE])).execute()
+        for start in range(0, len(moves), SECTION_LOOKUP_CHUNK_SIZE):
+            chunk = moves[start:start + SECTION_LOOKUP_CHUNK_SIZE]
+            (model
+             .update(section_order=Case(model.list_id, chunk))
+             .where(model.list_id.in_([list_id for list_id, _ in chunk]))
+             .execute())
+        insert_many_chunked(model, inserts, SECTION_FIELDS)
+        SECTION_SYNC_ROWS.labels(result='inserted').inc(len(inserts))
+        SECTION_SYNC_ROWS.labels(result='moved').inc(len(moves))
+        SECTION_SYNC_ROWS.labels(result='unchanged').inc(len(rows) - len(inserts) - len(moves))
+        SECTION_SYNC_ROWS.labels(result='deleted').inc(len(stale_ids))
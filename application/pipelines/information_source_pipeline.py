@@ -0,0 +1,18 @@
+from typing import Any, Dict, List
+
+from application.cache import get_source_id_cache
+from application.pipelines.field_pipeline import FieldPipeline
+
+
+class InformationSourcePipeline(FieldPipeline):
+    """
+    根据详情页域名批量解析来源 id，写入记录的 source_id 字段（未知来源为 None）。
+    """
+    in_fields = ('metadata',)
+    out_fields = ('source_id',)
+
+    def compute(self, value: List) -> List[Dict[str, Any]]:
+        cache = get_source_id_cache()
+        domains = [cache.parse_domain(item.metadata.details_page) for item in value]
+        source_ids = cache.resolve_many(domains)
+        return [{'source_id': source_ids[domain]} for domain in domains]
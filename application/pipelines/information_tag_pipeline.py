@@ -0,0 +1,20 @@
+from typing import Any, Dict
+
+from application.models.kafka_models.information_data_structure import InformationDataStructure
+from application.pipelines.field_pipeline import FieldPipeline
+
+
+class InformationTagPipeline(FieldPipeline):
+    """
+    将数据类型映射为标签代码，写入记录的 tag_code 字段。
+    未映射的数据类型写入空字符串：tag_code 非空，(information_id, tag_code) 唯一索引才能判断冲突。
+    """
+    in_fields = ('data_type',)
+    out_fields = ('tag_code',)
+    # 临时
+    tag_code = {
+        "information_nsfc": "info_nsfc",  # 标签代码
+    }
+
+    def compute_one(self, value: InformationDataStructure) -> Dict[str, Any]:
+        return {'tag_code': self.tag_code.get(value.data_type, '')}
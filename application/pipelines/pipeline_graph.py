@@ -0,0 +1,184 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Dict, List, Set
+
+from application.db import release_database_connections
+from application.pipelines.base_pipeline import STAGE_SECONDS, BasePipeline
+from application.pipelines.field_pipeline import FieldPipeline
+from application.pipelines.process_pool import _init_process
+from application.settings import PIPELINE_GRAPH_CONFIG, PROCESS_POOL_CONFIG
+from application.utils import get_logger
+from application.utils.metrics import registry
+
+logger = get_logger(__name__)
+
+# 每个批次关键路径（依赖链上耗时之和的最大值）及实际总耗时
+CRITICAL_PATH_SECONDS = registry.histogram('pipeline_critical_path_seconds', '并行管道每个批次的关键路径耗时（秒）', ['graph'])
+GRAPH_SECONDS = registry.histogram('pipeline_graph_seconds', '并行管道每个批次的实际耗时（秒）', ['graph'])
+
+
+def _run_stage(stage: FieldPipeline, records: List):
+    """
+    在线程或进程中执行一个阶段，返回字段结果及耗时。
+    线程模式下执行结束后归还本线程持有的数据库连接。
+    """
+    start = time.perf_counter()
+    try:
+        return stage.compute(records), time.perf_counter() - start
+    finally:
+        release_database_connections()
+
+
+class PipelineGraph(BasePipeline):
+    """
+    按字段依赖并行执行多个 FieldPipeline 的管道。
+
+    阶段 B 的 in_fields 包含阶段 A 的 out_fields 时，B 在 A 写回结果后才开始执行；
+    其余阶段在线程池或进程池中并行执行，读取同一批记录，结果按 out_fields 写回，
+    不为每个分支深拷贝记录。进程模式下记录经 pickle 传入子进程，子进程启动时丢弃继承的数据库、Redis 连接
+    并重建日志写线程，访问数据库的阶段（需要时）在子进程中各自建立连接；IO 阶段应使用线程模式。
+
+    每个批次记录实际耗时和关键路径耗时，最近一次的明细保存在 last_run 中。
+
+    Attributes
+    ----------
+    graph_name : str
+        指标标签中的管道名称。
+    stages : list
+        参与并行的阶段。
+    dependencies : list
+        每个阶段依赖的阶段下标。
+    last_run : dict
+        最近一个批次各阶段的耗时、关键路径及总耗时。
+    """
+    change_data_structure = False
+
+    def __init__(self, *stages: FieldPipeline, name: str = None, executor: str = None, max_workers: int = None):
+        super().__init__()
+        self.stages = list(stages)
+        self.graph_name = name or '+'.join(type(stage).__name__ for stage in self.stages)
+        self.executor_type = executor or PIPELINE_GRAPH_CONFIG['executor']
+        self.max_workers = max_workers or PIPELINE_GRAPH_CONFIG['max_workers']
+        self.dependencies = self._build_dependencies(self.stages)
+        self.last_run = {}
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @staticmethod
+    def _build_dependencies(stages: List[FieldPipeline]) -> List[Set[int]]:
+        """
+        根据 in_fields / out_fields 计算阶段间的依赖，字段被多个阶段产出或存在环时抛出 ValueError
+        """
+        producers: Dict[str, int] = {}
+        for index, stage in enumerate(stages):
+            for field in stage.out_fields:
+                if field in producers:
+                    raise ValueError(
+                        f"字段 {field} 同时由 {type(stages[producers[field]]).__name__} 和 {type(stage).__name__} 产出"
+                    )
+                producers[field] = index
+
+        dependencies = [
+            {producers[field] for field in stage.in_fields if field in producers and producers[field] != index}
+            for index, stage in enumerate(stages)
+        ]
+
+        # 拓扑排序检查环
+        resolved: Set[int] = set()
+        while len(resolved) < len(stages):
+            ready = {index for index in range(len(stages)) if index not in resolved and dependencies[index] <= resolved}
+            if not ready:
+                cycle = [type(stages[index]).__name__ for index in range(len(stages)) if index not in resolved]
+                raise ValueError(f"管道阶段存在循环依赖: {cycle}")
+            resolved |= ready
+        return dependencies
+
+    def verify(self):
+        """检查各阶段依赖的外部条件"""
+        for stage in self.stages:
+            stage.verify()
+
+    def _get_executor(self):
+        """懒加载创建阶段执行池"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    if self.executor_type == 'process':
+                        self._executor = ProcessPoolExecutor(
+                            max_workers=self.max_workers,
+                            mp_context=multiprocessing.get_context(PROCESS_POOL_CONFIG['start_method']),
+                            initializer=_init_process,
+                        )
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.max_workers, thread_name_prefix=f'graph-{self.graph_name}'
+                        )
+        return self._executor
+
+    def apply_batch(self, value: List) -> List:
+        """
+        依赖满足的阶段立即提交执行，每完成一个阶段就写回其字段并提交新就绪的阶段
+        """
+        if not value or not self.stages:
+            return value
+        executor = self._get_executor()
+        start = time.perf_counter()
+        durations: Dict[int, float] = {}
+        remaining = set(range(len(self.stages)))
+        pending = {}
+
+        def submit_ready():
+            for index in sorted(remaining):
+                if self.dependencies[index] <= durations.keys():
+                    remaining.discard(index)
+                    pending[executor.submit(_run_stage, self.stages[index], value)] = index
+
+        submit_ready()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                results, seconds = future.result()
+                self.stages[index].merge(value, results)
+                durations[index] = seconds
+                STAGE_SECONDS.labels(stage=type(self.stages[index]).__name__).observe(seconds)
+            submit_ready()
+
+        elapsed = time.perf_counter() - start
+        critical_seconds, critical_path = self._critical_path(durations)
+        CRITICAL_PATH_SECONDS.labels(graph=self.graph_name).observe(critical_seconds)
+        GRAPH_SECONDS.labels(graph=self.graph_name).observe(elapsed)
+        self.last_run = {
+            'stages': {type(self.stages[index]).__name__: seconds for index, seconds in durations.items()},
+            'critical_path': critical_path,
+            'critical_path_seconds': critical_seconds,
+            'seconds': elapsed,
+        }
+        logger.debug(f"{self.graph_name} 关键路径 {' -> '.join(critical_path)} 耗时 {critical_seconds:.3f} 秒，实际耗时 {elapsed:.3f} 秒")
+        return value
+
+    def _critical_path(self, durations: Dict[int, float]):
+        """
+        计算依赖链上耗时之和最大的路径
+
+        Returns:
+            Tuple[float, List[str]]: 关键路径耗时及路径上的阶段名
+        """
+        finish: Dict[int, float] = {}
+        previous: Dict[int, int] = {}
+        # 按依赖顺序递推每个阶段在关键路径意义下的完成时间
+        while len(finish) < len(durations):
+            for index in durations:
+                if index in finish or not self.dependencies[index] <= finish.keys():
+                    continue
+                before = max(self.dependencies[index], key=lambda dep: finish[dep], default=None)
+                finish[index] = durations[index] + (finish[before] if before is not None else 0.0)
+                if before is not None:
+                    previous[index] = before
+        last = max(finish, key=finish.get)
+        path = [last]
+        while path[-1] in previous:
+            path.append(previous[path[-1]])
+        return finish[last], [type(self.stages[index]).__name__ for index in reversed(path)]
@@ -0,0 +1,151 @@
+"""
+管道进程池
+将 BasePipeline.apply 按块分发到子进程执行，用于 CPU 密集的逐条处理
+"""
+
+import math
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, List, Tuple
+
+import faust
+
+from application.settings import PROCESS_POOL_CONFIG
+
+# 子进程中的管道实例，由 _init_worker 在进程启动时设置一次
+_worker_pipeline = None
+
+_pools_lock = threading.Lock()
+
+
+class _PackedRecord(tuple):
+    """嵌套 Record 的打包形式：(类, 字段名, 值元组)"""
+    __slots__ = ()
+
+
+def _pack_value(value, schemas: dict):
+    """
+    递归展开值中的 faust Record，同类 Record 共用同一个字段名元组，
+    pickle 按对象去重，每块只传一次
+    """
+    if isinstance(value, faust.Record):
+        fields = vars(value)
+        names = tuple(fields)
+        names = schemas.setdefault((type(value), names), names)
+        return _PackedRecord((type(value), names, tuple(_pack_value(item, schemas) for item in fields.values())))
+    if isinstance(value, list):
+        return [_pack_value(item, schemas) for item in value]
+    if isinstance(value, dict):
+        return {key: _pack_value(item, schemas) for key, item in value.items()}
+    return value
+
+
+def _unpack_value(value):
+    """还原 _pack_value 展开的值"""
+    if type(value) is _PackedRecord:
+        cls, names, values = value
+        item = cls.__new__(cls)
+        vars(item).update(zip(names, map(_unpack_value, values)))
+        return item
+    if isinstance(value, list):
+        return [_unpack_value(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _unpack_value(item) for key, item in value.items()}
+    return value
+
+
+def pack_records(records: List) -> Tuple[type, Tuple[str, ...], List[tuple]]:
+    """
+    将同类记录压缩为 (类, 字段名, 值元组列表)，字段名每块只传一次。
+    按实例 __dict__ 打包，管道写入的附加字段（如 source_id）一并保留；
+    字段值中嵌套的 Record（如 data、metadata）同样展开为值元组。
+    """
+    names = {}
+    for item in records:
+        names.update(dict.fromkeys(vars(item)))
+    names = tuple(names)
+    schemas = {}
+    rows = [
+        tuple(_pack_value(fields[name], schemas) if name in fields else ... for name in names)
+        for fields in map(vars, records)
+    ]
+    return type(records[0]), names, rows
+
+
+def unpack_records(packed: Tuple[type, Tuple[str, ...], List[tuple]]) -> List:
+    """还原 pack_records 打包的记录，不经过 __init__ 校验"""
+    cls, names, rows = packed
+    records = []
+    for row in rows:
+        item = cls.__new__(cls)
+        vars(item).update((name, _unpack_value(value)) for name, value in zip(names, row) if value is not ...)
+        records.append(item)
+    return records
+
+
+def _init_process():
+    """
+    子进程初始化：丢弃从父进程继承的数据库、Redis 连接并重建日志写线程（start_method 为 fork 时必需）。
+    本模块及 PipelineGraph 的进程池都以它（或 _init_worker）作为 initializer
+    """
+    from application.db import discard_inherited_connections
+    from application.utils import logger_manager
+
+    discard_inherited_connections()
+    logger_manager.reinit_after_fork()
+
+
+def _init_worker(pipeline):
+    """
+    子进程初始化，每个进程只执行一次：保存管道实例，丢弃继承的连接并重建日志写线程
+    """
+    global _worker_pipeline
+    _worker_pipeline = pipeline
+    _init_process()
+
+
+def _apply_chunk(packed) -> List[Any]:
+    """在子进程中对一块记录执行 apply"""
+    return [_worker_pipeline.apply(item) for item in unpack_records(packed)]
+
+
+def get_process_pool(pipeline) -> ProcessPoolExecutor:
+    """
+    获取管道实例对应的进程池，首次调用时创建
+    """
+    pool = getattr(pipeline, '_process_pool', None)
+    if pool is None:
+        with _pools_lock:
+            pool = getattr(pipeline, '_process_pool', None)
+            if pool is None:
+                pool = ProcessPoolExecutor(
+                    max_workers=pipeline.process_workers or PROCESS_POOL_CONFIG['max_workers'],
+                    mp_context=multiprocessing.get_context(PROCESS_POOL_CONFIG['start_method']),
+                    initializer=_init_worker,
+                    initargs=(pipeline,),
+                )
+                pipeline._process_pool = pool
+    return pool
+
+
+def map_apply(pipeline, records: List) -> List[Any]:
+    """
+    在进程池中按块执行 pipeline.apply，结果顺序与输入一致
+
+    Args:
+        pipeline: 开启 use_process_pool 的管道实例
+        records: 批次记录
+
+    Returns:
+        List[Any]: 每条记录的 apply 结果
+    """
+    pool = get_process_pool(pipeline)
+    workers = pipeline.process_workers or PROCESS_POOL_CONFIG['max_workers']
+    chunk_size = (pipeline.process_chunk_size or PROCESS_POOL_CONFIG['chunk_size']
+                  or math.ceil(len(records) / workers))
+    chunks = [pack_records(records[start:start + chunk_size]) for start in range(0, len(records), chunk_size)]
+    results = []
+    for chunk_result in pool.map(_apply_chunk, chunks):
+        results.extend(chunk_result)
+    return results
@@ -0,0 +1,433 @@
+"""
+离线回放 / 回填
+从本地 JSONL（可 gzip 压缩）或 kcat 导出文件读取消息，不经过 Kafka，直接送入 TOPIC_CONFIG 中配置的消费者，
+与在线消费使用相同的 Pipeline 入库。
+
+- 每个文件视为一个分区：多个文件并行读取和处理，同一文件内按顺序写入和确认
+- 未压缩文件通过 mmap 按块读取，gzip 文件流式解压，解码在读取线程中完成
+- 开启检查点时记录每个文件已确认的字节位置，中断后用同一命令重新执行即从上次位置继续
+
+文件格式：
+
+- jsonl：每行一条消息体（InformationDataStructure 的 JSON，如 ``kcat -C -e -f '%s\\n'`` 的输出）
+- kcat：``kcat -C -e -J`` 的输出，每行一个包含 topic、partition、offset、headers、payload 的 JSON 对象
+- auto：按第一行内容判断
+
+用法::
+
+    python -m application.replay dumps/*.jsonl.gz --topic information --batch-size 1000 --checkpoint replay.json
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import mmap
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from application.cache import dedup_index_enabled, get_dedup_index
+from application.db import release_database_connections
+from application.settings import TOPIC_CONFIG
+from application.utils import get_logger, import_object, json_codec
+from application.utils.dead_letter import dead_letter_queue
+
+logger = get_logger(__name__)
+
+# 文件读取结束标记
+_END = object()
+
+
+class ReplayMessage:
+    """回放消息，包含消费者用到的 faust Message 字段；offset 和 end 为该消息在文件中的字节范围"""
+    __slots__ = ('topic', 'partition', 'offset', 'end', 'timestamp', 'value', 'serialized_value_size', 'headers')
+
+    def __init__(self, topic: str, partition: int, offset: int, end: int, value: bytes, headers: list = None):
+        self.topic = topic
+        self.partition = partition
+        self.offset = offset
+        self.end = end
+        # 历史消息的时间戳不参与延迟统计
+        self.timestamp = None
+        self.value = value
+        self.serialized_value_size = len(value)
+        self.headers = headers or []
+
+
+class ReplayEvent:
+    """回放事件，对应 faust Event"""
+    __slots__ = ('value', 'message')
+
+    def __init__(self, value, message: ReplayMessage):
+        self.value = value
+        self.message = message
+
+
+class DumpReader:
+    """
+    按块读取一个导出文件并解码为事件，在读取线程中调用。
+
+    未压缩文件使用 mmap，gzip 文件流式解压（offset 为解压后的字节位置，断点续传时解压并跳过之前的内容）。
+    空行和无法解码的行计入下一条消息的字节范围，无法解码的行写入死信队列。
+
+    Attributes
+    ----------
+    offset : int
+        已读取到的字节位置。
+    """
+
+    def __init__(self, path: str, partition: int, topic: str, value_type, lazy: bool = False,
+                 file_format: str = 'auto', start_offset: int = 0):
+        self.path = path
+        self.partition = partition
+        self.topic = topic
+        self.value_type = value_type
+        self.lazy = lazy
+        self.format = file_format
+        self.offset = start_offset
+        # 上一条产出消息的结束位置，下一条消息的字节范围从这里开始
+        self._span_start = start_offset
+        self._mmap = None
+        self._file = None
+        if path.endswith('.gz'):
+            self._file = gzip.open(path, 'rb')
+            self._file.seek(start_offset)
+        else:
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size:
+                    self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _next_line(self) -> Optional[bytes]:
+        """读取下一行（含换行符），文件结束时返回 None"""
+        if self._file is not None:
+            line = self._file.readline()
+            return line or None
+        if self._mmap is None or self.offset >= len(self._mmap):
+            return None
+        end = self._mmap.find(b'\n', self.offset)
+        end = len(self._mmap) if end < 0 else end + 1
+        return self._mmap[self.offset:end]
+
+    def _detect_format(self, line: bytes) -> str:
+        try:
+            data = json_codec.loads(line)
+        except ValueError:
+            return 'jsonl'
+        return 'kcat' if isinstance(data, dict) and 'payload' in data and 'offset' in data else 'jsonl'
+
+    @staticmethod
+    def _kcat_headers(headers) -> list:
+        """kcat -J 的消息头为 [key1, value1, key2, value2, ...]"""
+        if not headers:
+            return []
+        if isinstance(headers, dict):
+            headers = [item for pair in headers.items() for item in pair]
+        return [(key, value.encode('utf-8') if isinstance(value, str) else value)
+                for key, value in zip(headers[::2], headers[1::2])]
+
+    def _payload(self, line: bytes):
+        """返回消息体和消息头"""
+        if self.format == 'kcat':
+            envelope = json_codec.loads(line)
+            payload = envelope.get('payload')
+            if payload is None:
+                raise ValueError('kcat 记录中没有 payload')
+            if isinstance(payload, str):
+                payload = payload.encode('utf-8')
+            return payload, self._kcat_headers(envelope.get('headers'))
+        return line, []
+
+    def read_chunk(self, max_lines: int) -> List[ReplayEvent]:
+        """
+        读取并解码最多 max_lines 行
+
+        Returns:
+            List[ReplayEvent]: 解码后的事件，文件结束时为空列表
+        """
+        events = []
+        for _ in range(max_lines):
+            line = self._next_line()
+            if line is None:
+                break
+            self.offset += len(line)
+            line = line.strip()
+            if not line:
+                continue
+            if self.format == 'auto':
+                self.format = self._detect_format(line)
+            try:
+                payload, headers = self._payload(line)
+                value = payload if self.lazy else self.value_type.loads(payload, serializer=json_codec.CODEC_NAME)
+            except Exception as e:
+                dead_letter_queue.send(line.decode('utf-8', errors='replace'), reason='回放消息解码失败', error=e,
+                                       metadata={'file': self.path, 'offset': self.offset - len(line)})
+                continue
+            message = ReplayMessage(self.topic, self.partition, self._span_start, self.offset, payload, headers)
+            self._span_start = self.offset
+            events.append(ReplayEvent(value, message))
+        return events
+
+    @property
+    def consumed_until(self) -> int:
+        """最后一条产出消息的结束位置，之后的内容（空行或解码失败的行）不对应任何事件"""
+        return self._span_start
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+        if self._file is not None:
+            self._file.close()
+
+
+class ReplayCheckpoint:
+    """
+    回放检查点，记录每个文件已连续确认的字节位置。
+
+    确认可能不按顺序到达，只有某位置之前的消息全部确认后检查点才前移；文件读完且全部确认后标记为完成。
+    文件大小与记录不一致（文件已被替换）时从头读取。
+
+    Attributes
+    ----------
+    path : Optional[str]
+        检查点文件路径，为 None 时不保存。
+    interval : float
+        定期保存的间隔（秒）。
+    """
+
+    def __init__(self, path: Optional[str], interval: float = 5.0):
+        self.path = path
+        self.interval = interval
+        self._state = {}
+        self._pending = {}
+        self._eof = {}
+        self._last_save = time.monotonic()
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self._state = json.load(f)
+
+    @staticmethod
+    def _key(file_path: str) -> str:
+        return os.path.abspath(file_path)
+
+    def start(self, file_path: str) -> Optional[int]:
+        """
+        登记一个文件并返回开始读取的位置，已完成的文件返回 None
+        """
+        key = self._key(file_path)
+        size = os.path.getsize(file_path)
+        entry = self._state.get(key)
+        if entry is None or entry.get('size') != size:
+            if entry is not None:
+                logger.warning(f"文件 {file_path} 大小与检查点记录不一致，从头回放")
+            entry = {'offset': 0, 'size': size, 'done': False}
+            self._state[key] = entry
+        if entry['done']:
+            return None
+        self._pending[key] = {}
+        return entry['offset']
+
+    def ack(self, file_path: str, start: int, end: int):
+        """确认文件中 [start, end) 范围的消息"""
+        key = self._key(file_path)
+        entry = self._state[key]
+        pending = self._pending[key]
+        if start != entry['offset']:
+            pending[start] = end
+            return
+        entry['offset'] = end
+        while entry['offset'] in pending:
+            entry['offset'] = pending.pop(entry['offset'])
+        if self._eof.get(key) == entry['offset']:
+            entry['done'] = True
+        if time.monotonic() - self._last_save >= self.interval:
+            self.save()
+
+    def finish(self, file_path: str, consumed_until: int, end: int):
+        """文件读取结束，末尾不对应事件的内容（空行、解码失败的行）直接确认"""
+        self._eof[self._key(file_path)] = end
+        self.ack(file_path, consumed_until, end)
+
+    def is_done(self, file_path: str) -> bool:
+        return self._state.get(self._key(file_path), {}).get('done', False)
+
+    def save(self):
+        """原子写入检查点文件"""
+        self._last_save = time.monotonic()
+        if not self.path:
+            return
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+class ReplayStream:
+    """
+    文件回放数据流，实现消费者用到的 ``noack()``、``events()`` 和 ``ack()``。
+
+    最多 parallel 个文件同时在读取线程中按块读取解码，事件经有界队列交给消费者，
+    消费者处理不过来时队列写满，读取自动暂停。
+
+    Attributes
+    ----------
+    paths : List[str]
+        待回放的文件，文件序号作为分区号。
+    acked : int
+        已确认的事件数。
+    """
+
+    def __init__(self, paths: List[str], topic: str, value_type, checkpoint: ReplayCheckpoint,
+                 lazy: bool = False, file_format: str = 'auto', parallel: int = 4, chunk_lines: int = 250):
+        self.paths = paths
+        self.topic = topic
+        self.value_type = value_type
+        self.checkpoint = checkpoint
+        self.lazy = lazy
+        self.format = file_format
+        self.parallel = max(1, parallel)
+        self.chunk_lines = chunk_lines
+        self.acked = 0
+        self._executor = ThreadPoolExecutor(max_workers=self.parallel, thread_name_prefix='replay-reader')
+
+    def noack(self) -> 'ReplayStream':
+        return self
+
+    async def _produce(self, partition: int, path: str, queue: asyncio.Queue, slots: asyncio.Semaphore):
+        """读取一个文件的全部事件放入队列"""
+        loop = asyncio.get_running_loop()
+        try:
+            async with slots:
+                start_offset = self.checkpoint.start(path)
+                if start_offset is None:
+                    logger.info(f"文件 {path} 已回放完成，跳过")
+                    return
+                logger.info(f"开始回放文件 {path}，起始位置 {start_offset}")
+                reader = await loop.run_in_executor(self._executor, lambda: DumpReader(
+                    path, partition, self.topic, self.value_type, self.lazy, self.format, start_offset,
+                ))
+                try:
+                    while True:
+                        events = await loop.run_in_executor(self._executor, reader.read_chunk, self.chunk_lines)
+                        if not events:
+                            break
+                        for event in events:
+                            await queue.put(event)
+                    self.checkpoint.finish(path, reader.consumed_until, reader.offset)
+                finally:
+                    reader.close()
+        except Exception as e:
+            logger.error(f"回放文件 {path} 出错: {e}", exc_info=True)
+        finally:
+            await queue.put(_END)
+
+    async def events(self):
+        queue = asyncio.Queue(maxsize=self.chunk_lines * self.parallel)
+        slots = asyncio.Semaphore(self.parallel)
+        producers = [
+            asyncio.ensure_future(self._produce(partition, path, queue, slots))
+            for partition, path in enumerate(self.paths)
+        ]
+        remaining = len(producers)
+        try:
+            while remaining:
+                event = await queue.get()
+                if event is _END:
+                    remaining -= 1
+                    continue
+                yield event
+        finally:
+            for producer in producers:
+                producer.cancel()
+            self._executor.shutdown(wait=False)
+
+    async def ack(self, event) -> bool:
+        message = event.message
+        self.checkpoint.ack(self.paths[message.partition], message.offset, message.end)
+        self.acked += 1
+        return True
+
+
+def build_consumer(topic: str, args):
+    """
+    按 TOPIC_CONFIG 中的配置创建回放使用的消费者，批次参数使用命令行指定的值
+    """
+    config = TOPIC_CONFIG[topic]
+    value_type = import_object(config['value_type'])
+    lazy = config.get('lazy', False) if args.lazy is None else args.lazy
+    write_behind = dict(config.get('write_behind') or {})
+    if args.write_behind:
+        write_behind['enabled'] = True
+    consumer = import_object(config['consumer'])(
+        name=f'replay.{topic}',
+        batch_config={**(config.get('batch') or {}), 'size': args.batch_size, 'timeout': args.timeout,
+                      'max_size': args.batch_size, 'adaptive': False, 'per_partition': True},
+        max_workers=args.workers or config.get('max_workers'),
+        max_in_flight=args.in_flight or config.get('max_in_flight'),
+        value_type=value_type,
+        lazy=lazy,
+        uid_header=config.get('uid_header'),
+        write_behind=write_behind,
+    )
+    return consumer, value_type, lazy
+
+
+def replay(args) -> Dict:
+    """执行回放，返回统计结果"""
+    consumer, value_type, lazy = build_consumer(args.topic, args)
+    checkpoint = ReplayCheckpoint(args.checkpoint, args.checkpoint_interval)
+    stream = ReplayStream(
+        args.files, TOPIC_CONFIG[args.topic]['topic'], value_type, checkpoint,
+        lazy=lazy, file_format=args.format, parallel=args.parallel, chunk_lines=args.chunk_lines,
+    )
+    consumer.verify()
+    if dedup_index_enabled():
+        try:
+            get_dedup_index().warm()
+        finally:
+            release_database_connections()
+
+    start = time.perf_counter()
+    try:
+        asyncio.run(consumer(stream))
+    finally:
+        checkpoint.save()
+    elapsed = time.perf_counter() - start
+    return {
+        'files': len(args.files),
+        'completed_files': sum(checkpoint.is_done(path) for path in args.files) if args.checkpoint else None,
+        'records': stream.acked,
+        'seconds': elapsed,
+        'records_per_second': stream.acked / elapsed if elapsed else 0.0,
+        'dead_letters': dead_letter_queue.sent,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='从本地导出文件回放消息并入库')
+    parser.add_argument('files', nargs='+', help='JSONL、JSONL.gz 或 kcat -J 导出文件')
+    parser.add_argument('--topic', default=next(iter(TOPIC_CONFIG)), choices=list(TOPIC_CONFIG),
+                        help='TOPIC_CONFIG 中的配置键名，决定消费者和数据结构')
+    parser.add_argument('--format', choices=['auto', 'jsonl', 'kcat'], default='auto', help='文件格式')
+    parser.add_argument('--batch-size', type=int, default=1000, help='批次大小')
+    parser.add_argument('--timeout', type=float, default=1.0, help='凑批次的最长等待时间（秒）')
+    parser.add_argument('--parallel', type=int, default=4, help='同时读取和处理的文件数')
+    parser.add_argument('--chunk-lines', type=int, default=250,
+                        help='读取线程每次读取解码的行数，小于批次大小时一个批次包含多个文件的消息，可并行处理')
+    parser.add_argument('--workers', type=int, default=None, help='执行 Pipeline 的线程数，默认取主题配置')
+    parser.add_argument('--in-flight', type=int, default=None, help='最大并行批次，默认取主题配置')
+    parser.add_argument('--lazy', action=argparse.BooleanOptionalAction, default=None,
+                        help='延迟解码，默认取主题配置')
+    parser.add_argument('--write-behind', action='store_true', help='开启写后缓冲，合并多个批次写入')
+    parser.add_argument('--checkpoint', default=None, help='检查点文件，中断后再次执行时从记录的位置继续')
+    parser.add_argument('--checkpoint-interval', type=float, default=5.0, help='检查点保存间隔（秒）')
+    args = parser.parse_args(argv)
+
+    result = replay(args)
+    logger.info(f"回放结束: {result}")
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,42 @@
+import asyncio
+
 import faust
 
-from application.consumers.information_consumer.process import InformationConsumer
-from application.models.kafka_models.information_data_structure import InformationDataStructure
-from application.settings import KAFKA_CONFIG, TOPIC_CONFIG
-from application.utils import get_logger
+from application.cache import dedup_index_enabled, get_dedup_index
+from application.db import release_database_connections
+from application.settings import DEAD_LETTER_CONFIG, KAFKA_CONFIG, METRICS_CONFIG, TOPIC_CONFIG
+from application.utils import get_logger, import_object
+from application.utils.dead_letter import dead_letter_queue
 from application.utils.logger import add_faust_handlers
+from application.utils.metrics import registry
 
 # 创建日志记录器
 logger = get_logger(__name__)
 
 
+class ConsumerApp(faust.App):
+    """
+    Faust 应用，首次启动时在 Agent 开始消费之前检查各消费者 Pipeline 依赖的表结构（如 upsert 所需的唯一索引），
+    不满足时抛出异常使 worker 启动失败，不会有批次在检查完成前写入
+
+    Attributes
+    ----------
+    consumers : list
+        已注册的消费者，由 FaustAppManager.register_topic 追加。
+    """
+    consumers = ()
+
+    async def on_first_start(self) -> None:
+        await super().on_first_start()
+        loop = asyncio.get_running_loop()
+        for consumer in self.consumers:
+            try:
+                await loop.run_in_executor(None, consumer.verify)
+            except Exception as e:
+                logger.error("消费者 %s 启动检查失败: %s", consumer.name, e)
+                raise
+
+
 class FaustAppManager:
     """
     Faust 应用管理器，用于集中管理 Faust 应用的初始化、主题注册及代理函数绑定。
@@ -25,6 +52,7 @@ class FaustAppManager:
         初始化 FaustAppManager 并创建 Faust 应用实例。
         """
         self.app = None
+        self.consumers = []
         self._init_app()
 
     def _init_app(self):
@@ -37,10 +65,11 @@ class FaustAppManager:
             初始化失败时抛出异常。
         """
         try:
-            self.app = faust.App(
+            self.app = ConsumerApp(
                 id=KAFKA_CONFIG['default']['app_name'],
                 broker=KAFKA_CONFIG['default']['broker'],
             )
+            self.app.consumers = self.consumers
             # 为 Faust 应用添加日志处理器
             add_faust_handlers()
             logger.info(
@@ -52,7 +81,8 @@ class FaustAppManager:
             logger.error("Faust应用初始化失败: %s", str(e))
             raise
 
-    def register_agent(self, topic_name, process_agent, value_type=None):
+    def register_agent(self, topic_name, process_agent, value_type=None, partitions=None, replicas=None, concurrency=1,
+                       name=None, value_serializer=None):
         """
         注册主题及对应的处理函数代理。
 
@@ -64,17 +94,97 @@ class FaustAppManager:
             处理函数或 Faust Agent，用于处理该主题消息。
         value_type : Optional[faust.Record]
             消息的数据结构类型，可选，用于序列化/反序列化。
+        partitions : Optional[int]
+            主题分区数，需与 Kafka 中的实际分区数一致。
+        replicas : Optional[int]
+            主题副本数。
+        concurrency : int
+            Agent 并发数，大于 1 时同一分区内的顺序不再保证。
+        name : Optional[str]
+            Agent 名称，默认由处理函数推导；同一个消费者类注册到多个主题时必须指定。
+        value_serializer : Optional[str]
+            消息体编解码器，如 ``fastjson``，默认使用应用的 value_serializer（json）。
 
         Notes
         -----
         会自动将处理函数绑定到 Faust 应用的 topic 上，并记录日志。
         """
-        topic = self.app.topic(topic_name, value_type=value_type)
-        logger.info("成功注册主题: %s", topic_name)
-
-        self.app.agent(topic)(process_agent)
+        topic = self.app.topic(
+            topic_name, value_type=value_type, value_serializer=value_serializer, partitions=partitions, replicas=replicas
+        )
+        logger.info("成功注册主题: %s，分区数: %s，副本数: %s", topic_name, partitions, replicas)
+
+        if concurrency > 1:
+            logger.warning("主题 %s 的 Agent 并发数为 %s，同一分区内的消息不再按顺序处理", topic_name, concurrency)
+        self.app.agent(topic, name=name, concurrency=concurrency)(process_agent)
         logger.info("成功注册处理函数到主题: %s", topic.get_topic_name())
 
+    def register_topic(self, name, config):
+        """
+        按 TOPIC_CONFIG 中的一项配置创建消费者并注册到对应主题。
+
+        Parameters
+        ----------
+        name : str
+            配置键名，作为消费者名称及指标中的 consumer 标签。
+        config : dict
+            主题配置，包含 topic、consumer、value_type 及可选的 value_serializer、lazy、uid_header、
+            partitions、replicas、concurrency、batch、max_workers、max_in_flight、write_behind。
+        """
+        consumer_class = import_object(config['consumer'])
+        value_type = import_object(config['value_type']) if config.get('value_type') else None
+        lazy = config.get('lazy', False)
+        consumer = consumer_class(
+            name=name,
+            batch_config=config.get('batch'),
+            max_workers=config.get('max_workers'),
+            max_in_flight=config.get('max_in_flight'),
+            value_type=value_type,
+            lazy=lazy,
+            uid_header=config.get('uid_header'),
+            write_behind=config.get('write_behind'),
+        )
+        self.consumers.append(consumer)
+        self.register_agent(
+            config['topic'],
+            consumer,
+            # 延迟解码时主题只接收原始 bytes，由消费者按需解码
+            value_type=None if lazy else value_type,
+            partitions=config.get('partitions'),
+            replicas=config.get('replicas'),
+            concurrency=config.get('concurrency', 1),
+            name=f'{config["consumer"]}.{name}',
+            value_serializer='raw' if lazy else config.get('value_serializer'),
+        )
+
+    def register_dead_letter_topic(self, topic_name):
+        """
+        注册死信主题，Pipeline 中失败的记录将发送到该主题。
+
+        Parameters
+        ----------
+        topic_name : str
+            死信主题名称，消息体为带错误元数据的 JSON。
+        """
+        topic = self.app.topic(topic_name, value_serializer='raw')
+        dead_letter_queue.bind(topic, self.app.loop)
+        logger.info("成功注册死信主题: %s", topic_name)
+
+    def register_metrics_page(self, path):
+        """
+        在 Faust web 服务上注册 Prometheus 指标页面。
+
+        Parameters
+        ----------
+        path : str
+            页面路径，如 ``/metrics/``。
+        """
+        @self.app.page(path)
+        async def metrics(web, request):
+            return web.text(registry.render(), content_type='text/plain; version=0.0.4')
+
+        logger.info("成功注册指标页面: %s", path)
+
     def get_app(self):
         """
         获取 Faust 应用实例。
@@ -91,16 +201,38 @@ class FaustAppManager:
 # 初始化应用管理器
 app_manager = FaustAppManager()
 
-# 注册 Kafka 主题及处理函数
-app_manager.register_agent(
-    TOPIC_CONFIG['default']['topic'],
-    InformationConsumer(),  # 订阅主题消费类
-    value_type=InformationDataStructure  # 接受消息的数据结构类型
-)
+# 按 TOPIC_CONFIG 注册所有主题及消费者
+for topic_key, topic_config in TOPIC_CONFIG.items():
+    app_manager.register_topic(topic_key, topic_config)
+
+# 注册死信主题
+if DEAD_LETTER_CONFIG['topic']:
+    app_manager.register_dead_letter_topic(DEAD_LETTER_CONFIG['topic'])
+
+# 注册 Prometheus 指标页面
+if METRICS_CONFIG['enabled']:
+    app_manager.register_metrics_page(METRICS_CONFIG['path'])
 
 # 获取应用实例作为根路由
 root_router = app_manager.get_app()
 
+
+@root_router.task
+async def warm_dedup_index():
+    """
+    worker 启动时预热去重索引，放到线程池中执行以免阻塞事件循环。upsert 模式下不使用去重索引，不预热。
+    """
+    if not dedup_index_enabled():
+        return
+
+    def warm():
+        try:
+            get_dedup_index().warm()
+        finally:
+            release_database_connections()
+
+    await asyncio.get_running_loop().run_in_executor(None, warm)
+
 if __name__ == '__main__':
     # 注意得现有生产者才能消费
     logger.info("正在启动Faust应用")
@@ -1,7 +1,141 @@
+import os
+
+# 日志配置
+LOG_CONFIG = {
+    'directory': os.path.join('runtime', 'log'),  # 日志目录，文件按日期命名并自动滚动
+    'queue_size': 10000,  # 日志队列容量，写满后丢弃新日志并计数
+}
+
+# 指标配置
+METRICS_CONFIG = {
+    'enabled': True,  # 是否记录指标，关闭后记录操作直接返回
+    'namespace': 'kafka_consumer',  # 指标名前缀
+    'path': '/metrics/',  # Faust web 服务上的 Prometheus 指标页面路径
+}
+
 # 批处理配置
 BATCH_CONFIG = {
-    'size': 10,
-    'timeout': 10.0
+    'size': 10,  # 初始批次条数
+    'timeout': 10.0,  # 初始每批最长等待时间（秒）
+    'adaptive': True,  # 是否根据延迟和入库耗时自动调整批次
+    'min_size': 10,  # 批次条数下限
+    'max_size': 500,  # 批次条数上限
+    'max_bytes': 8 * 1024 * 1024,  # 每批消息体字节上限
+    'min_timeout': 0.5,  # 空闲时等待时间下限（秒）
+    'target_latency': 2.0,  # 单批 Pipeline 目标耗时（秒），超过即缩小批次
+    'lag_threshold': 5.0,  # 消费延迟超过该秒数时增大批次
+    'per_partition': True,  # 是否按分区拆分批次：不同分区的批次并行处理，同一分区的批次按顺序处理和确认
+}
+
+# Pipeline 执行配置
+EXECUTOR_CONFIG = {
+    'max_workers': 4,  # 执行 Pipeline 的线程数
+    'max_in_flight': 4,  # 同时处理中的最大批次数，达到后暂停读取 Kafka
+}
+
+# 并行管道阶段（PipelineGraph）执行配置
+PIPELINE_GRAPH_CONFIG = {
+    'executor': 'thread',  # thread - 线程池（适合查库等 IO 阶段）；process - 进程池（仅适合不访问数据库的 CPU 密集阶段）
+    'max_workers': 4,  # 每个 PipelineGraph 同时执行的阶段数上限
+}
+
+# 管道进程池配置（BasePipeline.use_process_pool 开启时使用）
+PROCESS_POOL_CONFIG = {
+    'max_workers': os.cpu_count() or 1,  # 默认进程数，管道可用 process_workers 单独指定
+    'chunk_size': None,  # 每块记录数，None 表示按进程数均分批次
+    'min_batch_size': 50,  # 批次小于该条数时直接在当前线程执行，进程间传输开销大于收益
+    # 子进程启动方式：forkserver 的子进程由干净的服务进程派生，不继承消费进程中 Kafka、线程池等持有的锁；
+    # fork 启动更快，但父进程多线程运行时 fork 可能在子进程中死锁，不建议使用。
+    # 子进程重新导入模块，运行时修改的配置不会同步到子进程
+    'start_method': 'forkserver',
+}
+
+# 入库配置
+WRITE_CONFIG = {
+    # 写入模式：
+    # insert - 普通 INSERT，已入库的资讯由去重阶段过滤，重复投递会产生重复数据
+    # upsert - 按自然键 ON DUPLICATE KEY UPDATE，附件按 information_id 整体替换，
+    #          段落按内容哈希（md5_encode）比对后只写入新增或变化的部分，可安全重复投递
+    #          （需要 resource_information_list.information_id 及
+    #           resource_information_tags_relation(information_id, tag_code) 上的唯一索引，
+    #           先执行 application/db/mysql_db/migrations/001_upsert_natural_keys.sql；缺少时 worker 启动失败）
+    'mode': 'insert',
+}
+
+# 写后缓冲配置：合并连续多个批次的待写入数据，在一个事务中写入，偏移量在写入成功后才确认
+# 开启后批次确认最多延迟 max_age 秒；DEDUP_CONFIG['claim_ttl'] 应大于 max_age
+WRITE_BEHIND_CONFIG = {
+    'enabled': False,
+    'max_rows': 5000,  # 缓冲的估算行数（含附件和段落）达到后写入
+    'max_bytes': 16 * 1024 * 1024,  # 缓冲的估算字节数达到后写入
+    'max_age': 2.0,  # 缓冲中最早一条数据等待的最长时间（秒）
+}
+
+# 批量写入分块配置（按表名配置，未配置的表使用 default）
+# max_bytes 应小于 MySQL 的 max_allowed_packet（默认 64MB）并留有余量
+BULK_WRITE_CONFIG = {
+    'default': {
+        'max_rows': 1000,  # 每条语句最大行数
+        'max_bytes': 4 * 1024 * 1024,  # 每条语句最大估算字节数
+    },
+    'resource_information_section_list': {
+        'max_rows': 500,
+        'max_bytes': 4 * 1024 * 1024,
+    },
+    'resource_information_attachment_list': {
+        'max_rows': 1000,
+        'max_bytes': 1 * 1024 * 1024,
+    },
+}
+
+# LOAD DATA LOCAL INFILE 批量导入配置（仅 MySQL，用于回放、回填等大批量写入）
+# 需要服务端开启 local_infile，且 MYSQL_DATABASES 中对应连接配置 'local_infile': True
+LOAD_DATA_CONFIG = {
+    'enabled': False,
+    # 单次写入的行数达到阈值时改用 LOAD DATA，未配置的表始终使用 INSERT
+    'min_rows': {
+        'resource_information_section_list': 5000,
+        'resource_information_attachment_list': 5000,
+    },
+    'directory': None,  # 临时 TSV 文件目录，None 时优先使用 /dev/shm（tmpfs），不存在时使用系统临时目录
+}
+
+# 去重索引配置
+DEDUP_CONFIG = {
+    'enabled': True,  # 是否执行入库前去重；upsert 模式下只合并同一批次内的重复资讯，已入库的资讯交给入库阶段按内容比对更新，
+    # 不构建、不预热去重索引（下列索引配置只在 insert 模式下生效）
+    'backend': 'local',  # 去重后端：local（进程内索引）/ redis（多个 worker 共享的 Redis 索引）
+    'bloom_capacity': 5_000_000,  # 布隆过滤器预期容量，决定其固定内存占用（约 9MB）
+    'bloom_error_rate': 0.001,  # 布隆过滤器目标误判率
+    'lru_size': 200_000,  # 已确认 id 的 LRU 容量
+    'probe_chunk_size': 1000,  # 定向 IN 查询每次携带的 id 数量
+    'warm_chunk_size': 10000,  # 启动预热时每次分页加载的行数
+    'redis_database': 'default',  # redis 后端使用的 REDIS_DATABASES 配置键名
+    'redis_key': 'dedup:resource_information_list',  # redis 后端已入库 id 集合的键名，认领键和预热标记以此为前缀
+    'redis_structure': 'set',  # redis 后端的数据结构：set（精确）/ bloom（需 RedisBloom 模块，命中时查库确认）
+    'claim_ttl': 600,  # 认领未入库 id 的有效期（秒），应大于一个批次的最长处理时间（含重试）
+    'warm_timeout': 600,  # 等待其他 worker 完成预热的最长时间（秒）
+}
+
+# 来源 id 缓存配置
+SOURCE_CONFIG = {
+    'ttl': 600,  # 整表刷新间隔（秒）
+    'negative_ttl': 60,  # 未知域名负缓存有效期（秒）
+    'unresolved_policy': 'dead_letter',  # 无法解析来源时的处理策略：skip / default / dead_letter
+    'default_source_id': None,  # 策略为 default 时使用的来源 id
+}
+
+# 批次重试配置
+RETRY_CONFIG = {
+    'max_retries': 3,  # 瞬时数据库错误的最大重试次数
+    'base_delay': 0.5,  # 首次重试等待时间（秒），之后每次翻倍
+    'max_delay': 10.0,  # 单次重试最长等待时间（秒）
+}
+
+# 死信队列配置
+DEAD_LETTER_CONFIG = {
+    'topic': 'temp4_dead_letter',  # 死信主题，为 None 时只写本地文件
+    'directory': os.path.join('runtime', 'dead_letter'),  # 未绑定主题时的死信文件目录
 }
 
 # Kafka配置
@@ -11,10 +145,39 @@ KAFKA_CONFIG = {
         'app_name': 'faust_mysql_batch'
     },
 }
+# 主题配置：每个主题绑定一个消费者类和消息数据结构，全部注册到同一个 Faust 应用中，共用数据库连接池。
+# 键名作为消费者名称（日志及指标中的 consumer 标签），可选项：
+# - batch：覆盖 BATCH_CONFIG 的批次配置（size、timeout、adaptive、per_partition 等）
+# - max_workers / max_in_flight：覆盖 EXECUTOR_CONFIG，低流量主题可调小以减少线程
+# - write_behind：覆盖 WRITE_BEHIND_CONFIG 的写后缓冲配置（enabled、max_rows、max_bytes、max_age）
 TOPIC_CONFIG = {
-    "default": {
-        "topic": "temp4"
-    }
+    "information": {
+        "topic": "temp4",
+        "consumer": "application.consumers.information_consumer.process.InformationConsumer",
+        "value_type": "application.models.kafka_models.information_data_structure.InformationDataStructure",
+        "value_serializer": "fastjson",  # 消息体编解码器，fastjson 基于 orjson（未安装时回退到标准库 json）
+        # 延迟解码：消息体保持原始 bytes，访问 uid 以外的字段时才构建 Record，被去重丢弃的消息不构建 Record。
+        # uid 优先取自 uid_header 消息头；生产端目前不设置该消息头，消息体仍会在去重阶段解析一次，
+        # 只有 insert 模式下重复消息多的场景（如重放）收益明显，默认关闭
+        "lazy": False,
+        "uid_header": "uid",
+        "partitions": 8,  # 主题分区数，需与 Kafka 中的实际分区数一致
+        "replicas": 1,  # 副本数（仅在由 Faust 创建主题时生效）
+        # Agent 并发数。大于 1 时 Faust 将事件分发给多个 Agent 实例，同一分区内的顺序不再保证；
+        # 分区间并行由 BATCH_CONFIG['per_partition'] 在单个 Agent 内完成，通常保持 1 即可
+        "concurrency": 1,
+        "batch": {},
+    },
+    # 低流量主题示例：
+    # "news": {
+    #     "topic": "news",
+    #     "consumer": "application.consumers.news_consumer.process.NewsConsumer",
+    #     "value_type": "application.models.kafka_models.news_data_structure.NewsDataStructure",
+    #     "partitions": 1,
+    #     "batch": {"size": 50, "timeout": 5.0, "adaptive": False},
+    #     "max_workers": 1,
+    #     "max_in_flight": 1,
+    # },
 }
 
 # 数据库配置
@@ -35,7 +198,12 @@ MYSQL_DATABASES = {
         'host': '127.0.0.1',
         'port': 3306,
         'database': 'info',
-        "charset": "utf8mb4"
+        "charset": "utf8mb4",
+        'max_connections': 20,  # 连接池最大连接数
+        'stale_timeout': 300,  # 空闲连接超过该秒数后丢弃重建
+        'pool_timeout': 10,  # 连接池耗尽时等待可用连接的最长秒数
+        'ping_on_checkout': True,  # 检出连接前 ping，自动替换失效连接
+        'local_infile': False,  # 允许 LOAD DATA LOCAL INFILE（LOAD_DATA_CONFIG 开启时需要）
     },
 }
 
@@ -2,7 +2,14 @@
 工具包初始化文件
 """
 
-from .logger import get_logger, LoggerManager
+import importlib
 
-# 创建全局日志管理器实例
-logger_manager = LoggerManager()
+from .logger import get_logger, LoggerManager, logger_manager
+
+
+def import_object(path):
+    """
+    按点分路径导入对象，如 ``application.consumers.information_consumer.process.InformationConsumer``
+    """
+    module_path, _, attr = path.rpartition('.')
+    return getattr(importlib.import_module(module_path), attr)
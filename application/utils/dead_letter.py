@@ -0,0 +1,155 @@
+"""
+死信队列模块
+记录无法正常处理的消息及其错误信息，便于排查和重放
+"""
+
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Any, Optional
+
+from application.settings import DEAD_LETTER_CONFIG
+from application.utils.logger import get_logger
+from application.utils.metrics import registry
+
+logger = get_logger(__name__)
+
+DEAD_LETTER_RECORDS = registry.counter('dead_letter_records', '写入死信队列的记录数')
+
+
+def _to_serializable(obj: Any):
+    """将 faust.Record 等对象转换为可 JSON 序列化的结构"""
+    if hasattr(obj, 'asdict'):
+        try:
+            return obj.asdict()
+        except ValueError:
+            # 延迟解码的记录消息体损坏时无法解析，保留其描述
+            return repr(obj)
+    return str(obj)
+
+
+class DeadLetterQueue:
+    """
+    死信队列，将失败记录连同原因和错误元数据发送到死信主题；
+    未绑定主题时（如离线运行）以 JSON Lines 形式追加写入本地文件。
+
+    Attributes
+    ----------
+    directory : str
+        死信文件目录，文件按日期命名。
+    topic : Optional[faust.Topic]
+        死信主题，调用 bind 后生效。
+    sent : int
+        已写入的死信条数。
+
+    send 返回的 Future 在死信主题确认收到（或写入本地文件）后完成，调用方在确认来源事件前通过 wait 等待；
+    drain 等待其余（未指定 awaited 的）尚未成功的发送，用于覆盖管道阶段中直接调用 send 写入的死信。
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.topic = None
+        self.sent = 0
+        self._loop = None
+        self._lock = threading.Lock()
+        self._pending = set()
+
+    def bind(self, topic, loop: asyncio.AbstractEventLoop):
+        """
+        绑定死信主题
+
+        Args:
+            topic: value_serializer 为 raw 的 faust 主题
+            loop: Faust 应用所在的事件循环，其他线程发送死信时投递到该循环执行
+        """
+        self.topic = topic
+        self._loop = loop
+
+    def send(self, record: Any, reason: str, error: Optional[BaseException] = None,
+             metadata: Optional[dict] = None, awaited: bool = False) -> Future:
+        """
+        写入一条死信，可在任意线程中调用
+
+        Args:
+            record: 原始消息记录
+            reason: 进入死信的原因
+            error: 相关异常，可选
+            metadata: 附加的错误元数据，如来源主题、分区和偏移量，可选
+            awaited: 调用方自行通过 wait 等待返回的 Future 时为 True，此时不计入 drain
+
+        Returns:
+            Future: 死信主题确认收到或写入本地文件后完成，发送失败时为对应异常
+        """
+        envelope = {
+            'reason': reason,
+            'error': repr(error) if error is not None else None,
+            'error_type': type(error).__name__ if error is not None else None,
+            'failed_at': datetime.now().isoformat(),
+            'metadata': metadata or {},
+            'record': record,
+        }
+        line = json.dumps(envelope, ensure_ascii=False, default=_to_serializable)
+        if self.topic is not None:
+            future = asyncio.run_coroutine_threadsafe(self._publish(line.encode('utf-8')), self._loop)
+            if not awaited:
+                with self._lock:
+                    self._pending.add(future)
+            future.add_done_callback(self._sent)
+        else:
+            self._write_file(line)
+            future = Future()
+            future.set_result(None)
+        with self._lock:
+            self.sent += 1
+        DEAD_LETTER_RECORDS.labels().inc()
+        logger.warning(f"记录已写入死信队列，原因: {reason}")
+        return future
+
+    async def _publish(self, payload: bytes):
+        """在事件循环中发送到死信主题，等待生产者确认"""
+        delivery = await self.topic.send(value=payload)
+        await delivery
+
+    def _sent(self, future: Future):
+        """发送成功的 Future 移出待确认集合，失败的保留到下一次 drain 时抛出"""
+        if future.cancelled() or future.exception() is not None:
+            logger.error(f"死信发送到主题失败: {'cancelled' if future.cancelled() else repr(future.exception())}")
+            return
+        with self._lock:
+            self._pending.discard(future)
+
+    async def wait(self, futures):
+        """
+        在事件循环中等待 send 返回的 Future 全部完成，其中任一发送失败时抛出其异常
+        """
+        if not futures:
+            return
+        results = await asyncio.gather(*(asyncio.wrap_future(future) for future in futures), return_exceptions=True)
+        with self._lock:
+            self._pending.difference_update(futures)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    async def drain(self):
+        """
+        等待未指定 awaited 的死信发送中尚未成功的部分，其中任一发送失败时抛出其异常
+        """
+        with self._lock:
+            pending = list(self._pending)
+        await self.wait(pending)
+
+    def _write_file(self, line: str):
+        """追加写入本地死信文件"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, datetime.now().strftime('%Y-%m-%d') + '.jsonl')
+        with self._lock:
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+# 全局死信队列实例
+dead_letter_queue = DeadLetterQueue(DEAD_LETTER_CONFIG['directory'])
@@ -1,41 +1,85 @@
 import functools
-import json
+import itertools
+import logging
+import reprlib
+import time
 
 from application.utils import get_logger
 
+# 参数预览只展示少量元素，避免为了日志序列化整批数据
+_preview_repr = reprlib.Repr()
+_preview_repr.maxlevel = 3
+_preview_repr.maxlist = 3
+_preview_repr.maxtuple = 3
+_preview_repr.maxdict = 5
+_preview_repr.maxstring = 80
+_preview_repr.maxother = 80
 
-def log_execution(func):
+
+def _summarize(obj, max_bytes: int) -> str:
+    """
+    生成对象的截断预览，序列类型附带元素数量
+
+    Args:
+        obj: 待预览的对象
+        max_bytes: 预览字符串的长度上限
+
+    Returns:
+        str: 预览字符串
     """
-    装饰器，用于记录方法执行日志，包括输入参数、输出结果及异常信息
+    preview = _preview_repr.repr(obj)
+    if isinstance(obj, (list, tuple, dict, set)):
+        preview = f"{type(obj).__name__}(len={len(obj)}) {preview}"
+    if len(preview) > max_bytes:
+        preview = preview[:max_bytes] + f"...(共 {len(preview)} 字符，已截断)"
+    return preview
+
+
+def log_execution(func=None, *, level: int = logging.INFO, sample_rate: int = 1,
+                  max_bytes: int = 1024, timing_only: bool = False):
     """
+    装饰器，用于记录方法执行日志，包括输入参数、输出结果、耗时及异常信息
+
+    可直接使用 ``@log_execution``，也可带参数使用 ``@log_execution(sample_rate=10)``。
+    日志级别未开启时不做任何序列化；异常无论是否被采样都会记录。
+
+    Args:
+        level: 日志级别
+        sample_rate: 采样率，每 N 次调用记录 1 次
+        max_bytes: 参数和结果预览的长度上限
+        timing_only: 只记录耗时，不记录参数和结果
+    """
+    if func is None:
+        return functools.partial(log_execution, level=level, sample_rate=sample_rate,
+                                 max_bytes=max_bytes, timing_only=timing_only)
+
     logger = get_logger(func.__module__)
+    calls = itertools.count()
 
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        # 记录输入参数（转为可序列化字符串）
-        try:
-            args_str = json.dumps(args, ensure_ascii=False, default=str)
-            kwargs_str = json.dumps(kwargs, ensure_ascii=False, default=str)
-        except Exception:
-            args_str, kwargs_str = str(args), str(kwargs)
+        sampled = logger.isEnabledFor(level) and next(calls) % sample_rate == 0
 
-        logger.info(f"[{func.__name__}] 开始执行，输入参数: args={args_str}, kwargs={kwargs_str}")
+        if sampled and not timing_only:
+            logger.log(level, f"[{func.__name__}] 开始执行，输入参数: "
+                              f"args={_summarize(args, max_bytes)}, kwargs={_summarize(kwargs, max_bytes)}")
 
+        start_time = time.perf_counter()
         try:
             result = func(*args, **kwargs)
-
-            # 记录输出结果（如果可序列化）
-            try:
-                result_str = json.dumps(result, ensure_ascii=False, default=str)
-            except Exception:
-                result_str = str(result)
-
-            logger.info(f"[{func.__name__}] 执行完成，输出结果: {result_str}")
-            return result
         except Exception as e:
             logger.exception(f"[{func.__name__}] 执行发生错误: {e}")
             raise
 
+        if sampled:
+            elapsed = time.perf_counter() - start_time
+            if timing_only:
+                logger.log(level, f"{func.__name__} 执行耗时: {elapsed:.2f}秒")
+            else:
+                logger.log(level, f"[{func.__name__}] 执行完成，耗时: {elapsed:.2f}秒，"
+                                  f"输出结果: {_summarize(result, max_bytes)}")
+        return result
+
     return wrapper
 
 
@@ -43,17 +87,4 @@ def monitor_performance(func):
     """
     装饰器，用于监控方法执行性能
     """
-    logger = get_logger(func.__module__)
-
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        import time
-        start_time = time.time()
-        try:
-            result = func(*args, **kwargs)
-            return result
-        finally:
-            end_time = time.time()
-            logger.info(f"{func.__name__} 执行耗时: {end_time - start_time:.2f}秒")
-
-    return wrapper
+    return log_execution(func, timing_only=True)
@@ -1,22 +1,119 @@
 """
 日志管理模块
-提供统一的日志记录功能，支持文件和控制台输出
+提供统一的日志记录功能，所有日志经有界队列交给后台线程写入按日期滚动的文件
 """
 
+import atexit
 import logging
 import os
-import sys
+import queue
+import threading
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 from typing import Optional
 
+from application.settings import LOG_CONFIG
+from application.utils.metrics import registry
+
+LOG_FORMAT = '[%(asctime)s] [%(levelname)s] [%(name)s] [%(funcName)s:%(lineno)d] %(message)s'
+
+
+class DailyFileHandler(logging.FileHandler):
+    """
+    按日期命名并滚动的文件处理器，日期变化后自动切换到新的 ``YYYY-MM-DD.log`` 文件。
+    只由后台写线程调用。
+    """
+
+    def __init__(self, directory: str, encoding: str = 'utf-8'):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._date = datetime.now().strftime('%Y-%m-%d')
+        super().__init__(self._path(self._date), encoding=encoding, delay=True)
+
+    def _path(self, date: str) -> str:
+        return os.path.join(self.directory, date + '.log')
+
+    def emit(self, record: logging.LogRecord):
+        date = datetime.fromtimestamp(record.created).strftime('%Y-%m-%d')
+        if date != self._date:
+            self.close()
+            self._date = date
+            self.baseFilename = os.path.abspath(self._path(date))
+        super().emit(record)
+
+
+class DropCountingQueueHandler(QueueHandler):
+    """
+    非阻塞的队列处理器，队列已满时丢弃日志并计数，保证日志突增时不阻塞消费。
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
 
 class LoggerManager:
     """
     日志管理器，统一管理系统中的日志处理
+
+    所有日志记录器共享同一个 QueueHandler，由一个后台 QueueListener 线程
+    通过同一个文件处理器写入磁盘。
     """
 
     def __init__(self):
         self._loggers = {}
+        self._queue_handler: Optional[DropCountingQueueHandler] = None
+        self._listener: Optional[QueueListener] = None
+        self._lock = threading.Lock()
+
+    def _get_queue_handler(self) -> DropCountingQueueHandler:
+        """
+        获取共享的队列处理器，首次调用时启动后台写线程
+        """
+        if self._queue_handler is None:
+            with self._lock:
+                if self._queue_handler is None:
+                    self._queue_handler = DropCountingQueueHandler(self._start_listener())
+                    atexit.register(self.stop)
+        return self._queue_handler
+
+    def _start_listener(self) -> queue.Queue:
+        """创建日志队列并启动后台写线程，返回该队列"""
+        file_handler = DailyFileHandler(LOG_CONFIG['directory'])
+        file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+        log_queue = queue.Queue(maxsize=LOG_CONFIG['queue_size'])
+        self._listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+        self._listener.start()
+        return log_queue
+
+    def reinit_after_fork(self):
+        """
+        在 fork 出的子进程中重建日志队列和后台写线程。
+        fork 只复制调用线程，父进程的写线程在子进程中不存在，不重建则子进程的日志只会堆积后被丢弃。
+        """
+        self._lock = threading.Lock()
+        if self._queue_handler is not None:
+            self._queue_handler.queue = self._start_listener()
+
+    @property
+    def dropped_records(self) -> int:
+        """因队列已满而丢弃的日志条数"""
+        return self._queue_handler.dropped if self._queue_handler else 0
+
+    def stop(self):
+        """
+        停止后台写线程，写完队列中剩余的日志
+        """
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
 
     def get_logger(self, name: str, level: int = logging.INFO) -> logging.Logger:
         """
@@ -40,30 +137,8 @@ class LoggerManager:
             self._loggers[name] = logger
             return logger
 
-        # 创建日志目录
-        log_dir = os.path.join('runtime', 'log')
-        os.makedirs(log_dir, exist_ok=True)
-
-        # 创建文件处理器，以日期命名日志文件
-        log_filename = datetime.now().strftime('%Y-%m-%d') + '.log'
-        file_handler = logging.FileHandler(
-            os.path.join(log_dir, log_filename), 
-            encoding='utf-8'
-        )
-        file_handler.setLevel(level)
-
-        # 创建控制台处理器
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setLevel(level)
-
-        # 创建格式器并添加到处理器
-        formatter = logging.Formatter(
-            '[%(asctime)s] [%(levelname)s] [%(name)s] [%(funcName)s:%(lineno)d] %(message)s'
-        )
-        file_handler.setFormatter(formatter)
-
-        # 添加处理器到日志记录器
-        logger.addHandler(file_handler)
+        # 添加共享的队列处理器到日志记录器
+        logger.addHandler(self._get_queue_handler())
 
         self._loggers[name] = logger
         return logger
@@ -71,7 +146,7 @@ class LoggerManager:
     def add_faust_handlers(self, level: int = logging.INFO):
         """
         为Faust应用添加日志处理器
-        
+
         Args:
             level: 日志级别
         """
@@ -80,37 +155,23 @@ class LoggerManager:
         faust_channels_logger = logging.getLogger('faust.channels')
         faust_worker_logger = logging.getLogger('faust.worker')
         faust_tables_logger = logging.getLogger('faust.tables')
-        
+
         # 为每个Faust相关记录器添加处理器
-        for logger in [faust_logger, faust_channels_logger, 
+        for logger in [faust_logger, faust_channels_logger,
                       faust_worker_logger, faust_tables_logger]:
             if not logger.handlers:
-                # 复用我们自定义的处理器
-                log_dir = os.path.join('runtime', 'log')
-                os.makedirs(log_dir, exist_ok=True)
-                
-                # 文件处理器
-                log_filename = datetime.now().strftime('%Y-%m-%d') + '.log'
-                file_handler = logging.FileHandler(
-                    os.path.join(log_dir, log_filename),
-                    encoding='utf-8'
-                )
-                file_handler.setLevel(level)
-                
-                # 格式器
-                formatter = logging.Formatter(
-                    '[%(asctime)s] [%(levelname)s] [%(name)s] [%(funcName)s:%(lineno)d] %(message)s'
-                )
-                file_handler.setFormatter(formatter)
-                
-                # 添加处理器
-                logger.addHandler(file_handler)
+                # 复用共享的队列处理器
+                logger.addHandler(self._get_queue_handler())
                 logger.setLevel(level)
 
 
 # 全局日志管理实例
 logger_manager = LoggerManager()
 
+registry.register_collector(lambda: [
+    ('log_records_dropped_total', 'counter', '因日志队列已满而丢弃的日志条数', [({}, logger_manager.dropped_records)]),
+])
+
 
 def get_logger(name: str, level: int = logging.INFO) -> logging.Logger:
     """
@@ -129,8 +190,8 @@ def get_logger(name: str, level: int = logging.INFO) -> logging.Logger:
 def add_faust_handlers(level: int = logging.INFO):
     """
     为Faust应用添加日志处理器的便捷函数
-    
+
     Args:
         level: 日志级别
     """
-    logger_manager.add_faust_handlers(level)
\ No newline at end of file
+    logger_manager.add_faust_handlers(level)
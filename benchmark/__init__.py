@@ -0,0 +1,4 @@
+"""
+离线基准测试
+使用合成数据、内存数据流和本地 SQLite 替身测量消费吞吐，无需 Kafka 和 MySQL
+"""
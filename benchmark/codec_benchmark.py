@@ -0,0 +1,95 @@
+"""
+JSON 编解码基准测试
+
+按消息大小比较 Faust 自带的 json 编解码器与 fastjson 编解码器的解码、编码耗时，
+以及 DataStructure.to_json 新旧实现（标准库 json + asdict 与 fastjson 单次编码）的耗时。
+
+用法::
+
+    python -m benchmark.codec_benchmark --sizes 1x200 20x500 200x1000
+"""
+
+import argparse
+import json
+import time
+import timeit
+
+from faust.serializers import codecs
+from faust.utils.json import JSONEncoder
+
+from application.utils import json_codec
+from benchmark.run_benchmark import _git_revision
+from benchmark.synthetic import generate_records
+
+
+def _legacy_to_json(record) -> bytes:
+    """修改前的 to_json：先构建 asdict() 再用标准库 json 编码（嵌套 Record 由 Faust 编码器转换）"""
+    return json.dumps(record.asdict(), ensure_ascii=False, cls=JSONEncoder).encode("utf-8")
+
+
+def _per_message_us(func, items, repeat: int) -> float:
+    """多次重复取最小值，返回每条消息的平均耗时（微秒）"""
+    best = min(timeit.repeat(lambda: [func(item) for item in items], number=1, repeat=repeat))
+    return best / len(items) * 1e6
+
+
+def run(args) -> dict:
+    faust_json = codecs.get_codec('json')
+    fast_json = codecs.get_codec(json_codec.CODEC_NAME)
+    results = []
+    for size in args.sizes:
+        sections, text_size = (int(part) for part in size.split('x'))
+        records = generate_records(args.messages, sections, text_size, 0.0, args.seed)
+        payloads = [record.dumps(serializer='json') for record in records]
+        representations = [record.to_representation() for record in records]
+        timings = {
+            'decode_json_us': _per_message_us(faust_json.loads, payloads, args.repeat),
+            'decode_fastjson_us': _per_message_us(fast_json.loads, payloads, args.repeat),
+            'encode_json_us': _per_message_us(faust_json.dumps, representations, args.repeat),
+            'encode_fastjson_us': _per_message_us(fast_json.dumps, representations, args.repeat),
+            'to_json_legacy_us': _per_message_us(_legacy_to_json, records, args.repeat),
+            'to_json_us': _per_message_us(lambda record: record.to_json(), records, args.repeat),
+        }
+        results.append({
+            'size': size,
+            'message_bytes': sum(len(payload) for payload in payloads) // len(payloads),
+            **timings,
+            'decode_speedup': timings['decode_json_us'] / timings['decode_fastjson_us'],
+            'encode_speedup': timings['encode_json_us'] / timings['encode_fastjson_us'],
+            'to_json_speedup': timings['to_json_legacy_us'] / timings['to_json_us'],
+        })
+    return {
+        'revision': _git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'backend': 'orjson' if json_codec.orjson is not None else 'json',
+        'params': vars(args),
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='JSON 编解码基准测试')
+    parser.add_argument('--sizes', nargs='+', default=['1x200', '20x500', '200x1000'],
+                        help='消息大小，格式为 段落数x段落文本长度')
+    parser.add_argument('--messages', type=int, default=200, help='每种大小的消息数')
+    parser.add_argument('--repeat', type=int, default=5, help='重复次数，取最快一次')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--output', default='bench_output.txt', help='结果追加写入的文件（JSON Lines）')
+    args = parser.parse_args(argv)
+
+    result = run(args)
+    print(f"后端: {result['backend']}")
+    print(f"{'大小':>10} {'字节':>9} {'解码 json/fast (us)':>22} {'编码 json/fast (us)':>22} {'to_json 旧/新 (us)':>22}")
+    for row in result['results']:
+        print(
+            f"{row['size']:>10} {row['message_bytes']:>9} "
+            f"{row['decode_json_us']:>9.1f}/{row['decode_fastjson_us']:<8.1f}x{row['decode_speedup']:<4.1f}"
+            f"{row['encode_json_us']:>9.1f}/{row['encode_fastjson_us']:<8.1f}x{row['encode_speedup']:<4.1f}"
+            f"{row['to_json_legacy_us']:>9.1f}/{row['to_json_us']:<8.1f}x{row['to_json_speedup']:<4.1f}"
+        )
+    with open(args.output, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+内存数据流
+模拟 Faust Stream 中消费者用到的接口，将预先生成的记录作为事件依次产出
+"""
+
+import asyncio
+import time
+from typing import Iterable, List
+
+from application.utils.json_codec import CODEC_NAME
+
+
+class FakeMessage:
+    """模拟 faust Message，只包含消费者用到的字段"""
+    __slots__ = ('topic', 'partition', 'offset', 'timestamp', 'value', 'serialized_value_size', 'headers')
+
+    def __init__(self, topic: str, partition: int, offset: int, value: bytes, headers: list = None):
+        self.topic = topic
+        self.partition = partition
+        self.offset = offset
+        self.timestamp = time.time()
+        self.value = value
+        self.serialized_value_size = len(value)
+        self.headers = headers or []
+
+
+class FakeEvent:
+    """模拟 faust Event"""
+    __slots__ = ('value', 'message')
+
+    def __init__(self, value, message: FakeMessage):
+        self.value = value
+        self.message = message
+
+
+class InMemoryStream:
+    """
+    内存数据流，实现 ``noack()``、``events()``、``ack()`` 以及 ``take(n, timeout)``。
+
+    decode 指定事件值的产生方式：
+
+    - prebuilt：直接产出预先构建的记录，不计解码耗时
+    - eager：产出时按记录类型完整解码消息体，与 Faust 按 value_type 解码一致
+    - raw：产出原始消息体 bytes，供延迟解码使用
+
+    uid_header 为 True 时 uid 同时放在 ``uid`` 消息头中。线上生产端目前不设置该消息头，
+    默认不携带，延迟解码需要解析消息体才能取得 uid。
+
+    Attributes
+    ----------
+    acked : int
+        已确认的事件数。
+    """
+
+    def __init__(self, records: Iterable, topic: str = 'benchmark', partitions: int = 1, decode: str = 'prebuilt',
+                 uid_header: bool = False):
+        self.decode = decode
+        self.events_list = []
+        for offset, record in enumerate(records):
+            payload = record.dumps(serializer='json')
+            headers = [('uid', record.uid.encode('utf-8'))] if uid_header else []
+            value = payload if decode == 'raw' else record
+            self.events_list.append(FakeEvent(value, FakeMessage(topic, offset % partitions, offset, payload, headers)))
+        self.acked = 0
+
+    def noack(self) -> 'InMemoryStream':
+        return self
+
+    async def events(self):
+        for index, event in enumerate(self.events_list):
+            event.message.timestamp = time.time()
+            if self.decode == 'eager':
+                event = FakeEvent(type(event.value).loads(event.message.value, serializer=CODEC_NAME), event.message)
+            yield event
+            if index % 100 == 0:
+                await asyncio.sleep(0)
+
+    async def ack(self, event) -> bool:
+        self.acked += 1
+        return True
+
+    async def take(self, max_: int, within: float):
+        """与 faust Stream.take 相同语义：每批最多 max_ 条"""
+        buffer: List = []
+        async for event in self.events():
+            buffer.append(event.value)
+            if len(buffer) >= max_:
+                yield list(buffer)
+                buffer.clear()
+        if buffer:
+            yield list(buffer)
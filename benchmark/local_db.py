@@ -0,0 +1,56 @@
+"""
+本地数据库替身
+用 SQLite 文件替换默认 MySQL 连接，并建好资讯相关表
+"""
+
+from peewee import SqliteDatabase
+
+from application import db as application_db
+from application.db.mysql_db.info.ResourceInformationAttachmentList import ResourceInformationAttachmentList
+from application.db.mysql_db.info.ResourceInformationList import ResourceInformationList
+from application.db.mysql_db.info.ResourceInformationSectionList import ResourceInformationSectionList
+from application.db.mysql_db.info.ResourceInformationTagsRelation import ResourceInformationTagsRelation
+from application.db.mysql_db.info.ResourceSourceDict import ResourceSourceDict
+
+MODELS = [
+    ResourceInformationList,
+    ResourceInformationTagsRelation,
+    ResourceInformationAttachmentList,
+    ResourceInformationSectionList,
+    ResourceSourceDict,
+]
+
+
+def _relax_not_null(models):
+    """
+    线上表中部分非空列由数据库默认值填充（如审核状态、附件 id），
+    模型中未声明默认值，建 SQLite 表前将这些列放宽为可空
+    """
+    for model in models:
+        for field in model._meta.sorted_fields:
+            if not field.null and not field.primary_key and not field.constraints and field.default is None:
+                field.null = True
+
+
+def install_sqlite(path: str, source_domain: str, source_id: str) -> SqliteDatabase:
+    """
+    创建 SQLite 数据库并替换默认数据库连接
+
+    Args:
+        path: SQLite 文件路径，``:memory:`` 仅适用于单线程
+        source_domain: 预置的来源域名
+        source_id: 预置的来源 id
+
+    Returns:
+        SqliteDatabase: 已绑定所有资讯模型的数据库
+    """
+    database = SqliteDatabase(path, pragmas={'journal_mode': 'wal', 'synchronous': 'normal', 'busy_timeout': 10000})
+    database.bind(MODELS)
+    application_db.database_connections['default'] = database
+    _relax_not_null(MODELS)
+    with database:
+        database.create_tables(MODELS)
+        ResourceSourceDict.insert(
+            source_id=source_id, source_main_link=source_domain, is_del=0,
+        ).execute()
+    return database
@@ -0,0 +1,249 @@
+"""
+消费吞吐基准测试
+
+用合成数据经内存数据流送入 InformationConsumer，写入本地 SQLite，输出：
+- 总吞吐（records/s）
+- 批次耗时 p50 / p99
+- 各管道阶段的耗时、分配峰值（tracemalloc）及进程峰值 RSS，并行管道额外输出关键路径耗时
+- 每批次的分配峰值（tracemalloc）及各阶段 apply 结果每条记录占用的内存块数
+
+结果以 JSON 追加写入 --output 文件，并记录当前 git 提交，便于在不同提交间比较。
+
+用法::
+
+    python -m benchmark.run_benchmark --records 2000 --sections 50 --text-size 400 --duplicate-ratio 0.3
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+from application.settings import BATCH_CONFIG, DEAD_LETTER_CONFIG, DEDUP_CONFIG, EXECUTOR_CONFIG, REDIS_DATABASES
+
+
+def _peak_rss_mb() -> float:
+    """进程峰值 RSS（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def _percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class StageProfiler:
+    """
+    包装 BasePipeline._encodes，统计每个阶段的耗时、tracemalloc 分配峰值和进程峰值 RSS；
+    包装 BasePipeline.apply_all，统计 apply 结果（中间数据）每条记录占用的内存块数。
+    批次分配峰值为批次内各阶段峰值的最大值，减去批次开始时已占用的内存。
+    """
+
+    def __init__(self, trace_alloc: bool):
+        self.trace_alloc = trace_alloc
+        self.seconds = defaultdict(list)
+        self.alloc_peak = defaultdict(int)
+        self.rss_peak = defaultdict(float)
+        self.critical_path = defaultdict(list)
+        self.apply_blocks = defaultdict(list)
+        self.batch_alloc_peak = []
+        self._window_peak = 0
+        self._batch_start = 0
+
+    def install(self):
+        from application.pipelines.base_pipeline import BasePipeline
+
+        original = BasePipeline._encodes
+        original_apply_all = BasePipeline.apply_all
+        profiler = self
+
+        def _encodes(pipeline, obj):
+            stage = type(pipeline).__name__
+            if profiler.trace_alloc:
+                profiler._window_peak = max(profiler._window_peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.reset_peak()
+            start = time.perf_counter()
+            result = original(pipeline, obj)
+            profiler.seconds[stage].append(time.perf_counter() - start)
+            if profiler.trace_alloc:
+                profiler.alloc_peak[stage] = max(profiler.alloc_peak[stage], tracemalloc.get_traced_memory()[1])
+            profiler.rss_peak[stage] = max(profiler.rss_peak[stage], _peak_rss_mb())
+            last_run = getattr(pipeline, 'last_run', None)
+            if last_run:
+                profiler.critical_path[stage].append(last_run['critical_path_seconds'])
+            return result
+
+        def apply_all(pipeline, value):
+            blocks = sys.getallocatedblocks()
+            result = original_apply_all(pipeline, value)
+            if value:
+                profiler.apply_blocks[type(pipeline).__name__].append((sys.getallocatedblocks() - blocks) / len(value))
+            return result
+
+        BasePipeline._encodes = _encodes
+        BasePipeline.apply_all = apply_all
+
+    def batch_started(self):
+        """批次开始，重置批次分配峰值的统计窗口"""
+        if self.trace_alloc:
+            tracemalloc.reset_peak()
+            self._window_peak = 0
+            self._batch_start = tracemalloc.get_traced_memory()[0]
+
+    def batch_finished(self):
+        """批次结束，记录批次分配峰值"""
+        if self.trace_alloc:
+            peak = max(self._window_peak, tracemalloc.get_traced_memory()[1])
+            self.batch_alloc_peak.append(peak - self._batch_start)
+
+    def batch_report(self) -> dict:
+        peaks = self.batch_alloc_peak
+        return {
+            'alloc_peak_p50_kb': _percentile(peaks, 0.5) / 1024 if peaks else None,
+            'alloc_peak_max_kb': max(peaks) / 1024 if peaks else None,
+        }
+
+    def report(self) -> dict:
+        return {
+            stage: {
+                'batches': len(values),
+                'total_seconds': sum(values),
+                'mean_seconds': statistics.mean(values),
+                'p99_seconds': _percentile(values, 0.99),
+                'alloc_peak_kb': self.alloc_peak[stage] / 1024 if self.trace_alloc else None,
+                'peak_rss_mb': self.rss_peak[stage],
+                'critical_path_seconds': sum(self.critical_path[stage]) if stage in self.critical_path else None,
+                'apply_blocks_per_record': statistics.mean(self.apply_blocks[stage]) if self.apply_blocks[stage] else None,
+            }
+            for stage, values in self.seconds.items()
+        }
+
+
+def run(args) -> dict:
+    """执行一次基准测试并返回结果"""
+    workdir = tempfile.mkdtemp(prefix='consumer_bench_')
+    DEAD_LETTER_CONFIG['topic'] = None
+    DEAD_LETTER_CONFIG['directory'] = os.path.join(workdir, 'dead_letter')
+    BATCH_CONFIG.update(size=args.batch_size, adaptive=args.adaptive)
+    EXECUTOR_CONFIG.update(max_workers=args.workers, max_in_flight=args.in_flight)
+    if args.dedup_backend == 'redis':
+        # 每次运行使用独立的键，避免受上一次运行写入的 id 影响
+        DEDUP_CONFIG.update(backend='redis', redis_key=f'bench:{os.getpid()}:{time.time_ns()}')
+        if args.redis_url:
+            REDIS_DATABASES[DEDUP_CONFIG['redis_database']] = {'url': args.redis_url}
+
+    from benchmark.fake_stream import InMemoryStream
+    from benchmark.local_db import install_sqlite
+    from benchmark.synthetic import SOURCE_DOMAIN, SOURCE_ID, generate_records
+
+    install_sqlite(os.path.join(workdir, 'bench.sqlite3'), SOURCE_DOMAIN, SOURCE_ID)
+
+    from application.consumers.information_consumer.process import InformationConsumer
+    from application.pipelines.information_into_pipeline import InformationIntoPipeline
+
+    InformationIntoPipeline.use_process_pool = args.process_pool
+    InformationIntoPipeline.process_workers = args.process_workers
+
+    batch_seconds = []
+    profiler = StageProfiler(args.trace_alloc)
+
+    class BenchmarkConsumer(InformationConsumer):
+        batch_size = args.batch_size
+        max_workers = args.workers
+        max_in_flight = args.in_flight
+
+        def _run_pipeline(self, records, batch=None, claim_token=None):
+            profiler.batch_started()
+            start = time.perf_counter()
+            try:
+                return super()._run_pipeline(records, batch, claim_token)
+            finally:
+                batch_seconds.append(time.perf_counter() - start)
+                profiler.batch_finished()
+
+    records = generate_records(args.records, args.sections, args.text_size, args.duplicate_ratio, args.seed)
+    stream = InMemoryStream(records, partitions=args.partitions, decode=args.decode, uid_header=args.uid_header)
+    profiler.install()
+    consumer = BenchmarkConsumer(
+        lazy=args.decode == 'raw',
+        value_type=type(records[0]),
+        write_behind={'enabled': args.write_behind, 'max_rows': args.write_behind_rows},
+    )
+
+    if args.trace_alloc:
+        tracemalloc.start()
+    start = time.perf_counter()
+    asyncio.run(consumer(stream))
+    elapsed = time.perf_counter() - start
+    if args.trace_alloc:
+        tracemalloc.stop()
+
+    return {
+        'revision': _git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'params': vars(args),
+        'records': len(records),
+        'acked': stream.acked,
+        'seconds': elapsed,
+        'records_per_second': len(records) / elapsed if elapsed else 0.0,
+        'batch_p50_seconds': _percentile(batch_seconds, 0.5),
+        'batch_p99_seconds': _percentile(batch_seconds, 0.99),
+        'peak_rss_mb': _peak_rss_mb(),
+        'batch_memory': profiler.batch_report(),
+        'stages': profiler.report(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='InformationConsumer 离线吞吐基准测试')
+    parser.add_argument('--records', type=int, default=2000, help='记录总数')
+    parser.add_argument('--sections', type=int, default=30, help='每条记录的段落数')
+    parser.add_argument('--text-size', type=int, default=300, help='每个段落的文本长度')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.2, help='重复记录比例')
+    parser.add_argument('--batch-size', type=int, default=BATCH_CONFIG['size'], help='批次大小')
+    parser.add_argument('--adaptive', action='store_true', help='开启自适应批次')
+    parser.add_argument('--workers', type=int, default=1, help='线程池大小')
+    parser.add_argument('--in-flight', type=int, default=1, help='最大并行批次')
+    parser.add_argument('--partitions', type=int, default=1, help='模拟的分区数')
+    parser.add_argument('--decode', choices=['prebuilt', 'eager', 'raw'], default='prebuilt',
+                        help='消息解码方式：prebuilt 不计解码耗时，eager 完整解码，raw 延迟解码（LazyRecord）')
+    parser.add_argument('--uid-header', action='store_true',
+                        help='raw 模式下在 uid 消息头中携带 uid；线上生产端未设置该消息头，默认不携带')
+    parser.add_argument('--process-pool', action='store_true', help='InformationIntoPipeline.apply 在进程池中执行')
+    parser.add_argument('--process-workers', type=int, default=None, help='进程池大小')
+    parser.add_argument('--dedup-backend', choices=['local', 'redis'], default='local', help='去重后端')
+    parser.add_argument('--redis-url', default=None, help='redis 去重后端使用的地址，如 redis://localhost:6379/15')
+    parser.add_argument('--write-behind', action='store_true', help='开启写后缓冲，合并多个批次写入')
+    parser.add_argument('--write-behind-rows', type=int, default=5000, help='写后缓冲的行数阈值')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--trace-alloc', action='store_true', help='用 tracemalloc 统计各阶段及每批次的分配峰值（会降低吞吐）；'
+                             '批次峰值按线程池大小为 1 时解读')
+    parser.add_argument('--output', default='bench_output.txt', help='结果追加写入的文件（JSON Lines）')
+    args = parser.parse_args(argv)
+
+    result = run(args)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    with open(args.output, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+合成数据生成
+按给定段落数、文本长度和重复比例生成 InformationDataStructure 记录
+"""
+
+import random
+import string
+from datetime import datetime
+from typing import List
+
+from application.models.kafka_models.information_data_structure import (
+    DataPayload, InformationDataStructure, MetaPayload,
+)
+
+# 合成数据使用的来源域名，需预先写入本地数据库的来源表
+SOURCE_DOMAIN = 'www.nsfc.gov.cn'
+SOURCE_ID = 'src_nsfc'
+
+
+def _text(rng: random.Random, size: int) -> str:
+    """生成指定长度的中英文混合文本"""
+    alphabet = string.ascii_letters + '资讯段落基金委员会科学研究项目'
+    return ''.join(rng.choices(alphabet, k=size))
+
+
+def make_record(rng: random.Random, uid: str, sections: int, text_size: int) -> InformationDataStructure:
+    """
+    生成一条合成资讯记录
+
+    Args:
+        rng: 随机数生成器
+        uid: 记录唯一标识
+        sections: 段落数
+        text_size: 每个段落的文本长度
+
+    Returns:
+        InformationDataStructure: 合成记录
+    """
+    return InformationDataStructure(
+        uid=uid,
+        topic='benchmark',
+        name=_text(rng, 30),
+        created_at=datetime.now().isoformat(),
+        data_type='information_nsfc',
+        tag_values='benchmark',
+        link_data=[
+            {'accessory_name': f'附件{i}', 'accessory_url': f'https://oss.example.com/{uid}/{i}.pdf'}
+            for i in range(rng.randint(0, 3))
+        ],
+        data=DataPayload(
+            info_date='2025-01-01',
+            info_section=[
+                {'text_info': _text(rng, text_size), 'marc_code': 'chi', 'title_level': i % 3}
+                for i in range(sections)
+            ],
+            info_author=_text(rng, 8),
+            description=_text(rng, 120),
+        ),
+        metadata=MetaPayload(marc_code='chi', details_page=f'https://{SOURCE_DOMAIN}/article/{uid}.html'),
+    )
+
+
+def generate_records(count: int, sections: int, text_size: int, duplicate_ratio: float,
+                     seed: int = 42) -> List[InformationDataStructure]:
+    """
+    生成一组合成记录，其中 duplicate_ratio 比例的记录与之前出现过的 uid 重复
+
+    Args:
+        count: 记录总数
+        sections: 每条记录的段落数
+        text_size: 每个段落的文本长度
+        duplicate_ratio: 重复记录比例，0 ~ 1
+        seed: 随机种子，保证不同提交之间结果可比
+
+    Returns:
+        List[InformationDataStructure]: 合成记录
+    """
+    rng = random.Random(seed)
+    records = []
+    uids = []
+    for i in range(count):
+        if uids and rng.random() < duplicate_ratio:
+            uid = rng.choice(uids)
+        else:
+            uid = f'bench_{seed}_{i}'
+            uids.append(uid)
+        records.append(make_record(rng, uid, sections, text_size))
+    return records
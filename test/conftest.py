@@ -0,0 +1,145 @@
+"""
+测试共用的夹具：SQLite 替身数据库和资讯记录
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from peewee import SqliteDatabase
+
+from application import db as application_db
+from application.db.mysql_db.info.ResourceInformationAttachmentList import ResourceInformationAttachmentList
+from application.db.mysql_db.info.ResourceInformationList import ResourceInformationList
+from application.db.mysql_db.info.ResourceInformationSectionList import ResourceInformationSectionList
+from application.db.mysql_db.info.ResourceInformationTagsRelation import ResourceInformationTagsRelation
+from application.db.mysql_db.info.ResourceSourceDict import ResourceSourceDict
+from application.models.kafka_models.information_data_structure import (
+    DataPayload, InformationDataStructure, MetaPayload,
+)
+
+# 预置在来源表中的来源域名及 id
+SOURCE_DOMAIN = 'www.nsfc.gov.cn'
+SOURCE_ID = 'src_nsfc'
+
+MODELS = [
+    ResourceInformationList,
+    ResourceInformationTagsRelation,
+    ResourceInformationAttachmentList,
+    ResourceInformationSectionList,
+    ResourceSourceDict,
+]
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """
+    建好资讯相关表的 SQLite 数据库，替换默认数据库连接。
+    线上由数据库默认值填充的非空列在 SQLite 中放宽为可空
+    """
+    for model in MODELS:
+        for field in model._meta.sorted_fields:
+            if not field.null and not field.primary_key and not field.constraints and field.default is None:
+                monkeypatch.setattr(field, 'null', True)
+    db = SqliteDatabase(str(tmp_path / 'information.db'), pragmas={'journal_mode': 'wal', 'busy_timeout': 10000})
+    db.bind(MODELS)
+    monkeypatch.setitem(application_db.database_connections, 'default', db)
+    with db:
+        db.create_tables(MODELS)
+        ResourceSourceDict.insert(source_id=SOURCE_ID, source_main_link=SOURCE_DOMAIN, is_del=0).execute()
+    yield db
+    db.close()
+
+
+def _make_information(uid: str, sections: int = 3, name: str = '资讯标题',
+                      domain: str = SOURCE_DOMAIN) -> InformationDataStructure:
+    """
+    生成一条资讯记录，第 i 个段落的原文为 ``{uid} 段落 {i}``
+
+    Args:
+        uid: 记录唯一标识
+        sections: 段落数
+        name: 资讯名称
+        domain: 详情页域名，不在来源表中时来源 id 无法解析
+    """
+    return InformationDataStructure(
+        uid=uid,
+        topic='test',
+        name=name,
+        created_at=datetime(2025, 1, 1).isoformat(),
+        data_type='information_nsfc',
+        tag_values='test',
+        link_data=[{'accessory_name': '附件', 'accessory_url': f'https://oss.example.com/{uid}.pdf'}],
+        data=DataPayload(
+            info_date='2025-01-01',
+            info_section=[{'text_info': f'{uid} 段落 {i}', 'marc_code': 'chi', 'title_level': 0}
+                          for i in range(sections)],
+            info_author='作者',
+            description='资讯描述',
+        ),
+        metadata=MetaPayload(marc_code='chi', details_page=f'https://{domain}/article/{uid}.html'),
+    )
+
+
+@pytest.fixture
+def make_information():
+    """资讯记录工厂，参数见 _make_information"""
+    return _make_information
+
+
+class FakeStream:
+    """
+    内存数据流，实现消费者用到的 ``noack()``、``events()``、``ack()``。
+    values 按顺序轮流分配到各分区，同一分区内的偏移量从 0 递增；
+    keep_open 为 True 时产出全部事件后保持打开（模拟没有新消息），直到调用 close()
+
+    Attributes
+    ----------
+    acked : list
+        已确认事件的 (分区, 偏移量)，按确认顺序排列。
+    """
+
+    def __init__(self, values, partitions: int = 1, keep_open: bool = False):
+        offsets = [0] * partitions
+        self.events_list = []
+        for index, value in enumerate(values):
+            partition = index % partitions
+            message = SimpleNamespace(topic='test', partition=partition, offset=offsets[partition],
+                                      timestamp=time.time(), value=None, serialized_value_size=0, headers=None)
+            offsets[partition] += 1
+            self.events_list.append(SimpleNamespace(value=value, message=message))
+        self.keep_open = keep_open
+        self.acked = []
+        self.on_ack = None
+        self._closed = None
+
+    def noack(self) -> 'FakeStream':
+        return self
+
+    async def events(self):
+        self._closed = self._closed or asyncio.Event()
+        for event in self.events_list:
+            yield event
+        if self.keep_open:
+            await self._closed.wait()
+
+    async def ack(self, event) -> bool:
+        if self.on_ack is not None:
+            self.on_ack(event)
+        self.acked.append((event.message.partition, event.message.offset))
+        return True
+
+    def close(self):
+        self._closed = self._closed or asyncio.Event()
+        self._closed.set()
+
+
+async def wait_until(condition, timeout: float = 5.0):
+    """轮询等待 condition() 为真，超时时抛出 AssertionError"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('等待条件超时')
+        await asyncio.sleep(0.01)
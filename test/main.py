@@ -1,11 +1,11 @@
-import copy
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
+from typing import Any, Dict
 
 from fasttransform import Transform, Pipeline
 
-from application.utils.decorators import log_execution
+from application.pipelines.field_pipeline import FieldPipeline
+from application.pipelines.pipeline_graph import PipelineGraph
 
 
 @dataclass
@@ -16,50 +16,31 @@ class Data:
 
 
 class StripTitle(Transform):
-    def encodes(self, x: Data): x.title = x.title.strip(); return x
-
-
-class NormalizeAuthor(Transform):
-    out_fields = ['author']
-
-    def encodes(self, x: Data):
-        time.sleep(3)
-        x.author = x.author.title()
+    def encodes(self, x: list):
+        for item in x:
+            item.title = item.title.strip()
         return x
 
 
-class ClampViewCount(Transform):
-    out_fields = ['viewCount']
+class NormalizeAuthor(FieldPipeline):
+    in_fields = ('author',)
+    out_fields = ('author',)
 
-    def encodes(self, x: Data):
+    def compute_one(self, x: Data) -> Dict[str, Any]:
         time.sleep(3)
-        x.viewCount = max(0, int(x.viewCount))
-        return x
+        return {'author': x.author.title()}
 
-class ParallelGroup(Transform):
-    def __init__(self, *transforms):
-        super().__init__()
-        self.transforms = transforms
 
-    def encodes(self, x):
-        with ThreadPoolExecutor(max_workers=len(self.transforms)) as ex:
-            futures = {ex.submit(t, copy.deepcopy(x)): t for t in self.transforms}
+class ClampViewCount(FieldPipeline):
+    in_fields = ('viewCount',)
+    out_fields = ('viewCount',)
 
-            for fut in as_completed(futures):
-                res = fut.result()
-                t = futures[fut]
-                #: 如果 transform 有指定 out_fields，则只更新这些字段
-                out_fields = getattr(t, 'out_fields', None)
-                if out_fields:
-                    for f in out_fields:
-                        setattr(x, f, getattr(res, f))
-                else:
-                    #: 没指定则更新全部
-                    x.__dict__.update(res.__dict__)
-        return x
+    def compute_one(self, x: Data) -> Dict[str, Any]:
+        time.sleep(3)
+        return {'viewCount': max(0, int(x.viewCount))}
 
 
 pipeline = Pipeline([
     StripTitle(),
-    ParallelGroup(NormalizeAuthor(), ClampViewCount()),  # 并行
-])
\ No newline at end of file
+    PipelineGraph(NormalizeAuthor(), ClampViewCount()),  # 并行
+])
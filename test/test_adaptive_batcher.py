@@ -0,0 +1,109 @@
+"""
+自适应批次调节器测试
+"""
+
+import pytest
+
+from application.consumers.adaptive_batcher import AdaptiveBatcher
+
+
+def _batcher(**kwargs):
+    config = dict(size=100, timeout=10.0, adaptive=True, min_size=10, max_size=400,
+                  min_timeout=0.5, target_latency=2.0, lag_threshold=5.0)
+    config.update(kwargs)
+    return AdaptiveBatcher(name='test', **config)
+
+
+def test_grows_on_lag_when_batch_is_full():
+    batcher = _batcher()
+
+    batcher.observe(records=100, latency=0.5, lag=30.0)
+
+    assert batcher.size == 150
+    assert batcher.last_reason == 'lag'
+
+
+def test_does_not_grow_when_batch_is_not_full():
+    batcher = _batcher()
+
+    batcher.observe(records=60, latency=0.5, lag=30.0)
+
+    assert batcher.size == 100
+    assert batcher.adjustments['lag'] == 0
+
+
+def test_growth_is_clamped_to_max_size_and_restores_timeout():
+    batcher = _batcher()
+    batcher.observe(records=10, latency=0.1, lag=0.0)
+    assert batcher.timeout == 5.0
+
+    for _ in range(10):
+        batcher.observe(records=batcher.size, latency=0.5, lag=30.0)
+
+    assert batcher.size == 400
+    assert batcher.timeout == 10.0
+
+
+def test_small_batches_still_grow_by_at_least_one():
+    batcher = _batcher(size=1, min_size=1)
+
+    batcher.observe(records=1, latency=0.1, lag=30.0)
+
+    assert batcher.size == 2
+
+
+def test_shrinks_on_db_latency_before_growing_on_lag():
+    batcher = _batcher()
+
+    batcher.observe(records=100, latency=3.0, lag=30.0)
+
+    assert batcher.size == 50
+    assert batcher.last_reason == 'db_latency'
+
+
+def test_shrink_is_clamped_to_min_size():
+    batcher = _batcher()
+
+    for _ in range(10):
+        batcher.observe(records=batcher.size, latency=5.0, lag=0.0)
+
+    assert batcher.size == 10
+    assert batcher.adjustments['db_latency'] == 4
+
+
+def test_idle_shortens_timeout_down_to_min_timeout():
+    batcher = _batcher()
+
+    for _ in range(10):
+        batcher.observe(records=1, latency=0.1, lag=0.0)
+
+    assert batcher.size == 100
+    assert batcher.timeout == 0.5
+    assert batcher.last_reason == 'idle'
+
+
+def test_full_batch_without_lag_keeps_parameters():
+    batcher = _batcher()
+
+    batcher.observe(records=100, latency=1.0, lag=1.0)
+
+    assert batcher.stats() == {'size': 100, 'timeout': 10.0, 'last_reason': 'initial', 'adjustments': {}}
+
+
+def test_disabled_batcher_ignores_observations():
+    batcher = _batcher(adaptive=False)
+
+    batcher.observe(records=100, latency=5.0, lag=30.0)
+    batcher.observe(records=1, latency=0.1, lag=0.0)
+
+    assert (batcher.size, batcher.timeout) == (100, 10.0)
+
+
+@pytest.mark.parametrize('config, expected', [
+    ({'size': 20, 'timeout': 3.0}, (20, 20, 3.0, 1)),
+    ({'size': 20, 'timeout': 3.0, 'max_size': 80, 'min_size': 5, 'min_timeout': 0.2}, (20, 80, 0.2, 5)),
+])
+def test_from_config_defaults(config, expected):
+    batcher = AdaptiveBatcher.from_config(config)
+
+    assert (batcher.size, batcher.max_size, batcher.min_timeout, batcher.min_size) == expected
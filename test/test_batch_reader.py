@@ -0,0 +1,36 @@
+"""
+批次读取器测试
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from application.consumers.batch_reader import BatchReader
+
+
+class _BrokenStream:
+    """产出 count 个事件后读取出错的数据流"""
+
+    def __init__(self, count: int):
+        self.count = count
+
+    async def events(self):
+        for offset in range(self.count):
+            yield SimpleNamespace(message=SimpleNamespace(offset=offset, serialized_value_size=10))
+        raise RuntimeError('连接断开')
+
+
+def test_stream_error_is_raised_after_read_events():
+    batcher = SimpleNamespace(size=2, timeout=0.5, max_bytes=None)
+    reader = BatchReader(_BrokenStream(3), buffer_size=10)
+    batches = []
+
+    async def consume():
+        async for batch in reader.batches(batcher):
+            batches.append([event.message.offset for event in batch])
+
+    with pytest.raises(RuntimeError, match='连接断开'):
+        asyncio.run(consume())
+    assert batches == [[0, 1], [2]]
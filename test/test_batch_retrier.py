@@ -0,0 +1,77 @@
+"""
+批次重试器测试
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from peewee import OperationalError
+
+from application.consumers.retry import BatchRetrier, RejectedRecord
+from application.pipelines.information_into_pipeline import InformationIntoPipeline
+from application.settings import SOURCE_CONFIG
+
+
+def _record(uid: str, source_id='src'):
+    return SimpleNamespace(uid=uid, source_id=source_id,
+                           metadata=SimpleNamespace(details_page=f'https://unknown.example.com/{uid}'))
+
+
+@pytest.fixture
+def dead_letters(monkeypatch):
+    sent = []
+    monkeypatch.setattr('application.consumers.retry.dead_letter_queue.send',
+                        lambda record, **kwargs: sent.append(record))
+    return sent
+
+
+def test_rejected_and_poison_records_fail_once(monkeypatch, dead_letters):
+    monkeypatch.setitem(SOURCE_CONFIG, 'unresolved_policy', 'dead_letter')
+    stage = InformationIntoPipeline()
+    calls = []
+
+    def pipeline(records):
+        calls.append([record.uid for record in records])
+        records = stage.prepare_batch(records)
+        if any(record.uid == 'poison' for record in records):
+            raise ValueError('无法处理的记录')
+        return [record.uid for record in records]
+
+    records = [_record(f'good_{i}') for i in range(3)] + [_record('unresolved', source_id=None), _record('poison')]
+    records += [_record(f'good_{i}') for i in range(3, 6)]
+    retrier = BatchRetrier(base_delay=0)
+    result, failures = retrier.run(pipeline, records)
+
+    # 二分隔离时包含 unresolved 的批次被执行了多次，但只作为失败记录返回一次，不在管道中直接写入死信队列
+    assert sum('unresolved' in uids for uids in calls) > 1
+    assert dead_letters == []
+    assert sorted(result) == sorted(f'good_{i}' for i in range(6))
+    assert sorted(record.uid for record, _ in failures) == ['poison', 'unresolved']
+    errors = {record.uid: error for record, error in failures}
+    assert isinstance(errors['unresolved'], RejectedRecord)
+    assert isinstance(errors['poison'], ValueError)
+    assert retrier.poison_records == 1
+
+
+def test_rejections_of_failed_attempts_are_discarded(monkeypatch, dead_letters):
+    monkeypatch.setitem(SOURCE_CONFIG, 'unresolved_policy', 'dead_letter')
+    stage = InformationIntoPipeline()
+
+    def pipeline(records):
+        stage.prepare_batch(records)
+        raise OperationalError('数据库不可用')
+
+    retrier = BatchRetrier(max_retries=1, base_delay=0)
+    with pytest.raises(OperationalError):
+        retrier.run(pipeline, [_record('unresolved', source_id=None), _record('good')])
+    assert dead_letters == []
+
+    # 重新执行成功后才作为失败记录返回
+    result, failures = retrier.run(lambda records: stage.prepare_batch(records), [_record('unresolved', None)])
+    assert result == [] and [record.uid for record, _ in failures] == ['unresolved']
+
+
+def test_reject_outside_run_sends_directly(monkeypatch, dead_letters):
+    monkeypatch.setitem(SOURCE_CONFIG, 'unresolved_policy', 'dead_letter')
+    assert InformationIntoPipeline().prepare_batch([_record('unresolved', source_id=None)]) == []
+    assert [record.uid for record in dead_letters] == ['unresolved']
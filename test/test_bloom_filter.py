@@ -0,0 +1,31 @@
+"""
+布隆过滤器测试
+"""
+
+import pytest
+
+from application.cache.bloom_filter import BloomFilter
+
+
+def test_sizing_follows_capacity_and_error_rate():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+
+    assert bloom.num_bits == 9585
+    assert bloom.num_hashes == 7
+    assert bloom.size_in_bytes == 1199
+
+
+def test_false_positive_rate_within_capacity():
+    bloom = BloomFilter(capacity=5000, error_rate=0.01)
+    for i in range(5000):
+        bloom.add(f'stored_{i}')
+
+    assert all(f'stored_{i}' in bloom for i in range(5000))
+    false_positives = sum(f'new_{i}' in bloom for i in range(20000))
+    assert false_positives / 20000 < 0.02
+
+
+@pytest.mark.parametrize('capacity, error_rate', [(0, 0.01), (100, 0), (100, 1)])
+def test_invalid_arguments(capacity, error_rate):
+    with pytest.raises(ValueError):
+        BloomFilter(capacity, error_rate)
@@ -0,0 +1,88 @@
+"""
+进程内去重索引测试（SQLite 替身）
+"""
+
+import pytest
+
+from application.cache import DedupIndex, claiming
+from application.db.mysql_db.info.ResourceInformationList import ResourceInformationList
+
+
+@pytest.fixture
+def stored(database):
+    ids = [f'stored_{i}' for i in range(50)]
+    ResourceInformationList.insert_many([(uid, 'src_nsfc') for uid in ids],
+                                        fields=('information_id', 'source_id')).execute()
+    return ids
+
+
+def test_lru_bloom_and_probe_agree_with_database(stored):
+    # LRU 只保留最后预热的 10 个 id，其余已入库的 id 需要查库确认
+    index = DedupIndex(bloom_capacity=1000, bloom_error_rate=0.01, lru_size=10, probe_chunk_size=7)
+    new = [f'new_{i}' for i in range(200)]
+    index.warm()
+    false_positives = sum(uid in index.bloom for uid in new)
+
+    with claiming('batch_a'):
+        assert index.filter_new(stored + new) == set(new)
+
+    stats = index.stats()
+    assert (stats['hits'], stats['misses']) == (50, 200)
+    assert stats['probes'] == 40 + false_positives
+    assert stats['false_positives'] == false_positives
+
+    # 最近提交的 id 留在 LRU 中，不再查库
+    index.add_many(new)
+    with claiming('batch_b'):
+        assert index.filter_new(new[-5:]) == set()
+    assert index.stats()['probes'] == stats['probes']
+
+
+def test_saturated_bloom_falls_back_to_probe(stored):
+    # 容量远小于数据量时几乎所有 id 都被误判为可能存在，结果由查库确认
+    index = DedupIndex(bloom_capacity=1, bloom_error_rate=0.5, lru_size=1)
+    new = [f'new_{i}' for i in range(20)]
+
+    with claiming('batch_a'):
+        assert index.filter_new(stored + new) == set(new)
+
+    stats = index.stats()
+    assert stats['false_positives'] > 10
+    assert stats['hits'] == 50
+
+
+def test_concurrent_batches_contend_for_claims(stored):
+    index = DedupIndex(bloom_capacity=1000, bloom_error_rate=0.01, lru_size=100)
+    with claiming('batch_a'):
+        assert index.filter_new(['stored_1', 'new_1', 'new_2']) == {'new_1', 'new_2'}
+    # 并发的其他批次在 batch_a 提交前拿不到同一个 id
+    with claiming('batch_b'):
+        assert index.filter_new(['new_1', 'new_3']) == {'new_3'}
+    # batch_a 重试时沿用之前的认领
+    with claiming('batch_a'):
+        assert index.filter_new(['new_1', 'new_2']) == {'new_1', 'new_2'}
+    assert index.stats()['contended'] == 1
+
+    # 其他批次的释放不影响 batch_a 的认领，batch_a 释放后其他批次可以认领
+    with claiming('batch_b'):
+        index.release_many(['new_1'])
+        assert index.filter_new(['new_1']) == set()
+    with claiming('batch_a'):
+        index.release_many(['new_1'])
+    with claiming('batch_b'):
+        assert index.filter_new(['new_1']) == {'new_1'}
+
+    # 提交后删除认领，之后均视为已入库
+    index.add_many(['new_1', 'new_2', 'new_3'])
+    assert index.stats()['claims'] == 0
+    with claiming('batch_c'):
+        assert index.filter_new(['new_1', 'new_2', 'new_3']) == set()
+
+
+def test_expired_claims_can_be_taken_over(stored):
+    index = DedupIndex(bloom_capacity=1000, bloom_error_rate=0.01, lru_size=100, claim_ttl=0)
+    with claiming('batch_a'):
+        assert index.filter_new(['new_1']) == {'new_1'}
+    with claiming('batch_b'):
+        assert index.filter_new(['new_1']) == {'new_1'}
+    assert index.stats()['claims'] == 1
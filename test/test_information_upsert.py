@@ -0,0 +1,93 @@
+"""
+upsert 模式下重复投递资讯的入库测试（SQLite 替身）
+"""
+
+import pytest
+from fasttransform import Pipeline
+
+from application.cache import dedup_index
+from application.db import bulk
+from application.db.mysql_db.info.ResourceInformationList import ResourceInformationList
+from application.db.mysql_db.info.ResourceInformationSectionList import ResourceInformationSectionList
+from application.pipelines.information_deduplication_pipeline import InformationDeduplicationPipeline
+from application.pipelines.information_into_pipeline import InformationIntoPipeline
+from application.pipelines.information_source_pipeline import InformationSourcePipeline
+from application.pipelines.information_tag_pipeline import InformationTagPipeline
+from application.db.bulk import BulkWriteStats
+from application.settings import BULK_WRITE_CONFIG, WRITE_CONFIG
+
+
+@pytest.fixture
+def pipeline(database, monkeypatch):
+    monkeypatch.setitem(WRITE_CONFIG, 'mode', 'upsert')
+    monkeypatch.setattr(dedup_index, '_dedup_index', None)
+    return Pipeline([
+        InformationDeduplicationPipeline(),
+        InformationSourcePipeline(),
+        InformationTagPipeline(),
+        InformationIntoPipeline(),
+    ])
+
+
+def _sections(uid: str):
+    model = ResourceInformationSectionList
+    query = (model
+             .select(model.list_id, model.section_id, model.section_order, model.src_text)
+             .where(model.information_id == uid)
+             .order_by(model.section_order)
+             .tuples())
+    return list(query)
+
+
+def test_resent_record_rewrites_only_changed_sections(pipeline, make_information):
+    pipeline([make_information('upsert_1', sections=4)])
+    before = _sections('upsert_1')
+    assert len(before) == 4
+
+    edited = make_information('upsert_1', sections=4, name='更新后的标题')
+    edited.data.info_section[2]['text_info'] = '更新后的段落'
+    pipeline([edited])
+    after = _sections('upsert_1')
+
+    assert ResourceInformationList.get(ResourceInformationList.information_id == 'upsert_1').information_name == {
+        'zh': '更新后的标题'}
+    assert [row[3] for row in after] == ['upsert_1 段落 0', 'upsert_1 段落 1', '更新后的段落', 'upsert_1 段落 3']
+    # 未变化的段落保留原行，只有被修改的段落重新写入
+    unchanged = [0, 1, 3]
+    assert [after[i][:2] for i in unchanged] == [before[i][:2] for i in unchanged]
+    assert after[2][0] > max(row[0] for row in before)
+
+
+def test_moved_sections_only_update_order(pipeline, make_information):
+    pipeline([make_information('upsert_2', sections=3)])
+    before = _sections('upsert_2')
+
+    moved = make_information('upsert_2', sections=3)
+    moved.data.info_section.insert(0, {'text_info': '新增的首段', 'marc_code': 'chi', 'title_level': 0})
+    pipeline([moved])
+    after = _sections('upsert_2')
+
+    assert [row[2] for row in after] == [1, 2, 3, 4]
+    assert after[0][3] == '新增的首段'
+    # 原有段落保留原行和 section_id，只更新展示顺序
+    assert [row[:2] for row in after[1:]] == [row[:2] for row in before]
+
+
+def test_upsert_does_not_build_dedup_index(pipeline, make_information):
+    pipeline([make_information('upsert_3', sections=1)])
+    assert dedup_index._dedup_index is None
+
+
+def test_upsert_is_split_by_bulk_write_config(pipeline, make_information, monkeypatch):
+    monkeypatch.setitem(BULK_WRITE_CONFIG, 'resource_information_list', {'max_rows': 2, 'max_bytes': 4 * 1024 * 1024})
+    monkeypatch.setattr(bulk, 'bulk_write_stats', BulkWriteStats())
+    records = [make_information(f'upsert_chunk_{i}', sections=1) for i in range(5)]
+
+    pipeline(records)
+    pipeline([make_information(f'upsert_chunk_{i}', sections=1, name='更新后的标题') for i in range(5)])
+
+    stats = bulk.bulk_write_stats.stats()['resource_information_list']
+    assert (stats['statements'], stats['rows'], stats['max_rows']) == (6, 10, 2)
+    titles = ResourceInformationList.select(ResourceInformationList.information_name).where(
+        ResourceInformationList.information_id.startswith('upsert_chunk_'))
+    assert [row.information_name for row in titles] == [{'zh': '更新后的标题'}] * 5
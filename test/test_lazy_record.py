@@ -0,0 +1,63 @@
+"""
+延迟解码记录测试
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from application.cache import dedup_index
+from application.models.kafka_models.information_data_structure import InformationDataStructure
+from application.models.kafka_models.lazy_record import LazyRecord
+from application.pipelines.information_deduplication_pipeline import InformationDeduplicationPipeline
+from application.settings import WRITE_CONFIG
+
+
+def _message(record, headers=None):
+    return SimpleNamespace(value=record.dumps(serializer='json'), headers=headers)
+
+
+def test_uid_from_header_does_not_parse_body(make_information):
+    record = LazyRecord.from_message(_message(make_information('lazy_1'), [('uid', b'lazy_1')]),
+                                     InformationDataStructure)
+    assert record.uid == 'lazy_1'
+    assert record._payload is None
+    assert not record.decoded
+
+
+def test_uid_from_body_parses_without_building_record(make_information):
+    record = LazyRecord.from_message(_message(make_information('lazy_2')), InformationDataStructure)
+    assert record.uid == 'lazy_2'
+    assert record._payload is not None
+    assert not record.decoded
+    # 访问其他字段时才构建完整的 Record
+    assert record.name == '资讯标题'
+    assert record.decoded
+    assert record.data.info_section[0]['text_info'] == 'lazy_2 段落 0'
+
+
+class _StoredIndex:
+    """把 stored 中的 id 视为已入库的去重索引"""
+
+    def __init__(self, stored):
+        self.stored = set(stored)
+
+    def filter_new(self, uids):
+        return set(uids) - self.stored
+
+
+def test_dropped_duplicate_is_never_decoded(monkeypatch, make_information):
+    monkeypatch.setitem(WRITE_CONFIG, 'mode', 'insert')
+    monkeypatch.setattr(dedup_index, '_dedup_index', _StoredIndex({'stored'}))
+    duplicate = LazyRecord.from_message(_message(make_information('stored')), InformationDataStructure)
+    new = LazyRecord.from_message(_message(make_information('new')), InformationDataStructure)
+
+    assert InformationDeduplicationPipeline().encodes([duplicate, new]) == [new]
+    assert not duplicate.decoded
+    assert not new.decoded
+
+
+def test_corrupt_body_raises_on_access():
+    record = LazyRecord(b'{not json', InformationDataStructure)
+    with pytest.raises(ValueError):
+        record.uid
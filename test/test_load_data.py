@@ -0,0 +1,106 @@
+"""
+LOAD DATA TSV 编码测试
+按 MySQL LOAD DATA 默认的 FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' 解析写出的文件
+"""
+
+import io
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from application.db import bulk
+from application.db.bulk import load_data_many, tsv_value, write_tsv
+from application.db.mysql_db.info.ResourceInformationSectionList import ResourceInformationSectionList
+
+# LOAD DATA 对 ESCAPED BY 字符之后各字符的解释，其他字符去掉转义符后原样保留
+_UNESCAPES = {'0': '\0', 'b': '\b', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a'}
+
+FIELDS = ('section_id', 'marc_code', 'media_info', 'src_text')
+TRICKY = [
+    'tab\there',
+    'line\nbreak\r\n',
+    'back\\slash',
+    'nul\0byte',
+    '\\N',
+    'N',
+    '\\',
+    '末尾反斜杠\\',
+    '',
+]
+
+
+def parse_load_data(text: str):
+    """按 LOAD DATA 的规则将 TSV 文本解析为行，未转义的 \\N 字段为 None"""
+    rows = []
+    row, field, escaped_null = [], [], False
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == '\\':
+            following = text[i + 1]
+            if following == 'N' and not field and text[i + 2] in '\t\n':
+                escaped_null = True
+            else:
+                field.append(_UNESCAPES.get(following, following))
+            i += 2
+            continue
+        if char in '\t\n':
+            row.append(None if escaped_null else ''.join(field))
+            field, escaped_null = [], False
+            if char == '\n':
+                rows.append(row)
+                row = []
+        else:
+            field.append(char)
+        i += 1
+    return rows
+
+
+def test_escaped_bytes():
+    field = ResourceInformationSectionList.media_info
+    assert tsv_value(field, None) == '\\N'
+    assert tsv_value(field, '\\N') == '\\\\N'
+    assert tsv_value(field, 'a\tb\nc\rd\0e\\f') == 'a\\tb\\nc\\rd\\0e\\\\f'
+    # JSON 字段先编码为 JSON 文本，文本中的转义再按 TSV 转义
+    assert tsv_value(ResourceInformationSectionList.src_text, 'x\ty') == '"x\\\\ty"'
+
+
+@pytest.mark.parametrize('value', TRICKY + [None])
+def test_round_trip(value):
+    file = io.StringIO()
+    rows = [('si1', value, value, value), ('si2', None, 'plain', {'text': value})]
+    columns = write_tsv(ResourceInformationSectionList, rows, file, FIELDS)
+    assert columns == list(FIELDS)
+
+    parsed = parse_load_data(file.getvalue())
+    assert len(parsed) == 2
+    section_id, marc_code, media_info, src_text = parsed[0]
+    assert (section_id, marc_code, media_info) == ('si1', value, value)
+    assert (json.loads(src_text) if src_text is not None else None) == value
+    assert parsed[1][:3] == ['si2', None, 'plain']
+    assert json.loads(parsed[1][3]) == {'text': value}
+
+
+def test_load_data_many_statement(monkeypatch):
+    executed = {}
+
+    def execute_sql(sql, params):
+        with open(params[0], encoding='utf-8', newline='') as f:
+            executed['text'] = f.read()
+        executed['sql'] = sql
+        return SimpleNamespace(rowcount=len(TRICKY))
+
+    monkeypatch.setattr(bulk, '_load_data_directory', lambda: None)
+    model = ResourceInformationSectionList
+    monkeypatch.setattr(model._meta, 'database', SimpleNamespace(execute_sql=execute_sql))
+    rows = [(f'si{i}', None, value, None) for i, value in enumerate(TRICKY)]
+    load_data_many(model, rows, FIELDS)
+
+    assert "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n'" in executed['sql']
+    assert [row[2] for row in parse_load_data(executed['text'])] == TRICKY
+
+    monkeypatch.setattr(model._meta, 'database', SimpleNamespace(
+        execute_sql=lambda sql, params: SimpleNamespace(rowcount=len(TRICKY) - 1)))
+    with pytest.raises(RuntimeError, match='行数不符'):
+        load_data_many(model, rows, FIELDS)
@@ -0,0 +1,54 @@
+"""
+按分区并行处理时的确认顺序测试
+"""
+
+import asyncio
+import threading
+
+from application.consumers.base_consumer import BaseConsumer
+from application.pipelines.base_pipeline import BasePipeline
+from conftest import FakeStream, wait_until
+
+
+class GatedStage(BasePipeline):
+    """包含 blocked 中记录的批次在 gate 打开前阻塞"""
+    change_data_structure = False
+    blocked = frozenset()
+    gate = None
+
+    def apply_batch(self, value):
+        if self.blocked.intersection(value):
+            assert self.gate.wait(10)
+        return value
+
+
+def test_slow_sub_batch_keeps_partition_order_without_blocking_others():
+    stage = GatedStage()
+    stage.blocked = frozenset({'v0'})
+    stage.gate = threading.Event()
+
+    class Consumer(BaseConsumer):
+        pipe_list = [stage]
+
+    consumer = Consumer(batch_config={'size': 4, 'timeout': 0.05, 'adaptive': False, 'per_partition': True},
+                        max_workers=4, max_in_flight=8)
+    stream = FakeStream([f'v{i}' for i in range(16)], partitions=2)
+
+    def acked(partition):
+        return [offset for acked_partition, offset in stream.acked if acked_partition == partition]
+
+    async def run():
+        task = asyncio.ensure_future(consumer(stream))
+        # 分区 0 的第一个子批次阻塞时，分区 1 的全部批次照常处理并确认
+        await wait_until(lambda: len(acked(1)) == 8)
+        assert acked(0) == []
+        stage.gate.set()
+        await task
+
+    try:
+        asyncio.run(run())
+    finally:
+        stage.gate.set()
+    # 分区 0 后续的子批次等第一个子批次完成后才执行，偏移量按顺序确认
+    assert acked(0) == list(range(8))
+    assert acked(1) == list(range(8))
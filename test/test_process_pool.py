@@ -0,0 +1,41 @@
+"""
+进程池记录打包测试
+"""
+
+import pickle
+
+import faust
+
+from application.pipelines.process_pool import pack_records, unpack_records
+
+
+def test_pack_flattens_nested_records(make_information):
+    records = [make_information(f'uid_{i}') for i in range(3)]
+    records[1].source_id = 7
+
+    packed = pickle.dumps(pack_records(records))
+
+    assert packed.count(b'info_section') == 1
+    restored = unpack_records(pickle.loads(packed))
+    assert [record.to_representation() for record in restored] == [record.to_representation() for record in records]
+    assert restored[1].source_id == 7
+    assert not hasattr(restored[0], 'source_id')
+    assert type(restored[0].data).__name__ == 'DataPayload'
+    assert restored[2].data.info_section[0]['text_info'] == 'uid_2 段落 0'
+
+
+def test_pack_keeps_records_nested_in_lists():
+    class Item(faust.Record):
+        name: str
+
+    class Holder(faust.Record):
+        items: list
+
+    holder = Holder(items=[Item(name='a'), {'inner': Item(name='b')}])
+
+    _, _, rows = pack_records([holder])
+    assert not any(isinstance(value, faust.Record) for value in rows[0][0])
+
+    restored, = unpack_records(pack_records([holder]))
+    assert restored.items[0].name == 'a'
+    assert restored.items[1]['inner'].name == 'b'
@@ -0,0 +1,88 @@
+"""
+Redis 共享去重索引测试（fakeredis + SQLite 替身）
+"""
+
+import pytest
+
+from application.cache import RedisDedupIndex, claiming, dedup_index
+from application.db.mysql_db.info.ResourceInformationList import ResourceInformationList
+from application.pipelines.information_into_pipeline import InformationIntoPipeline
+from application.settings import SOURCE_CONFIG
+
+fakeredis = pytest.importorskip('fakeredis')
+
+
+@pytest.fixture
+def client(database):
+    ResourceInformationList.insert_many(
+        [('stored_1', 'src_nsfc'), ('stored_2', 'src_nsfc')], fields=('information_id', 'source_id'),
+    ).execute()
+    return fakeredis.FakeRedis()
+
+
+def test_concurrent_batches_contend_for_claims(client):
+    index = RedisDedupIndex(client)
+    other_worker = RedisDedupIndex(client)
+    with claiming('batch_a'):
+        assert index.filter_new(['stored_1', 'new_1', 'new_2']) == {'new_1', 'new_2'}
+    # 同一进程中并发的其他批次不能沿用 batch_a 的认领
+    with claiming('batch_b'):
+        assert index.filter_new(['new_1', 'new_3']) == {'new_3'}
+    assert other_worker.filter_new(['new_2', 'new_4']) == {'new_4'}
+    # batch_a 重试时沿用之前的认领
+    with claiming('batch_a'):
+        assert index.filter_new(['new_1', 'new_2']) == {'new_1', 'new_2'}
+    assert index.stats()['contended'] == 1
+    assert index.stats()['hits'] == 1
+
+
+def test_warm_loads_stored_ids_once(client, monkeypatch):
+    index = RedisDedupIndex(client)
+    index.warm()
+    assert client.get(f'{index.key}:warmed') == b'done'
+    assert client.smembers(index.key) == {b'stored_1', b'stored_2'}
+
+    other_worker = RedisDedupIndex(client)
+
+    def reload():
+        raise AssertionError('已完成预热时不应再次加载')
+
+    monkeypatch.setattr(other_worker, '_load_stored_ids', reload)
+    assert other_worker.filter_new(['stored_2', 'new_1']) == {'new_1'}
+
+
+def test_release_only_drops_own_claims(client):
+    index = RedisDedupIndex(client)
+    with claiming('batch_a'):
+        index.filter_new(['new_1', 'new_2'])
+    with claiming('batch_b'):
+        index.release_many(['new_1'])
+        assert index.filter_new(['new_1']) == set()
+    with claiming('batch_a'):
+        index.release_many(['new_1'])
+    with claiming('batch_b'):
+        assert index.filter_new(['new_1']) == {'new_1'}
+
+    index.add_many(['new_2'])
+    assert client.exists(index._claim_key('new_2')) == 0
+    assert index.filter_new(['new_2']) == set()
+
+
+@pytest.mark.parametrize('policy', ['skip', 'dead_letter'])
+def test_prepare_batch_releases_dropped_records(client, monkeypatch, make_information, policy):
+    index = RedisDedupIndex(client)
+    monkeypatch.setattr(dedup_index, '_dedup_index', index)
+    monkeypatch.setitem(SOURCE_CONFIG, 'unresolved_policy', policy)
+    if policy == 'dead_letter':
+        monkeypatch.setattr('application.consumers.retry.dead_letter_queue.send',
+                            lambda *args, **kwargs: None)
+    kept = make_information('new_1')
+    kept.source_id = 'src_nsfc'
+    dropped = make_information('new_2')
+    dropped.source_id = None
+
+    with claiming('batch_a'):
+        assert index.filter_new(['new_1', 'new_2']) == {'new_1', 'new_2'}
+        assert InformationIntoPipeline().prepare_batch([kept, dropped]) == [kept]
+    assert client.exists(index._claim_key('new_1')) == 1
+    assert client.exists(index._claim_key('new_2')) == 0
@@ -0,0 +1,71 @@
+"""
+离线回放断点续传测试（SQLite 替身）
+"""
+
+import gzip
+import json
+from argparse import Namespace
+
+import pytest
+
+from application import replay as replay_module
+from application.cache import dedup_index
+from application.db.mysql_db.info.ResourceInformationList import ResourceInformationList
+
+
+class InterruptedStream(replay_module.ReplayStream):
+    """产出 limit 个事件后结束的回放数据流，模拟回放中途被中断"""
+    limit = 7
+
+    async def events(self):
+        events = super().events()
+        try:
+            count = 0
+            async for event in events:
+                yield event
+                count += 1
+                if count == self.limit:
+                    return
+        finally:
+            await events.aclose()
+
+
+@pytest.fixture
+def dump(tmp_path, make_information):
+    path = tmp_path / 'information.jsonl.gz'
+    with gzip.open(path, 'wb') as f:
+        for i in range(20):
+            f.write(make_information(f'replay_{i}', sections=1).to_json() + b'\n')
+    return str(path)
+
+
+def _args(dump: str, checkpoint: str) -> Namespace:
+    return Namespace(
+        files=[dump], topic='information', format='auto', batch_size=4, timeout=0.05, parallel=1, chunk_lines=3,
+        workers=2, in_flight=2, lazy=None, write_behind=False, checkpoint=checkpoint, checkpoint_interval=60.0,
+    )
+
+
+def test_interrupted_replay_resumes_from_checkpoint(database, dump, tmp_path, monkeypatch):
+    monkeypatch.setattr(dedup_index, '_dedup_index', None)
+    checkpoint = str(tmp_path / 'replay.json')
+
+    stream_class = replay_module.ReplayStream
+    monkeypatch.setattr(replay_module, 'ReplayStream', InterruptedStream)
+    first = replay_module.replay(_args(dump, checkpoint))
+    assert (first['records'], first['completed_files']) == (7, 0)
+    with open(checkpoint, encoding='utf-8') as f:
+        state = next(iter(json.load(f).values()))
+    with gzip.open(dump, 'rb') as f:
+        assert state['offset'] == sum(len(f.readline()) for _ in range(7))
+
+    monkeypatch.setattr(replay_module, 'ReplayStream', stream_class)
+    second = replay_module.replay(_args(dump, checkpoint))
+    assert (second['records'], second['completed_files']) == (13, 1)
+
+    stored = [row.information_id for row in ResourceInformationList.select(ResourceInformationList.information_id)]
+    assert sorted(stored) == sorted(f'replay_{i}' for i in range(20))
+
+    # 已完成的文件再次回放时直接跳过
+    third = replay_module.replay(_args(dump, checkpoint))
+    assert third['records'] == 0
@@ -0,0 +1,142 @@
+"""
+写后缓冲与延迟确认测试
+"""
+
+import asyncio
+import threading
+
+from peewee import OperationalError
+
+from application.consumers.base_consumer import BaseConsumer
+from application.db import write_behind
+from application.pipelines.base_pipeline import BasePipeline
+from conftest import FakeStream, wait_until
+
+
+class BufferedStage(BasePipeline):
+    """将批次加入写后缓冲的管道阶段，写入和释放认领由测试替换"""
+    change_data_structure = False
+
+    def write(self, items):
+        raise NotImplementedError
+
+    def release(self, items, claim_token):
+        raise NotImplementedError
+
+    def apply_batch(self, value):
+        write_behind.current_batch().add(self.write, list(value), rows=len(value), size=0, release=self.release)
+        return value
+
+
+def _consumer(stage, max_age: float = 0.2, size: int = 10) -> BaseConsumer:
+    class Consumer(BaseConsumer):
+        pipe_list = [stage]
+
+    return Consumer(
+        batch_config={'size': size, 'timeout': 0.05, 'adaptive': False, 'per_partition': False},
+        max_workers=2, max_in_flight=2,
+        write_behind={'enabled': True, 'max_rows': 1000, 'max_age': max_age},
+    )
+
+
+def test_events_are_acked_only_after_flush_commits():
+    committed = set()
+    lock = threading.Lock()
+    stage = BufferedStage()
+
+    def write(items):
+        with lock:
+            committed.update(items)
+
+    stage.write = write
+    stage.release = lambda items, token: None
+    stream = FakeStream([f'r{i}' for i in range(6)], keep_open=True)
+    values = {(event.message.partition, event.message.offset): event.value for event in stream.events_list}
+
+    def on_ack(event):
+        with lock:
+            assert event.value in committed, f'{event.value} 在写入提交前被确认'
+
+    stream.on_ack = on_ack
+    consumer = _consumer(stage, size=2)
+
+    async def run():
+        task = asyncio.ensure_future(consumer(stream))
+        await asyncio.sleep(0.1)
+        # 数据仍在缓冲中（未到 max_age），不确认任何偏移量
+        assert stream.acked == []
+        await wait_until(lambda: len(stream.acked) == 6)
+        stream.close()
+        await task
+
+    asyncio.run(run())
+    assert committed == set(values.values())
+
+
+def test_failed_flush_releases_claims_and_leaves_events_unacked():
+    released = []
+    stage = BufferedStage()
+
+    def write(items):
+        raise OperationalError('数据库不可用')
+
+    stage.write = write
+    stage.release = lambda items, token: released.append((list(items), token))
+    stream = FakeStream(['r0', 'r1'])
+    consumer = _consumer(stage, max_age=60)
+    consumer.retrier.max_retries = 0
+    consumer.retrier.base_delay = 0.01
+
+    asyncio.run(consumer(stream))
+
+    assert stream.acked == []
+    assert len(released) == 1
+    items, token = released[0]
+    assert items == ['r0', 'r1'] and token is not None
+    assert consumer.write_behind.due() is None
+
+
+def test_non_transient_flush_failure_releases_claims_and_dead_letters(monkeypatch):
+    released = []
+    dead_letters = []
+    stage = BufferedStage()
+
+    def write(items):
+        raise ValueError('无法写入')
+
+    stage.write = write
+    stage.release = lambda items, token: released.append(list(items))
+    stream = FakeStream(['r0'])
+    consumer = _consumer(stage, max_age=60)
+    consumer.retrier.base_delay = 0.01
+
+    async def dead_letter_rows(events, failures):
+        dead_letters.extend(row for row, _ in failures)
+
+    monkeypatch.setattr(consumer, '_dead_letter_rows', dead_letter_rows)
+    asyncio.run(consumer(stream))
+
+    assert released == [['r0']]
+    assert dead_letters == ['r0']
+    assert stream.acked == [(0, 0)]
+
+
+def test_max_age_flush_without_new_batches():
+    written = []
+    stage = BufferedStage()
+    stage.write = written.extend
+    stage.release = lambda items, token: None
+    stream = FakeStream(['r0', 'r1'], keep_open=True)
+    consumer = _consumer(stage, max_age=0.3)
+
+    async def run():
+        task = asyncio.ensure_future(consumer(stream))
+        await wait_until(lambda: consumer.write_behind._entries)
+        assert written == []
+        # 没有新的批次到达，定时检查在 max_age 后写入并确认
+        await wait_until(lambda: len(stream.acked) == 2, timeout=3)
+        assert written == ['r0', 'r1']
+        stream.close()
+        await task
+
+    asyncio.run(run())